@@ -0,0 +1,368 @@
+"""
+Benchmarks for the task pipeline on synthetic TASKS/Templates trees.
+
+    python benchmark.py                                # 10 and 100 files of 400 rows
+    python benchmark.py --files 10 100 1000 --rows 400 2000 --out before.json
+    python benchmark.py --compare before.json --out after.json
+    TASKGEN_STORAGE=csv python benchmark.py --out csv.json   # force the CSV-only storage
+
+Each scenario (files x rows) builds a fresh temporary tree shaped like
+400Template.csv and times list/load/save/merge/split, the search index, the
+validator, the extra_filter codec and the latency from a file appearing to its
+row in the task list (FileWatcher, the app's event queue, its poll tick and
+incremental list update, run without a window). Results are written as JSON;
+--compare prints the median ratio against an earlier run.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import queue
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+
+from extra_filter_builder import _parse_cached, build_extra_filter, parse_extra_filter
+from file_watcher import FileWatcher
+from search_index import SearchIndex
+from split_engine import shard_names
+from task_manager import DYNAMIC_FIELDS, TaskManager, read_task_csv
+from task_storage import default_storage
+from task_validator import TaskValidator
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), '400Template.csv')
+EVENTS = 50          # Distinct synthetic event URLs shared by the files
+MERGE_FILES = 5      # Files merged per merge_tasks sample
+SPLIT_SHARDS = 4     # Shards written per split_task sample
+WATCH_TIMEOUT = 5.0  # Seconds to wait for one watcher event before counting it as missed
+
+def make_tree(base, files, rows):
+    # TASKS/ and Templates/ under base: one template plus `files` tasks of `rows` rows each
+    tasks_dir = os.path.join(base, 'TASKS')
+    templates_dir = os.path.join(base, 'Templates')
+    os.makedirs(tasks_dir)
+    os.makedirs(templates_dir)
+    with open(TEMPLATE_PATH, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        sample = next(reader)
+    shutil.copy(TEMPLATE_PATH, templates_dir)
+    pos = {col: i for i, col in enumerate(header)}
+    for n in range(files):
+        path = os.path.join(tasks_dir, f'task-{n:05d}.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator='\r\n')
+            writer.writerow(header)
+            for i in range(rows):
+                row = list(sample)
+                row[pos['product']] = f'https://www.ticketmaster.com/event/{(n + i // 200) % EVENTS:04d}'
+                row[pos['account']] = f'user{n}-{i}@example.com:pw{i:06d}'
+                row[pos['profile_name']] = f'Profile{i:05d}'
+                row[pos['proxy_unique']] = f'proxy.example.com:61234:user-session-{n}-{i}:secret'
+                row[pos['presale']] = 'PRESALE' if n % 3 == 0 else ''
+                row[pos['price_range']] = '150-500' if n % 2 == 0 else ''
+                row[pos['extra_filter']] = f'{100 + n % 20}:100, FLR{n % 4},FLR{n % 4 + 1}:250'
+                writer.writerow(row)
+    return tasks_dir, templates_dir
+
+def summarize(samples):
+    # Seconds; min/median/mean/max of the repeats
+    return {
+        'n': len(samples),
+        'min': round(min(samples), 6),
+        'median': round(statistics.median(samples), 6),
+        'mean': round(statistics.fmean(samples), 6),
+        'max': round(max(samples), 6),
+    }
+
+def time_calls(fn, repeat, setup=None):
+    samples = []
+    for i in range(repeat):
+        if setup is not None:
+            setup(i)
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def bench_manager(tasks_dir, files, repeat, storage):
+    results = {}
+    manager = TaskManager(tasks_dir, storage=storage)
+    names = sorted(manager.list_tasks())
+    target = names[0]
+    try:
+        results['list_tasks'] = time_calls(lambda i: manager.list_tasks(), repeat)
+        results['load_task_cold'] = time_calls(lambda i: manager.load_task(target), repeat,
+                                               setup=lambda i: manager.invalidate(target))
+        results['load_task_warm'] = time_calls(lambda i: manager.load_task(target), repeat)
+        results['load_task_projected_cold'] = time_calls(lambda i: manager.load_task(target, DYNAMIC_FIELDS), repeat,
+                                                         setup=lambda i: manager.invalidate(target))
+        results['load_all_cold'] = time_calls(lambda i: [manager.load_task(n, DYNAMIC_FIELDS) for n in names],
+                                              max(1, repeat // 5), setup=lambda i: [manager.invalidate(n) for n in names])
+
+        def save(i):
+            df = manager.load_task(target)
+            df['presale'] = f'BENCH{i}'  # A real change each time, so the dirty check cannot skip it
+            manager.save_task(target, df, wait=True)
+        results['save_task'] = time_calls(save, repeat)
+
+        sources = names[:min(MERGE_FILES, files)]
+        if len(sources) >= 2:
+            merged = 'bench-merged.csv'
+            results['merge_tasks'] = time_calls(lambda i: manager.merge_tasks(sources, merged), repeat,
+                                                setup=lambda i: _remove(os.path.join(tasks_dir, merged), manager))
+            results['merge_tasks']['files'] = len(sources)
+            _remove(os.path.join(tasks_dir, merged), manager)
+
+        shard_files = [os.path.join(tasks_dir, n) for n in shard_names(target, [str(k) for k in range(1, SPLIT_SHARDS + 1)])]
+        results['split_task'] = time_calls(lambda i: manager.split_task(target, 'rows', SPLIT_SHARDS), repeat,
+                                           setup=lambda i: [_remove(p, manager) for p in shard_files])
+        results['split_task']['shards'] = SPLIT_SHARDS
+        for path in shard_files:
+            _remove(path, manager)
+    finally:
+        manager.close()
+    return results
+
+def _remove(path, manager):
+    if os.path.exists(path):
+        os.remove(path)
+    manager.invalidate(os.path.basename(path))
+
+def bench_codec(count):
+    # Throughput in operations per second over `count` distinct filter strings
+    entries = [[(f'{100 + i % 300}', str(50 + i % 400)), (f'FLR{i % 7},FLR{i % 7 + 1}', str(100 + i % 90)),
+                (f'{200 + i % 50}-{210 + i % 50}', '250')] for i in range(count)]
+    start = time.perf_counter()
+    values = [build_extra_filter(e) for e in entries]
+    build_s = time.perf_counter() - start
+    _parse_cached.cache_clear()
+    start = time.perf_counter()
+    for v in values:
+        parse_extra_filter(v)
+    parse_cold_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for v in values:
+        parse_extra_filter(v)
+    parse_warm_s = time.perf_counter() - start
+    return {
+        'strings': count,
+        'build_per_sec': round(count / build_s),
+        'parse_cold_per_sec': round(count / parse_cold_s),
+        'parse_warm_per_sec': round(count / parse_warm_s),
+    }
+
+class _HeadlessTree:
+    # The ttk.Treeview calls the task list makes, on a dict; notes when each row was inserted
+    def __init__(self):
+        self.rows = {}      # iid -> [parent, text]
+        self.inserted = {}  # iid -> time.perf_counter() of its insert
+
+    def insert(self, parent, index, iid, text=''):
+        self.rows[iid] = [parent, text]
+        self.inserted[iid] = time.perf_counter()
+
+    def exists(self, iid):
+        return iid in self.rows
+
+    def delete(self, *iids):
+        for iid in iids:
+            self.rows.pop(iid, None)
+
+    def move(self, iid, parent, index):
+        self.rows[iid][0] = parent
+
+    def item(self, iid, text=None, **options):
+        if text is not None:
+            self.rows[iid][1] = text
+
+    def get_children(self, parent=''):
+        return [iid for iid, (p, _) in self.rows.items() if p == parent]
+
+class _HeadlessLoop:
+    # root.after/after_idle for the app; run_due() plays the Tk main loop on the calling thread
+    def __init__(self):
+        self._scheduled = []  # (due perf_counter, callback)
+
+    def after(self, ms, callback):
+        self._scheduled.append((time.perf_counter() + ms / 1000, callback))
+
+    def after_idle(self, callback):
+        self.after(0, callback)
+
+    def run_due(self):
+        now = time.perf_counter()
+        due = [c for t, c in self._scheduled if t <= now]
+        self._scheduled = [(t, c) for t, c in self._scheduled if t > now]
+        for callback in due:
+            callback()
+
+def _headless_app(manager):
+    # The app's task list path without a window: its own watcher callback, event queue, poll tick
+    # (drain_task_events) and incremental tree update, on _HeadlessTree/_HeadlessLoop. The catalog
+    # and index updates, which run on their own thread in the app, are left out
+    from ui_main import TASK_EVENT_POLL_MS, SilentlyTaskGeneratorApp
+    app = SilentlyTaskGeneratorApp.__new__(SilentlyTaskGeneratorApp)
+    app.root = app.right_panel = _HeadlessLoop()
+    app.task_tree = _HeadlessTree()
+    app.task_manager = manager
+    app.task_events = queue.Queue()
+    app.search_matches = None
+    app.search_var = SimpleNamespace(get=lambda: '')
+    app.sort_mode = SimpleNamespace(get=lambda: 'Name')
+    app.task_info, app.invalid_tasks = {}, {}
+    app.catalog = app.collisions = app.search = app.validator = SimpleNamespace(on_file_event=None)
+    app.submit_catalog_update = lambda *args, **kwargs: None
+    app.catalog_executor = SimpleNamespace(submit=lambda *args: None)
+    app.refresh_task_list()
+    app.root.after(TASK_EVENT_POLL_MS, app.drain_task_events)
+    return app
+
+def bench_watcher(tasks_dir, repeat, storage):
+    # From an atomic save by another process (temp file + rename) until the task's row is in
+    # the task list: watcher thread, the app's event queue, the wait for its next poll tick
+    # (up to TASK_EVENT_POLL_MS) and apply_task_list_changes, as in the app minus drawing
+    manager = TaskManager(tasks_dir, storage=storage)
+    try:
+        app = _headless_app(manager)
+    except ImportError as e:  # ui_main needs tkinter importable (not a display)
+        manager.close()
+        return {'n': 0, 'skipped': str(e)}
+    df = read_task_csv(TEMPLATE_PATH)
+    watcher = FileWatcher(tasks_dir, app.on_tasks_dir_change)
+    watcher.start()
+    samples, missed = [], 0
+    try:
+        for i in range(repeat):
+            name = f'watch-{i:04d}.csv'
+            tmp = os.path.join(tasks_dir, f'.{name}.bench')
+            df.to_csv(tmp, index=False)
+            start = time.perf_counter()
+            os.replace(tmp, os.path.join(tasks_dir, name))
+            while name not in app.task_tree.inserted and time.perf_counter() - start < WATCH_TIMEOUT:
+                app.root.run_due()
+                time.sleep(0.001)
+            if name in app.task_tree.inserted:
+                samples.append(app.task_tree.inserted[name] - start)
+            else:
+                missed += 1
+    finally:
+        watcher.stop()
+        manager.close()
+        for i in range(repeat):
+            _remove(os.path.join(tasks_dir, f'watch-{i:04d}.csv'), manager)
+    result = summarize(samples) if samples else {'n': 0}
+    result['missed'] = missed
+    return result
+
+def bench_search(tasks_dir, repeat):
+    # Building the inverted index once, then typical search box queries against it
+    index = SearchIndex(tasks_dir)
+    start = time.perf_counter()
+    index.sync()
+    results = {'search_build': summarize([time.perf_counter() - start])}
+    for label, query in (('search_presale', 'presale:pre'), ('search_section', 'section:flr2'),
+                         ('search_event', 'event/0001'), ('search_free_text', 't')):
+        results[label] = time_calls(lambda i: index.search(query), repeat)
+    return results
+
+def bench_validate(tasks_dir):
+    # Full check of every task (process pool), then the incremental re-check with nothing changed
+    validator = TaskValidator(tasks_dir, os.path.join(os.path.dirname(tasks_dir), 'validation_report.json'))
+    results = {}
+    for label in ('validate_full', 'validate_incremental'):
+        start = time.perf_counter()
+        validator.sync()
+        results[label] = summarize([time.perf_counter() - start])
+    return results
+
+def run_scenario(files, rows, repeat, codec_strings):
+    base = tempfile.mkdtemp(prefix='taskgen-bench-')
+    try:
+        start = time.perf_counter()
+        tasks_dir, _ = make_tree(base, files, rows)
+        storage = default_storage()
+        if hasattr(storage, 'working_dir'):
+            storage.working_dir = os.path.join(base, 'working_copy')  # Keep working copies inside the tree
+        result = {'files': files, 'rows': rows, 'storage': storage.name,
+                  'generate_tree_s': round(time.perf_counter() - start, 4)}
+        result.update(bench_manager(tasks_dir, files, repeat, storage))
+        result.update(bench_search(tasks_dir, repeat))
+        result.update(bench_validate(tasks_dir))
+        result['codec'] = bench_codec(codec_strings)
+        result['watcher_list_latency'] = bench_watcher(tasks_dir, repeat, storage)
+        return result
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+def _git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(previous, current):
+    # Lines of "scenario metric: old -> new (ratio)" for every median present in both runs
+    old = {(s['files'], s['rows']): s for s in previous['scenarios']}
+    lines = []
+    for scenario in current['scenarios']:
+        before = old.get((scenario['files'], scenario['rows']))
+        if before is None:
+            continue
+        for metric, value in scenario.items():
+            if isinstance(value, dict) and 'median' in value and 'median' in before.get(metric, {}):
+                a, b = before[metric]['median'], value['median']
+                ratio = f'{b / a:.2f}x' if a else 'n/a'
+                lines.append(f"{scenario['files']}x{scenario['rows']} {metric}: {a * 1000:.2f}ms -> {b * 1000:.2f}ms ({ratio})")
+    return lines
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark task loading, saving, merging and watching.')
+    parser.add_argument('--files', type=int, nargs='+', default=[10, 100], help='task files per scenario')
+    parser.add_argument('--rows', type=int, nargs='+', default=[400], help='rows per task file')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--codec-strings', type=int, default=20000)
+    parser.add_argument('--out', default=None, help='JSON output path (default: benchmark-<timestamp>.json)')
+    parser.add_argument('--compare', default=None, help='earlier JSON result to compare against')
+    args = parser.parse_args(argv)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'scenarios': [],
+    }
+    for files in args.files:
+        for rows in args.rows:
+            print(f'{files} files x {rows} rows...', flush=True)
+            report['scenarios'].append(run_scenario(files, rows, args.repeat, args.codec_strings))
+
+    out = args.out or f"benchmark-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    for scenario in report['scenarios']:
+        print(f"{scenario['files']} files x {scenario['rows']} rows:")
+        for metric, value in scenario.items():
+            if isinstance(value, dict) and 'median' in value:
+                print(f'  {metric:26} median {value["median"] * 1000:9.2f} ms')
+        codec = scenario['codec']
+        print(f"  {'extra_filter codec':26} build {codec['build_per_sec']}/s, parse {codec['parse_cold_per_sec']}/s cold, "
+              f"{codec['parse_warm_per_sec']}/s cached")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print('\n'.join(compare(json.load(f), report)))
+    print(f'Results written to {out}')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from extra_filter_builder import build_extra_filter, is_valid_extra_filter
+from task_manager import normalize_task_name
+from task_writer import write_records
+from template_registry import TemplateRegistry
+
+# Manifest column -> task field ('filters' is accepted as a short name for extra_filter)
+MANIFEST_FIELDS = {
+    'product': 'product',
+    'presale': 'presale',
+    'price_range': 'price_range',
+    'extra_filter': 'extra_filter',
+    'filters': 'extra_filter',
+}
+
+def load_manifest(path):
+    """
+    Read a bulk manifest: a CSV with a header row, or a JSON list of objects.
+    Each entry needs 'name', 'template' and 'product'; 'presale', 'price_range'
+    and 'filters'/'extra_filter' are optional. In JSON, filters may also be a
+    list of [section, price] pairs.
+    """
+    if path.lower().endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        if not isinstance(entries, list):
+            raise ValueError('A JSON manifest must be a list of objects')
+    else:
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            entries = list(csv.DictReader(f))
+    return [_normalize_entry(e) for e in entries]
+
+def _normalize_entry(entry):
+    fields = {}
+    for key, field in MANIFEST_FIELDS.items():
+        value = entry.get(key)
+        if value is None or value == '':
+            continue
+        if isinstance(value, list):
+            value = build_extra_filter(value)
+        fields[field] = str(value).strip()
+    name = str(entry.get('name') or '').strip()
+    template = str(entry.get('template') or '').strip()
+    return {
+        'name': normalize_task_name(name) if name else '',
+        'template': normalize_task_name(template) if template else '',
+        'fields': fields,
+    }
+
+def check_manifest(entries, tasks_dir, templates_dir):
+    # Every problem that would stop the run, as readable strings; [] means safe to write
+    errors = []
+    seen = {}
+    existing = {f.lower() for f in os.listdir(tasks_dir)}
+    for i, entry in enumerate(entries, start=1):
+        name = entry['name']
+        if not name:
+            errors.append(f'line {i}: missing name')
+            continue
+        if name.lower() in seen:
+            errors.append(f'line {i}: "{name}" is also used on line {seen[name.lower()]}')
+        seen.setdefault(name.lower(), i)
+        if name.lower() in existing or os.path.exists(os.path.join(tasks_dir, name)):
+            errors.append(f'line {i}: a task named "{name}" already exists')
+        if not entry['template']:
+            errors.append(f'line {i}: missing template')
+        elif not os.path.exists(os.path.join(templates_dir, entry['template'])):
+            errors.append(f'line {i}: template "{entry["template"]}" not found')
+        if not entry['fields'].get('product'):
+            errors.append(f'line {i}: missing product (event URL)')
+        if not is_valid_extra_filter(entry['fields'].get('extra_filter')):
+            errors.append(f'line {i}: malformed extra_filter "{entry["fields"]["extra_filter"]}"')
+    return errors
+
+def _write_one(path, header, records, fields):
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(path), exist_ok=True)  # Names may include a subfolder ('venue/drake.csv')
+    write_records(path, header, records, fields)
+    return time.perf_counter() - start
+
+def generate_from_manifest(entries, tasks_dir, templates_dir, max_workers=8, use_processes=False, registry=None):
+    """
+    Create one task per manifest entry. Nothing is written if any entry fails
+    check_manifest. Each template's raw CSV records come from registry (a
+    TemplateRegistry over templates_dir, so a template already read is not read
+    again); every task is a copy of those bytes with only the dynamic fields
+    rewritten (see task_writer.stage_records), written in parallel. Returns a
+    report dict.
+    """
+    started = time.perf_counter()
+    errors = check_manifest(entries, tasks_dir, templates_dir)
+    if errors:
+        return {'ok': False, 'errors': errors, 'created': [], 'failed': []}
+
+    registry = registry or TemplateRegistry(templates_dir)
+    templates = {name: registry.get(name) for name in {e['template'] for e in entries}}
+
+    created, failed = [], []
+    pool_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with pool_cls(max_workers=max_workers) as pool:
+        futures = []
+        for entry in entries:
+            header, records = templates[entry['template']]
+            path = os.path.join(tasks_dir, entry['name'])
+            futures.append((entry, len(records), pool.submit(_write_one, path, header, records, entry['fields'])))
+        for entry, rows, future in futures:
+            try:
+                seconds = future.result()
+                created.append({'task': entry['name'], 'template': entry['template'], 'rows': rows,
+                                'seconds': round(seconds, 4)})
+            except Exception as e:
+                failed.append({'task': entry['name'], 'error': str(e)})
+    return {
+        'ok': not failed,
+        'errors': [],
+        'created': created,
+        'failed': failed,
+        'templates_parsed': len(templates),
+        'seconds': round(time.perf_counter() - started, 4),
+    }
@@ -0,0 +1,88 @@
+import os
+
+from task_index import TaskIndex
+
+# Columns that must not be shared by two tasks aimed at the same event
+COLLISION_FIELDS = ('account', 'proxy_unique')
+
+def scan_task_keys(name, header, rows):
+    # (field, product, value) for every account/proxy of one task (see task_index.read_task_rows)
+    keys = set()
+    positions = {col: i for i, col in enumerate(header)}
+    product_pos = positions.get('product')
+    wanted = [(field, positions[field]) for field in COLLISION_FIELDS if field in positions]
+    if product_pos is None or not wanted:
+        return keys
+    for row in rows:
+        product = row[product_pos] if product_pos < len(row) else ''
+        if not product:
+            continue
+        for field, pos in wanted:
+            if pos < len(row) and row[pos]:
+                keys.add((field, product, row[pos]))
+    return keys
+
+class CollisionIndex(TaskIndex):
+    """
+    In-memory hash index of (field, product, value) -> task files, over the
+    account and proxy_unique columns of every task. Files are re-scanned only
+    when (mtime, size) change, so lookups stay cheap as the watcher reports edits.
+    """
+    scan_rows = staticmethod(scan_task_keys)
+
+    def __init__(self, tasks_dir):
+        super().__init__(tasks_dir)  # _files: filename -> (mtime_ns, size, keys)
+        self._owners = {}  # (field, product, value) -> set of filenames
+
+    def _store(self, filename, st, keys):
+        with self._lock:
+            old = self._files.get(filename, (0, 0, set()))[2]
+            self._files[filename] = (st.st_mtime_ns, st.st_size, keys)
+            for key in old - keys:
+                self._discard(key, filename)
+            for key in keys - old:
+                self._owners.setdefault(key, set()).add(filename)
+        return old != keys
+
+    def _drop(self, filename):
+        with self._lock:
+            known = self._files.pop(filename, None)
+            if known is None:
+                return False
+            for key in known[2]:
+                self._discard(key, filename)
+        return True
+
+    def _discard(self, key, filename):
+        owners = self._owners.get(key)
+        if owners is not None:
+            owners.discard(filename)
+            if not owners:
+                del self._owners[key]
+
+    def collisions(self, filename):
+        # [{'field', 'product', 'value', 'tasks'}] for keys of this file that other files also use
+        with self._lock:
+            known = self._files.get(filename)
+            if known is None:
+                return []
+            found = [(key, self._owners[key]) for key in known[2] if len(self._owners.get(key, ())) > 1]
+            return sorted(({'field': field, 'product': product, 'value': value,
+                            'tasks': sorted(owners - {filename})}
+                           for (field, product, value), owners in found),
+                          key=lambda c: (c['field'], c['product'], c['value']))
+
+    def all_collisions(self):
+        # Every shared key in the directory, as above but 'tasks' lists all the files involved
+        with self._lock:
+            found = [(key, sorted(owners)) for key, owners in self._owners.items() if len(owners) > 1]
+        return sorted(({'field': field, 'product': product, 'value': value, 'tasks': owners}
+                       for (field, product, value), owners in found),
+                      key=lambda c: (c['field'], c['product'], c['value']))
+
+if __name__ == "__main__":
+    # Minimal test: index the TASKS directory and print shared accounts/proxies
+    index = CollisionIndex(os.path.join(os.path.dirname(__file__), '../shhh/tasks/TASKS'))
+    print("Indexed:", len(index.sync()), "files")
+    for c in index.all_collisions():
+        print(c['field'], c['value'], c['product'], ', '.join(c['tasks']))
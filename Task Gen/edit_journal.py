@@ -0,0 +1,155 @@
+"""
+Undo/redo for the task open in the detail panel.
+
+Each applied edit is stored as column-level diffs against the frame it was
+applied to: for every field, the positions of the rows whose value actually
+changed, their old values and the new value. Nothing else of the frame is
+copied, so memory follows the size of the edits rather than of the task.
+When a field had one value on all of those rows (the usual case, since a
+product's rows share their settings) the old value is kept once, not per row.
+
+    journal = EditJournal()
+    journal.apply(df, [(rows, {'presale': 'CODE'})])  # also edits df
+    journal.undo(df); journal.redo(df)
+    journal.mark_saved()          # df now matches the file
+    journal.revert(df)            # back to the last saved state, no disk I/O
+"""
+from task_manager import check_fields
+
+MAX_DEPTH = 200  # Oldest steps are dropped beyond this
+
+def _missing(value):
+    # None, NaN, pd.NA and '' all end up as an empty CSV cell
+    try:
+        return value is None or value != value or value == ''
+    except TypeError:
+        return True  # pd.NA refuses to compare
+
+def _same(a, b):
+    missing_a, missing_b = _missing(a), _missing(b)
+    return missing_a and missing_b if missing_a or missing_b else a == b
+
+class _Diff:
+    __slots__ = ('field', 'positions', 'old', 'new')
+
+    def __init__(self, field, positions, old, new):
+        self.field = field
+        self.positions = positions  # numpy int array of the rows that changed
+        self.old = old              # one value for all positions, or an object array per position
+        self.new = new
+
+class EditJournal:
+    def __init__(self, max_depth=MAX_DEPTH):
+        self.max_depth = max_depth
+        self._undo = []   # [[_Diff, ...], ...], oldest first
+        self._redo = []
+        self._saved = 0   # len(_undo) when df last matched the file; None if that step was dropped
+
+    def clear(self):
+        # New task loaded: the frame is the saved state
+        self._undo.clear()
+        self._redo.clear()
+        self._saved = 0
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def is_saved(self):
+        return self._saved == len(self._undo)
+
+    def mark_saved(self):
+        self._saved = len(self._undo)
+
+    def mark_unsaved(self):
+        # A save did not reach the file: no step is known to match it any more (revert reloads)
+        self._saved = None
+
+    def apply(self, df, edits):
+        # Apply [(row_positions, {field: value}), ...] to df in place and record it as one
+        # step; rows that already hold the value are left out. Returns the changed fields
+        import numpy as np
+        diffs = []
+        for positions, fields in edits:
+            check_fields(fields)
+            positions = np.asarray(positions, dtype=np.intp)
+            for field, value in fields.items():
+                if field not in df.columns:
+                    df[field] = np.full(len(df), None, dtype=object)
+                current = df[field].to_numpy(dtype=object)[positions]
+                changed = np.fromiter((not _same(v, value) for v in current), dtype=bool, count=len(current))
+                if changed.any():
+                    diffs.append(_Diff(field, positions[changed], self._pack(current[changed]), value))
+        if not diffs:
+            return []
+        self._write(df, diffs, new=True)
+        self._undo.append(diffs)
+        self._redo.clear()
+        if self._saved is not None and self._saved >= len(self._undo):
+            self._saved = None  # The saved state was on the redo branch just discarded
+        if len(self._undo) > self.max_depth:
+            del self._undo[0]
+            self._saved = None if self._saved in (None, 0) else self._saved - 1
+        return sorted({d.field for d in diffs})
+
+    def undo(self, df):
+        # Step df back once; returns the fields it touched ([] if there was nothing to undo)
+        if not self._undo:
+            return []
+        diffs = self._undo.pop()
+        self._write(df, diffs, new=False)
+        self._redo.append(diffs)
+        return sorted({d.field for d in diffs})
+
+    def redo(self, df):
+        if not self._redo:
+            return []
+        diffs = self._redo.pop()
+        self._write(df, diffs, new=True)
+        self._undo.append(diffs)
+        return sorted({d.field for d in diffs})
+
+    def revert(self, df):
+        # Undo/redo back to the last saved state. Returns the fields touched, or None when
+        # that state is no longer in the journal (the caller has to reload the file)
+        if self._saved is None:
+            return None
+        fields = set()
+        while len(self._undo) > self._saved:
+            fields.update(self.undo(df))
+        while len(self._undo) < self._saved and self._redo:
+            fields.update(self.redo(df))
+        return sorted(fields)
+
+    @staticmethod
+    def _pack(values):
+        # One shared old value instead of an array when every row had the same one
+        first = values[0]
+        if all(_same(v, first) for v in values[1:]):
+            return first
+        return values
+
+    @staticmethod
+    def _write(df, diffs, new):
+        # One column assignment per field touched by the step
+        columns = {}
+        for diff in (diffs if new else reversed(diffs)):
+            if diff.field not in columns:
+                columns[diff.field] = df[diff.field].to_numpy(dtype=object, copy=True)
+            columns[diff.field][diff.positions] = diff.new if new else diff.old
+        for field, values in columns.items():
+            df[field] = values
+
+if __name__ == "__main__":
+    # Minimal test: edit, undo, redo and revert a small frame
+    import pandas as pd
+    df = pd.DataFrame({'product': ['a', 'a', 'b'], 'presale': ['X', 'X', None]})
+    journal = EditJournal()
+    print("Changed:", journal.apply(df, [([0, 1], {'presale': 'Y'})]), list(df['presale']))
+    journal.mark_saved()
+    journal.apply(df, [([2], {'presale': 'Z'})])
+    print("Undo:", journal.undo(df), list(df['presale']))
+    print("Redo:", journal.redo(df), list(df['presale']))
+    print("Revert:", journal.revert(df), list(df['presale']), journal.is_saved())
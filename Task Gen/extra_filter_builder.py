@@ -1,3 +1,13 @@
+import re
+from functools import lru_cache
+
+# One '<sections>:<price>' entry; sections may be grouped ('FLR2,FLR3,FLR4') or ranged ('105-108')
+_SECTION = r'[^,:\s][^,:]*'
+_ENTRY = rf'\s*{_SECTION}(?:\s*,\s*{_SECTION})*\s*:\s*\d+(?:\.\d+)?\s*'
+EXTRA_FILTER_RE = re.compile(rf'{_ENTRY}(?:,{_ENTRY})*')
+_RANGE_RE = re.compile(r'^(\D*)(\d+)\s*-\s*(\D*)(\d+)$')
+MAX_RANGE_SPAN = 1000  # Anything wider is kept as a literal section name
+
 def build_extra_filter(section_price_list):
     """
     Given a list of (section, price) tuples, return a string like:
@@ -5,6 +15,130 @@ def build_extra_filter(section_price_list):
     """
     return ', '.join(f"{section}:{price}" for section, price in section_price_list if section and price)
 
+def parse_extra_filter(value):
+    """
+    Inverse of build_extra_filter: '100:100, FLR2,FLR3,FLR4:326' ->
+    [('100', '100'), ('FLR2,FLR3,FLR4', '326')]. Repeat strings are served from a cache.
+    """
+    if not value or not isinstance(value, str):
+        return []
+    return list(_parse_cached(value))
+
+@lru_cache(maxsize=4096)
+def _parse_cached(value):
+    # Split on commas, but keep comma-separated sections that share one price together
+    parts = []
+    current_part = []
+    for item in value.split(','):
+        item = item.strip()
+        if ':' in item:
+            current_part.append(item)
+            parts.append(','.join(current_part))
+            current_part = []
+        else:
+            current_part.append(item)
+    if current_part:
+        parts.append(','.join(current_part))
+
+    filters = []
+    for part in parts:
+        if ':' in part:
+            # Split on the last colon to handle sections that might contain colons
+            sections, price = part.rsplit(':', 1)
+            filters.append((sections.strip(), price.strip()))
+        elif part:
+            filters.append((part.strip(), ''))
+    return tuple(filters)
+
+@lru_cache(maxsize=4096)
+def expand_sections(sections):
+    """
+    Individual section names behind one filter entry:
+    'FLR2,FLR3' -> ('FLR2', 'FLR3'), '105-108' -> ('105', '106', '107', '108'),
+    'FLR1-FLR3' -> ('FLR1', 'FLR2', 'FLR3').
+    """
+    result = []
+    for name in (s.strip() for s in sections.split(',')):
+        if not name:
+            continue
+        m = _RANGE_RE.match(name)
+        if m and (not m.group(3) or m.group(3) == m.group(1)):
+            prefix, lo, hi = m.group(1), int(m.group(2)), int(m.group(4))
+            if lo <= hi and hi - lo <= MAX_RANGE_SPAN:
+                result.extend(f'{prefix}{n}' for n in range(lo, hi + 1))
+                continue
+        result.append(name)
+    return tuple(result)
+
+def edit_extra_filter(value, add=(), remove=()):
+    """
+    Add (section, price) entries to an extra_filter string and/or drop sections
+    from it: edit_extra_filter('FLR2,FLR3:50, 100:100', add=[('100', '120')],
+    remove=['FLR3']) -> 'FLR2:50, 100:120'. An added section that is already
+    listed on its own gets the new price; removed names are matched
+    case-insensitively against the listed sections (ranges are not split).
+    Returns value itself when nothing changes.
+    """
+    entries = parse_extra_filter(value) if isinstance(value, str) else []
+    dropped = {s.strip().lower() for s in remove if s.strip()}
+    result = []
+    for sections, price in entries:
+        if dropped:
+            kept = [s.strip() for s in sections.split(',') if s.strip().lower() not in dropped]
+            if not kept:
+                continue
+            sections = ','.join(kept)
+        result.append((sections, price))
+    for section, price in add:
+        key = section.strip().lower()
+        for i, (sections, _) in enumerate(result):
+            if sections.lower() == key:
+                result[i] = (sections, price)
+                break
+        else:
+            result.append((section.strip(), price))
+    if result == entries:
+        return value
+    return build_extra_filter(result)
+
+def is_valid_extra_filter(value):
+    # Empty is valid (the field is optional); otherwise every entry needs sections and a numeric price
+    if value is None or (isinstance(value, float) and value != value):
+        return True
+    value = str(value).strip()
+    return not value or EXTRA_FILTER_RE.fullmatch(value) is not None
+
+def validate_extra_filter_column(values):
+    # Vectorized is_valid_extra_filter over a pandas Series; returns a boolean Series
+    text = values.fillna('').astype(str).str.strip()
+    return text.eq('') | text.str.fullmatch(EXTRA_FILTER_RE.pattern).fillna(False).astype(bool)
+
+def parse_extra_filter_column(values):
+    # parse_extra_filter over a pandas Series; each distinct string is parsed only once
+    import pandas as pd
+    codes, uniques = pd.factorize(values)
+    parsed = [parse_extra_filter(u) for u in uniques]
+    return pd.Series([parsed[c] if c >= 0 else [] for c in codes], index=values.index, dtype=object)
+
+def explode_extra_filter_column(values):
+    """
+    One row per (original row, section, price) with grouped sections and ranges
+    expanded; the index points back at the row of `values` each filter came from.
+    """
+    import pandas as pd
+    codes, uniques = pd.factorize(values)
+    per_unique = [[(s, price) for sections, price in parse_extra_filter(u) for s in expand_sections(sections)]
+                  for u in uniques]
+    index, sections, prices = [], [], []
+    for label, code in zip(values.index, codes):
+        if code < 0:
+            continue
+        for s, price in per_unique[code]:
+            index.append(label)
+            sections.append(s)
+            prices.append(price)
+    return pd.DataFrame({'section': sections, 'price': prices}, index=pd.Index(index, name=values.index.name))
+
 if __name__ == "__main__":
     # Minimal test
     test_data = [
@@ -14,4 +148,6 @@ if __name__ == "__main__":
     ]
     result = build_extra_filter(test_data)
     print("Result:", result)
-    # Should print: 100:100, 105-108:250, FloorA:150 
\ No newline at end of file
+    # Should print: 100:100, 105-108:250, FloorA:150
+    print("Parsed:", parse_extra_filter('FLR1:350, FLR2,FLR3,FLR4:326, FLR6:250'))
+    print("Sections:", expand_sections('105-108'), expand_sections('FLR2,FLR3,FLR4'))
@@ -3,30 +3,47 @@ from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
 class FileWatcher:
-    def __init__(self, directory, on_change_callback):
-        self.directory = directory
+    def __init__(self, directory, on_change_callback, recursive=False):
+        # directory may also be a list of directories. With recursive=True, subfolders are
+        # watched too and a folder being created/deleted/moved is reported as ('directory', path)
+        self.directories = [directory] if isinstance(directory, (str, os.PathLike)) else list(directory)
+        self.directory = self.directories[0]
+        self.recursive = recursive
         self.on_change_callback = on_change_callback
         self.event_handler = self._create_event_handler()
         self.observer = Observer()
 
     def _create_event_handler(self):
         class Handler(FileSystemEventHandler):
-            def __init__(self, callback):
+            def __init__(self, callback, recursive):
                 super().__init__()
                 self.callback = callback
+                self.recursive = recursive
             def on_created(self, event):
                 if not event.is_directory:
                     self.callback('created', event.src_path)
+                elif self.recursive:
+                    self.callback('directory', event.src_path)
             def on_deleted(self, event):
                 if not event.is_directory:
                     self.callback('deleted', event.src_path)
+                elif self.recursive:
+                    self.callback('directory', event.src_path)
             def on_moved(self, event):
                 if not event.is_directory:
                     self.callback('moved', event.src_path, event.dest_path)
-        return Handler(self.on_change_callback)
+                elif self.recursive:
+                    self.callback('directory', event.src_path, event.dest_path)
+            def on_modified(self, event):
+                # A file rewritten in place (e.g. by the bot); a folder's own modified
+                # events only echo the file events inside it
+                if not event.is_directory:
+                    self.callback('modified', event.src_path)
+        return Handler(self.on_change_callback, self.recursive)
 
     def start(self):
-        self.observer.schedule(self.event_handler, self.directory, recursive=False)
+        for directory in self.directories:
+            self.observer.schedule(self.event_handler, directory, recursive=self.recursive)
         self.observer.start()
 
     def stop(self):
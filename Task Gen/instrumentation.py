@@ -0,0 +1,123 @@
+"""
+Opt-in timing and counters for finding slow stages (load, save, merge, watcher
+dispatch, widget build). Off unless TASKGEN_TRACE is set:
+
+    TASKGEN_TRACE=1                  -> taskgen-trace.jsonl next to this file
+    TASKGEN_TRACE=/tmp/trace.jsonl   -> that file
+
+Each timer and each counter dump is one JSON line; the file rotates at
+TASKGEN_TRACE_MAX_BYTES (default 5 MB) keeping 3 backups.
+
+    with timer('load_task', task=filename):
+        ...
+    count('cache_hit')
+"""
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+TRACE_ENV = 'TASKGEN_TRACE'
+MAX_BYTES_ENV = 'TASKGEN_TRACE_MAX_BYTES'
+DEFAULT_TRACE_PATH = os.path.join(os.path.dirname(__file__), 'taskgen-trace.jsonl')
+BACKUP_COUNT = 3
+
+_logger = logging.getLogger('taskgen.trace')
+_logger.propagate = False
+_counters = {}
+_counters_lock = threading.Lock()
+_enabled = False
+
+def configure(path=None, max_bytes=None):
+    # Start writing trace lines to path (called from the environment on import)
+    global _enabled
+    for handler in list(_logger.handlers):
+        _logger.removeHandler(handler)
+        handler.close()
+    if not path:
+        _enabled = False
+        return
+    handler = RotatingFileHandler(path, maxBytes=max_bytes or 5 * 1024 * 1024, backupCount=BACKUP_COUNT,
+                                  encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    _logger.addHandler(handler)
+    _logger.setLevel(logging.INFO)
+    _enabled = True
+
+def enabled():
+    return _enabled
+
+def _emit(record):
+    record['ts'] = round(time.time(), 6)
+    record['thread'] = threading.current_thread().name
+    _logger.info(json.dumps(record, default=str))
+
+class _Timer:
+    __slots__ = ('name', 'fields', 'start')
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record = {'type': 'timer', 'name': self.name, 'ms': round((time.perf_counter() - self.start) * 1000, 3)}
+        record.update(self.fields)
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        _emit(record)
+        return False
+
+_NULL_TIMER = contextlib.nullcontext()
+
+def timer(name, **fields):
+    # Context manager that logs how long its block took (a shared no-op when disabled)
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name, fields)
+
+def count(name, n=1):
+    # Bump a named counter; counters are written out by dump_counters()
+    if not _enabled:
+        return
+    with _counters_lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def event(name, **fields):
+    # Log a one-off occurrence (e.g. a failure worth correlating with timings)
+    if _enabled:
+        _emit({'type': 'event', 'name': name, **fields})
+
+def counters():
+    with _counters_lock:
+        return dict(_counters)
+
+def dump_counters(reset=False):
+    # Write the current counters as one line (e.g. on exit)
+    if not _enabled:
+        return
+    with _counters_lock:
+        snapshot = dict(_counters)
+        if reset:
+            _counters.clear()
+    _emit({'type': 'counters', 'counters': snapshot})
+
+_trace = os.environ.get(TRACE_ENV, '').strip()
+if _trace and _trace != '0':
+    configure(DEFAULT_TRACE_PATH if _trace == '1' else _trace,
+              int(os.environ.get(MAX_BYTES_ENV) or 0) or None)
+
+if __name__ == "__main__":
+    # Minimal test: time a sleep and show where the trace went
+    configure(DEFAULT_TRACE_PATH)
+    with timer('sleep', seconds=0.01):
+        time.sleep(0.01)
+    count('demo')
+    dump_counters()
+    print("Trace written to", DEFAULT_TRACE_PATH)
@@ -0,0 +1,129 @@
+import csv
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from task_writer import DEFAULT_LINE_TERMINATOR, line_terminator, make_temp_file
+
+# Rows handed from a reader thread to the writer in one go
+CHUNK_ROWS = 500
+# Chunks a reader may buffer ahead of the writer; bounds memory per open file
+PREFETCH_CHUNKS = 2
+
+_DONE = object()
+
+def read_header(path):
+    # Return the header row of a CSV file ([] for an empty file); a BOM (Excel) is not part of it
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        return next(csv.reader(f), [])
+
+def union_columns(headers, columns=None):
+    # Union of all headers in a fixed order: the pinned `columns` first (if given),
+    # then every other column in order of first appearance across the inputs
+    order = list(columns) if columns else []
+    seen = set(order)
+    for header in headers:
+        for col in header:
+            if col not in seen:
+                seen.add(col)
+                order.append(col)
+    return order
+
+def _read_chunks(path, out_queue, stop_event):
+    # Producer: push lists of rows (header excluded) into out_queue, then _DONE
+    def put(item):
+        while not stop_event.is_set():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            chunk = []
+            for row in reader:
+                chunk.append(row)
+                if len(chunk) >= CHUNK_ROWS:
+                    if not put(chunk):
+                        return
+                    chunk = []
+            if chunk and not put(chunk):
+                return
+        put(_DONE)
+    except Exception as e:
+        put(e)
+
+def merge_task_files(paths, dest_path, columns=None, max_workers=4):
+    """
+    Merge the rows of several task CSVs into dest_path in a single streaming pass.
+    Inputs are read ahead in parallel but only a few chunks per file are ever held
+    in memory. Mismatched headers are unioned (see union_columns) and missing
+    cells are left empty. Lines end like the first input's header (CRLF for the
+    bot's files) whatever the platform. Returns {'columns': [...], 'rows': {path: n}, 'total_rows': n}.
+    """
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='merge-reader') as pool:
+        headers = list(pool.map(read_header, paths))
+        out_columns = union_columns(headers, columns)
+        positions = {col: i for i, col in enumerate(out_columns)}
+        terminator = line_terminator(paths[0]) if paths else DEFAULT_LINE_TERMINATOR
+
+        stop_event = threading.Event()
+        queues = [queue.Queue(maxsize=PREFETCH_CHUNKS) for _ in paths]
+        row_counts = {}
+        tmp_path = None
+        # Everything after the readers start is inside the try: any failure must set stop_event,
+        # or readers blocked on a full queue keep the pool (and its shutdown) waiting forever
+        try:
+            # Submission order == consumption order, so the file being written always has a reader
+            for path, q in zip(paths, queues):
+                pool.submit(_read_chunks, path, q, stop_event)
+            fd, tmp_path = make_temp_file(dest_path)
+            with os.fdopen(fd, 'w', newline='', encoding='utf-8') as out:
+                writer = csv.writer(out, lineterminator=terminator)
+                writer.writerow(out_columns)
+                for path, header, q in zip(paths, headers, queues):
+                    if header == out_columns:
+                        remap = None  # Fast path: rows already line up with the output
+                    else:
+                        remap = [positions[col] for col in header]
+                    count = 0
+                    while True:
+                        item = q.get()
+                        if item is _DONE:
+                            break
+                        if isinstance(item, Exception):
+                            raise item
+                        if remap is None:
+                            writer.writerows(item)
+                        else:
+                            width = len(out_columns)
+                            for row in item:
+                                out_row = [''] * width
+                                for pos, value in zip(remap, row):
+                                    out_row[pos] = value
+                                writer.writerow(out_row)
+                        count += len(item)
+                    row_counts[path] = count
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            stop_event.set()
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    return {'columns': out_columns, 'rows': row_counts, 'total_rows': sum(row_counts.values())}
+
+if __name__ == "__main__":
+    # Minimal test: merge the bundled template with itself
+    template = os.path.join(os.path.dirname(__file__), '400Template.csv')
+    dest = os.path.join(os.path.dirname(__file__), 'merge_test_output.csv')
+    result = merge_task_files([template, template], dest)
+    print("Merged rows:", result['rows'], "Total:", result['total_rows'])
+    os.remove(dest)
@@ -0,0 +1,158 @@
+import bisect
+import os
+import re
+
+from extra_filter_builder import expand_sections, parse_extra_filter
+from task_index import TaskIndex
+
+# Searchable fields; 'section' holds the individual sections behind extra_filter
+SEARCH_FIELDS = ('name', 'product', 'presale', 'price', 'section')
+FIELD_ALIASES = {'file': 'name', 'event': 'product', 'url': 'product', 'price_range': 'price',
+                 'filter': 'section', 'extra_filter': 'section'}
+_COLUMNS = {'product': 'product', 'presale': 'presale', 'price_range': 'price'}
+_WORD_RE = re.compile(r'[0-9a-z]+')
+
+def _add_value(terms, field, value):
+    # The whole value plus each alphanumeric word in it, so 'event/0B00608A' is found by '0b00608a'
+    value = value.strip().lower()
+    if not value:
+        return
+    terms.add(f'{field}:{value}')
+    for word in _WORD_RE.findall(value):
+        terms.add(f'{field}:{word}')
+
+def scan_task_terms(name, header, rows):
+    # Index terms ('field:token') for one task (see task_index.read_task_rows)
+    terms = set()
+    _add_value(terms, 'name', name)
+    positions = {col: i for i, col in enumerate(header)}
+    wanted = [(col, positions[col]) for col in (*_COLUMNS, 'extra_filter') if col in positions]
+    # Tasks repeat the same few values on every row; tokenize each distinct one once
+    values = {col: set() for col, _ in wanted}
+    for row in rows:
+        for col, pos in wanted:
+            if pos < len(row) and row[pos]:
+                values[col].add(row[pos])
+    for col, seen in values.items():
+        for value in seen:
+            if col == 'extra_filter':
+                for sections, _ in parse_extra_filter(value):
+                    for section in expand_sections(sections):
+                        _add_value(terms, 'section', section)
+            else:
+                _add_value(terms, _COLUMNS[col], value)
+    return terms
+
+def parse_query(query):
+    # 'presale:ilove floor' -> [('presale', 'ilove'), (None, 'floor')]; None means any field
+    words = []
+    for word in query.lower().split():
+        field, sep, value = word.partition(':')
+        field = FIELD_ALIASES.get(field, field)
+        if sep and field in SEARCH_FIELDS:
+            words.append((field, value))  # 'presale:' alone: any task with a presale
+        else:
+            words.append((None, word))
+    return words
+
+class SearchIndex(TaskIndex):
+    """
+    Inverted index of 'field:token' terms -> task files over the name, product,
+    presale, price_range and extra_filter sections of every task. Files are
+    re-scanned only when (mtime, size) change. Query words match term prefixes
+    and must all match (AND); e.g. 'presale:ilove section:flr2 drake'.
+    """
+    scan_rows = staticmethod(scan_task_terms)
+
+    def __init__(self, tasks_dir):
+        super().__init__(tasks_dir)  # _files: filename -> (mtime_ns, size, terms)
+        self._postings = {}  # term -> set of filenames
+        self._terms = None   # Sorted terms for prefix lookups, rebuilt after changes
+
+    def _store(self, filename, st, terms):
+        with self._lock:
+            old = self._files.get(filename, (0, 0, set()))[2]
+            self._files[filename] = (st.st_mtime_ns, st.st_size, terms)
+            for term in old - terms:
+                self._discard(term, filename)
+            for term in terms - old:
+                owners = self._postings.get(term)
+                if owners is None:
+                    self._postings[term] = owners = set()
+                    self._terms = None
+                owners.add(filename)
+        return old != terms
+
+    def _drop(self, filename):
+        with self._lock:
+            known = self._files.pop(filename, None)
+            if known is None:
+                return False
+            for term in known[2]:
+                self._discard(term, filename)
+        return True
+
+    def _discard(self, term, filename):
+        owners = self._postings.get(term)
+        if owners is not None:
+            owners.discard(filename)
+            if not owners:
+                del self._postings[term]
+                self._terms = None
+
+    def search(self, query):
+        # Filenames matching every word of query (see parse_query); None for an empty query
+        words = parse_query(query)
+        if not words:
+            return None
+        with self._lock:
+            if self._terms is None:
+                self._terms = sorted(self._postings)
+            result = None
+            # Most selective words first, so later ones intersect a small set
+            for files in sorted((self._word_match(field, value) for field, value in words), key=len):
+                result = files if result is None else result & files
+                if not result:
+                    break
+        return result
+
+    def _word_match(self, field, value):
+        # A pasted value ('event/0B00608A') that is not the start of a whole value
+        # matches when each of its words does
+        found = self._prefix_match(field, value)
+        words = _WORD_RE.findall(value)
+        if found or words == [value]:
+            return found
+        for i, word in enumerate(words):
+            matched = self._prefix_match(field, word)
+            found = matched if i == 0 else found & matched
+            if not found:
+                break
+        return found
+
+    def _prefix_match(self, field, prefix):
+        # Union of the files of every term starting with field:prefix (any field when None)
+        found = set()
+        for f in (field,) if field else SEARCH_FIELDS:
+            key = f'{f}:{prefix}'
+            start = bisect.bisect_left(self._terms, key)
+            stop = bisect.bisect_left(self._terms, key + '\uffff', start)
+            for term in self._terms[start:stop]:
+                found.update(self._postings[term])
+        return found
+
+    def terms(self, filename):
+        # Indexed terms of one file (for debugging searches)
+        with self._lock:
+            known = self._files.get(filename)
+        return sorted(known[2]) if known else []
+
+if __name__ == "__main__":
+    # Minimal test: index the TASKS directory and run a query from the command line
+    import sys
+    import time
+    index = SearchIndex(os.path.join(os.path.dirname(__file__), '../shhh/tasks/TASKS'))
+    print("Indexed:", len(index.sync()), "files")
+    start = time.perf_counter()
+    matches = index.search(' '.join(sys.argv[1:]) or 'presale:')
+    print(f"{len(matches or ())} matches in {(time.perf_counter() - start) * 1000:.2f} ms:", sorted(matches or ()))
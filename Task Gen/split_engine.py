@@ -0,0 +1,105 @@
+"""
+Splitting one task into shards (the inverse of merge_engine), e.g. a 400
+account task into 4 files for 4 bot instances.
+
+    rows         K contiguous row ranges of (nearly) equal size
+    round-robin  row i goes to shard i % K
+    prefix       one shard per profile_name prefix ('Belgiumite01' -> 'Belgiumite')
+
+shard_positions computes every shard's row positions in one vectorized pass
+(a stable argsort of the shard number per row); TaskManager.split_task then
+copies those raw CSV rows into the shards in parallel, byte for byte, and
+publishes them all or none.
+"""
+import os
+import re
+
+SPLIT_MODES = ('rows', 'round-robin', 'prefix')
+PREFIX_COLUMN = 'profile_name'
+# Default prefix: everything before the first digit or separator
+_PREFIX_RE = re.compile(r'([^\d_\- ]*)')
+_LABEL_RE = re.compile(r'[^0-9A-Za-z._-]+')
+
+def shard_positions(n, mode='rows', shards=2, prefix_len=None, profile_names=None):
+    """
+    [(label, row positions), ...] in shard order for a task of n rows. Labels are
+    '1'..'K' for the rows/round-robin modes and the prefix itself for the prefix
+    mode, which needs profile_names (the PREFIX_COLUMN value of every row, None
+    when the task has no such column); every row lands in exactly one shard and
+    keeps its order within it.
+    """
+    import numpy as np
+    if mode not in SPLIT_MODES:
+        raise ValueError(f'Unknown split mode "{mode}" (expected one of {", ".join(SPLIT_MODES)})')
+    if mode == 'prefix':
+        if profile_names is None:
+            raise ValueError(f'The task has no {PREFIX_COLUMN} column to split by')
+        if prefix_len:
+            prefixes = [name[:prefix_len] for name in profile_names]
+        else:
+            prefixes = [_PREFIX_RE.match(name).group(1) for name in profile_names]
+        labels, assignment = np.unique(np.array(prefixes, dtype=object), return_inverse=True)
+        assignment = assignment.reshape(-1)
+        labels = [label or '(none)' for label in labels]
+    else:
+        if shards < 2:
+            raise ValueError('Split into at least 2 shards')
+        if shards > n:
+            raise ValueError(f'Cannot split {n} rows into {shards} shards')
+        rows = np.arange(n)
+        assignment = rows * shards // n if mode == 'rows' else rows % shards
+        labels = [str(i) for i in range(1, shards + 1)]
+    order = np.argsort(assignment, kind='stable')
+    bounds = np.cumsum(np.bincount(assignment, minlength=len(labels)))[:-1]
+    return list(zip(labels, np.split(order, bounds)))
+
+def shard_names(filename, labels):
+    # 'venue/drake.csv' + ['1', '2'] -> ['venue/drake-1.csv', 'venue/drake-2.csv']. Raises ValueError
+    # when two labels end up as the same file name ('Te st' and 'Te_st', or 'Test' and 'test' on
+    # Windows), since the second shard would overwrite the first
+    stem = filename[:-4] if filename.lower().endswith('.csv') else filename
+    names = [f"{stem}-{_LABEL_RE.sub('_', label)}.csv" for label in labels]
+    seen = {}
+    for label, name in zip(labels, names):
+        other = seen.setdefault(name.lower(), label)
+        if other != label:
+            raise ValueError(f'Shards "{other}" and "{label}" would both be written to {name}; '
+                             f'split with another prefix length')
+    return names
+
+def parse_overrides(text):
+    """
+    Per-shard dynamic field overrides, one shard per line:
+        1 presale=CODEA
+        Belgiumite presale=BELCODE; extra_filter=FLR1:100, FLR2:150
+    -> {'1': {'presale': 'CODEA'}, 'Belgiumite': {...}}. The label comes first,
+    then field=value pairs separated by ';'.
+    """
+    overrides = {}
+    for number, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        label, _, rest = line.partition(' ')
+        fields = {}
+        for pair in rest.split(';'):
+            if not pair.strip():
+                continue
+            field, sep, value = pair.partition('=')
+            if not sep:
+                raise ValueError(f'Override line {number}: expected field=value, got "{pair.strip()}"')
+            fields[field.strip()] = value.strip()
+        if not fields:
+            raise ValueError(f'Override line {number}: no field=value pairs for shard "{label}"')
+        overrides.setdefault(label, {}).update(fields)
+    return overrides
+
+if __name__ == "__main__":
+    # Minimal test: shard the bundled template three ways
+    from task_writer import csv_column, read_csv_records
+    header, records = read_csv_records(os.path.join(os.path.dirname(__file__), '400Template.csv'))
+    for mode in SPLIT_MODES:
+        shards = shard_positions(len(records), mode, 3, profile_names=csv_column(header, records, PREFIX_COLUMN))
+        print(mode, [(label, len(rows)) for label, rows in shards])
+    print(shard_names('venue/drake.csv', ['1', 'Belgiumite']))
+    print(parse_overrides('1 presale=A\nTest presale=B; extra_filter=FLR1:100, FLR2:150'))
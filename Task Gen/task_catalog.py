@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+
+from task_index import TaskIndex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    filename      TEXT PRIMARY KEY,
+    mtime_ns      INTEGER NOT NULL,
+    size          INTEGER NOT NULL,
+    row_count     INTEGER NOT NULL,
+    product_count INTEGER NOT NULL,
+    products      TEXT NOT NULL,  -- JSON list of distinct event URLs, in file order
+    presale       TEXT NOT NULL,  -- JSON lists of distinct non-empty values
+    price_range   TEXT NOT NULL,
+    extra_filter  TEXT NOT NULL,
+    account_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS task_products (
+    filename TEXT NOT NULL,
+    product  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS task_products_product ON task_products(product);
+CREATE INDEX IF NOT EXISTS task_products_filename ON task_products(filename);
+"""
+
+_LIST_FIELDS = ('products', 'presale', 'price_range', 'extra_filter')
+
+def scan_task_file(name, header, rows):
+    # Catalog metadata for one task (see task_index.read_task_rows)
+    distinct = {'product': {}, 'presale': {}, 'price_range': {}, 'extra_filter': {}}
+    accounts = set()
+    positions = {col: i for i, col in enumerate(header)}
+    wanted = [(field, positions[field]) for field in distinct if field in positions]
+    account_pos = positions.get('account')
+    for row in rows:
+        for field, pos in wanted:
+            if pos < len(row) and row[pos]:
+                distinct[field][row[pos]] = None  # dict keeps first-seen order
+        if account_pos is not None and account_pos < len(row) and row[account_pos]:
+            accounts.add(row[account_pos])
+    return {
+        'row_count': len(rows),
+        'products': list(distinct['product']),
+        'presale': list(distinct['presale']),
+        'price_range': list(distinct['price_range']),
+        'extra_filter': list(distinct['extra_filter']),
+        'account_count': len(accounts),
+    }
+
+class TaskCatalog(TaskIndex):
+    """
+    Sidecar SQLite index of per-file task metadata, so the task list can show
+    row counts and events and answer lookups without opening every CSV.
+    Rows are keyed by filename and refreshed only when (mtime, size) change.
+    """
+    scan_rows = staticmethod(scan_task_file)
+
+    def __init__(self, db_path, tasks_dir):
+        super().__init__(tasks_dir)  # _lock is shared by the Tk thread and background refreshes
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _stamp(self, filename):
+        with self._lock:
+            return self._conn.execute('SELECT mtime_ns, size FROM tasks WHERE filename = ?', (filename,)).fetchone()
+
+    def _stamps(self):
+        with self._lock:
+            return {name: (mtime, size) for name, mtime, size
+                    in self._conn.execute('SELECT filename, mtime_ns, size FROM tasks')}
+
+    def _store(self, filename, st, info):
+        # Always a change: the row carries the file's mtime, which the task list sorts by
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (filename, st.st_mtime_ns, st.st_size, info['row_count'], len(info['products']),
+                 json.dumps(info['products']), json.dumps(info['presale']), json.dumps(info['price_range']),
+                 json.dumps(info['extra_filter']), info['account_count']))
+            self._conn.execute('DELETE FROM task_products WHERE filename = ?', (filename,))
+            self._conn.executemany('INSERT INTO task_products VALUES (?, ?)',
+                                   [(filename, p) for p in info['products']])
+        return True
+
+    def _drop(self, filename):
+        with self._lock, self._conn:
+            removed = self._conn.execute('DELETE FROM tasks WHERE filename = ?', (filename,)).rowcount
+            self._conn.execute('DELETE FROM task_products WHERE filename = ?', (filename,))
+        return removed > 0
+
+    def get(self, filename):
+        # Metadata dict for one file, or None if it is not cataloged
+        with self._lock:
+            cur = self._conn.execute('SELECT * FROM tasks WHERE filename = ?', (filename,))
+            row = cur.fetchone()
+            return _row_to_dict(cur, row) if row else None
+
+    def all(self):
+        # filename -> metadata dict for every cataloged file
+        with self._lock:
+            cur = self._conn.execute('SELECT * FROM tasks')
+            return {row[0]: _row_to_dict(cur, row) for row in cur.fetchall()}
+
+    def find_by_product(self, product):
+        # Filenames of tasks that point at this event URL
+        with self._lock:
+            return [r[0] for r in self._conn.execute(
+                'SELECT DISTINCT filename FROM task_products WHERE product = ? ORDER BY filename', (product,))]
+
+    def with_presale(self):
+        # Filenames of tasks that have a presale code set on any row
+        with self._lock:
+            return [r[0] for r in self._conn.execute(
+                "SELECT filename FROM tasks WHERE presale != '[]' ORDER BY filename")]
+
+def _row_to_dict(cursor, row):
+    info = {d[0]: value for d, value in zip(cursor.description, row)}
+    for field in _LIST_FIELDS:
+        info[field] = json.loads(info[field])
+    return info
+
+if __name__ == "__main__":
+    # Minimal test: catalog the TASKS directory and print what changed
+    tasks_dir = os.path.join(os.path.dirname(__file__), '../shhh/tasks/TASKS')
+    catalog = TaskCatalog(os.path.join(os.path.dirname(__file__), 'task_catalog.db'), tasks_dir)
+    print("Changed:", catalog.sync())
+    for name, info in sorted(catalog.all().items()):
+        print(name, info['row_count'], 'rows', info['product_count'], 'events')
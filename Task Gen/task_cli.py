@@ -0,0 +1,309 @@
+"""
+Headless task operations for scripts and schedulers (no tkinter).
+
+    python task_cli.py list
+    python task_cli.py create drake-boston.csv --template 400Template.csv --product https://... --presale ILOVECODES
+    python task_cli.py duplicate drake-boston.csv drake-boston-2.csv
+    python task_cli.py merge drake-all.csv drake-boston.csv drake-nyc.csv
+    python task_cli.py split drake-boston.csv --shards 4 --override "1 presale=CODEA" --override "2 presale=CODEB"
+    python task_cli.py set drake-boston.csv --price-range 150-500 [--where-product https://...]
+    python task_cli.py bulk-edit drake-boston.csv drake-nyc.csv --presale NEWCODE --add-filter "FLR2:150" --remove-section FLR9
+    python task_cli.py delete drake-boston.csv --yes
+    python task_cli.py generate onsale.csv --workers 8 --report onsale-report.json
+    python task_cli.py collisions [drake-boston.csv]
+    python task_cli.py search presale:ilovecodes section:flr2
+    python task_cli.py validate [drake-boston.csv] [--report validation.json] [--strict]
+
+Every command prints one JSON object to stdout and exits 0 on success,
+1 if the operation failed and 2 for bad arguments, whether argparse or the
+command itself rejected them (only --help prints plain text instead).
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+
+from bulk_generate import generate_from_manifest, load_manifest
+from collision_index import CollisionIndex
+from extra_filter_builder import is_valid_extra_filter, parse_extra_filter
+from search_index import SearchIndex
+from split_engine import SPLIT_MODES, parse_overrides
+from task_manager import (BULK_FIELDS, DEFAULT_TASKS_DIR, DEFAULT_TEMPLATES_DIR, DYNAMIC_FIELDS, TaskManager,
+                          normalize_task_name)
+from task_roots import TaskRoots, configured_task_roots
+from task_validator import TaskValidator, configured_report_path
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+class UsageError(ValueError):
+    # Bad command-line arguments: exits with EXIT_USAGE instead of EXIT_FAILED
+    pass
+
+class _Parser(argparse.ArgumentParser):
+    # argparse errors raise instead of exiting, so main() still prints the JSON result
+    def error(self, message):
+        self.print_usage(sys.stderr)
+        raise UsageError(f'{self.prog}: {message}')
+
+def _add_field_args(parser):
+    for field in DYNAMIC_FIELDS:
+        parser.add_argument('--' + field.replace('_', '-'), dest=field, default=None,
+                            help=f'value for {field} ("" clears it)')
+
+def _fields_from(args):
+    fields = {f: getattr(args, f) for f in DYNAMIC_FIELDS if getattr(args, f) is not None}
+    if fields.get('extra_filter') and not is_valid_extra_filter(fields['extra_filter']):
+        raise UsageError(f'Malformed extra_filter: "{fields["extra_filter"]}" (expected "Section:Price, ...")')
+    return fields
+
+def _text(value):
+    # Cell value as shown in the UI: missing/NaN becomes ''
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    return str(value)
+
+def cmd_list(manager, args):
+    return {'tasks': sorted(manager.list_tasks(), key=str.lower)}
+
+def cmd_show(manager, args):
+    name = normalize_task_name(args.name)
+    df = manager.load_task(name, DYNAMIC_FIELDS)
+    products = []
+    if 'product' in df.columns:
+        for product, rows in df.groupby(df['product'].fillna(''), sort=False):
+            first = rows.iloc[0]
+            entry = {f: _text(first.get(f)) for f in DYNAMIC_FIELDS}
+            entry['rows'] = len(rows)
+            products.append(entry)
+    return {'task': name, 'rows': len(df), 'products': products}
+
+def cmd_create(manager, args):
+    name = normalize_task_name(args.name)
+    template_path = os.path.join(args.templates_dir, normalize_task_name(args.template))
+    if not os.path.exists(template_path):
+        raise FileNotFoundError(f'Template "{args.template}" not found in {args.templates_dir}')
+    fields = _fields_from(args)
+    if not fields.get('product'):
+        raise UsageError('--product (event URL) is required')
+    rows = manager.create_task(name, template_path, fields)
+    return {'task': name, 'template': os.path.basename(template_path), 'rows': rows}
+
+def cmd_duplicate(manager, args):
+    src, dest = normalize_task_name(args.name), normalize_task_name(args.new_name)
+    manager.duplicate_task(src, dest)
+    return {'task': dest, 'source': src}
+
+def cmd_merge(manager, args):
+    dest = normalize_task_name(args.new_name)
+    sources = [normalize_task_name(n) for n in args.names]
+    if len(sources) < 2:
+        raise UsageError('Select at least two tasks to merge.')
+    result = manager.merge_tasks(sources, dest)
+    return {'task': dest, 'rows': result['rows'], 'total_rows': result['total_rows']}
+
+def cmd_split(manager, args):
+    # Shards are written next to the task as NAME-LABEL.csv; the task itself is kept
+    name = normalize_task_name(args.name)
+    if args.mode != 'prefix' and args.shards < 2:
+        raise UsageError('--shards must be at least 2')
+    try:
+        overrides = parse_overrides('\n'.join(args.override))
+    except ValueError as e:
+        raise UsageError(str(e)) from None
+    for fields in overrides.values():
+        if fields.get('extra_filter') and not is_valid_extra_filter(fields['extra_filter']):
+            raise UsageError(f'Malformed extra_filter override: "{fields["extra_filter"]}" (expected "Section:Price, ...")')
+    shards = manager.split_task(name, args.mode, args.shards, args.prefix_len, overrides, max_workers=args.workers)
+    return {'task': name, 'mode': args.mode, 'shards': shards}
+
+def cmd_set(manager, args):
+    name = normalize_task_name(args.name)
+    fields = _fields_from(args)
+    if not fields:
+        raise UsageError('Nothing to set; pass at least one of ' +
+                         ', '.join('--' + f.replace('_', '-') for f in DYNAMIC_FIELDS))
+    changed = manager.set_fields(name, fields, product=args.where_product)
+    return {'task': name, 'fields': fields, 'rows_changed': changed}
+
+def cmd_bulk_edit(manager, args):
+    # One change applied to many tasks; if any task fails, none is written
+    names = [normalize_task_name(n) for n in args.names]
+    fields = {f: v for f, v in _fields_from(args).items() if f in BULK_FIELDS}
+    if args.add_filter and not is_valid_extra_filter(args.add_filter):
+        raise UsageError(f'Malformed --add-filter: "{args.add_filter}" (expected "Section:Price, ...")')
+    add_filters = parse_extra_filter(args.add_filter)
+    remove_sections = [s.strip() for value in args.remove_section for s in value.split(',') if s.strip()]
+    if not (fields or add_filters or remove_sections):
+        raise UsageError('Nothing to change; pass --presale, --price-range, --extra-filter, --add-filter or --remove-section')
+    changed = manager.bulk_edit(names, fields, add_filters, remove_sections, max_workers=args.workers)
+    return {'tasks': len(names), 'changed': changed}
+
+def cmd_delete(manager, args):
+    name = normalize_task_name(args.name)
+    if not args.yes:
+        raise UsageError(f'Refusing to delete "{name}" without --yes')
+    manager.delete_task(name)
+    return {'task': name, 'deleted': True}
+
+def cmd_generate(manager, args):
+    entries = load_manifest(args.manifest)
+    report = generate_from_manifest(entries, manager.tasks_dir, args.templates_dir,
+                                    max_workers=args.workers, use_processes=args.processes)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if not report['ok']:
+        problems = report['errors'] or [f"{f['task']}: {f['error']}" for f in report['failed']]
+        raise RuntimeError('; '.join(problems))
+    return {'created': len(report['created']), 'templates_parsed': report['templates_parsed'],
+            'seconds': report['seconds'], 'tasks': [c['task'] for c in report['created']]}
+
+def cmd_collisions(manager, args):
+    # Accounts/proxies used by more than one task for the same event
+    index = CollisionIndex(manager.roots)
+    index.sync()
+    if args.name:
+        name = normalize_task_name(args.name)
+        if not manager.task_exists(name):
+            raise FileNotFoundError(f'Task "{name}" not found')
+        found = index.collisions(name)
+        return {'task': name, 'count': len(found), 'collisions': found}
+    found = index.all_collisions()
+    return {'count': len(found), 'collisions': found}
+
+def cmd_search(manager, args):
+    # Tasks matching every query word, e.g. 'presale:ilovecodes section:flr2'
+    index = SearchIndex(manager.roots)
+    index.sync()
+    found = sorted(index.search(' '.join(args.query)) or ())
+    return {'count': len(found), 'tasks': found}
+
+def cmd_validate(manager, args):
+    # Malformed rows in every task; only files changed since the last report are read again
+    validator = TaskValidator(manager.roots, args.report or configured_report_path(), max_workers=args.workers)
+    validator.sync()
+    names = [normalize_task_name(n) for n in args.names] or sorted(validator.invalid_tasks())
+    for name in names:
+        if not manager.task_exists(name):
+            raise FileNotFoundError(f'Task "{name}" not found')
+    invalid = {name: validator.issues(name) for name in names if validator.issues(name)}
+    if args.strict and invalid:
+        raise RuntimeError(f'{len(invalid)} invalid tasks: {", ".join(sorted(invalid))}')
+    return {'checked': len(names) if args.names else validator.report()['checked'], 'invalid': len(invalid),
+            'report': validator.report_path, 'tasks': invalid}
+
+def build_parser():
+    parser = _Parser(description='Silently Task Generator, headless.')
+    parser.add_argument('--tasks-dir', action='append', default=None,
+                        help='task root (repeat for more; default: TASKGEN_TASK_ROOTS or the TASKS folder)')
+    parser.add_argument('--templates-dir', default=DEFAULT_TEMPLATES_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('list', help='list task files').set_defaults(func=cmd_list)
+
+    p = sub.add_parser('show', help='show the dynamic fields of a task')
+    p.add_argument('name')
+    p.set_defaults(func=cmd_show)
+
+    p = sub.add_parser('create', help='create a task from a template')
+    p.add_argument('name')
+    p.add_argument('--template', required=True)
+    _add_field_args(p)
+    p.set_defaults(func=cmd_create)
+
+    p = sub.add_parser('duplicate', help='copy a task under a new name')
+    p.add_argument('name')
+    p.add_argument('new_name')
+    p.set_defaults(func=cmd_duplicate)
+
+    p = sub.add_parser('merge', help='merge two or more tasks into a new one')
+    p.add_argument('new_name')
+    p.add_argument('names', nargs='+')
+    p.set_defaults(func=cmd_merge)
+
+    p = sub.add_parser('split', help='split a task into shards (by rows, round-robin or profile prefix)')
+    p.add_argument('name')
+    p.add_argument('--mode', choices=SPLIT_MODES, default='rows')
+    p.add_argument('--shards', type=int, default=2, help='number of shards for rows/round-robin')
+    p.add_argument('--prefix-len', type=int, default=None,
+                   help='prefix mode: group by this many characters of profile_name (default: up to the first digit)')
+    p.add_argument('--override', action='append', default=[],
+                   help='"LABEL field=value; field=value" for one shard (repeatable)')
+    p.add_argument('--workers', type=int, default=4)
+    p.set_defaults(func=cmd_split)
+
+    p = sub.add_parser('set', help='edit dynamic fields of a task')
+    p.add_argument('name')
+    p.add_argument('--where-product', default=None, help='only change rows for this event URL')
+    _add_field_args(p)
+    p.set_defaults(func=cmd_set)
+
+    p = sub.add_parser('bulk-edit', help='change presale/price_range/extra_filter of several tasks at once')
+    p.add_argument('names', nargs='+')
+    for field in BULK_FIELDS:
+        p.add_argument('--' + field.replace('_', '-'), dest=field, default=None, help=f'value for {field} ("" clears it)')
+    p.add_argument('--add-filter', default='', help='entries to add to extra_filter ("Section:Price, ...")')
+    p.add_argument('--remove-section', action='append', default=[], help='section to drop from extra_filter (repeatable)')
+    p.add_argument('--workers', type=int, default=8)
+    p.set_defaults(func=cmd_bulk_edit, product=None)
+
+    p = sub.add_parser('delete', help='delete a task')
+    p.add_argument('name')
+    p.add_argument('--yes', action='store_true', help='confirm the delete')
+    p.set_defaults(func=cmd_delete)
+
+    p = sub.add_parser('generate', help='create many tasks from a CSV/JSON manifest')
+    p.add_argument('manifest')
+    p.add_argument('--workers', type=int, default=8)
+    p.add_argument('--processes', action='store_true', help='write with a process pool instead of threads')
+    p.add_argument('--report', default=None, help='also write the full JSON report here')
+    p.set_defaults(func=cmd_generate)
+
+    p = sub.add_parser('collisions', help='accounts/proxies shared by tasks for the same event')
+    p.add_argument('name', nargs='?', default=None, help='only report collisions involving this task')
+    p.set_defaults(func=cmd_collisions)
+
+    p = sub.add_parser('search', help='tasks matching name/product/presale/price/section words')
+    p.add_argument('query', nargs='+', help='words, optionally field:prefix (name, product, presale, price, section)')
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser('validate', help='check product/quantity/account/proxy/extra_filter of every task')
+    p.add_argument('names', nargs='*', help='only report these tasks (all tasks are still checked)')
+    p.add_argument('--report', default=None, help='report file (default: TASKGEN_VALIDATION_REPORT or validation_report.json)')
+    p.add_argument('--workers', type=int, default=None, help='processes for the first check (default: one per CPU)')
+    p.add_argument('--strict', action='store_true', help='exit 1 if any task is invalid')
+    p.set_defaults(func=cmd_validate)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except UsageError as e:
+        print(json.dumps({'ok': False, 'command': None, 'error': str(e), 'type': type(e).__name__}))
+        return EXIT_USAGE
+    except SystemExit as e:
+        return EXIT_USAGE if e.code else EXIT_OK  # --help
+    manager = TaskManager(TaskRoots(args.tasks_dir or configured_task_roots(DEFAULT_TASKS_DIR)))
+    try:
+        # Keep stdout clean for the JSON result, whatever a library might print
+        with contextlib.redirect_stdout(sys.stderr):
+            result = args.func(manager, args)
+        code = EXIT_OK
+        output = {'ok': True, 'command': args.command, **result}
+    except UsageError as e:
+        code = EXIT_USAGE
+        output = {'ok': False, 'command': args.command, 'error': str(e), 'type': type(e).__name__}
+    except Exception as e:
+        code = EXIT_FAILED
+        output = {'ok': False, 'command': args.command, 'error': str(e), 'type': type(e).__name__}
+    finally:
+        manager.close()
+    print(json.dumps(output))
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+What TaskCatalog, CollisionIndex, SearchIndex and TaskValidator have in common:
+one entry per task file, keyed by task name ('venue/drake.csv') and stamped
+with the file's (mtime_ns, size), so a file is only read again after it changed.
+
+A changed file is parsed once however many indexes want it: read_task_rows
+keeps the last few files it parsed for the next index that asks for the same
+version (the watcher updates the indexes one after another), and sync_all()
+brings several indexes up to date in a single pass over the directory.
+"""
+import csv
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from task_roots import TaskRoots
+
+READ_ERRORS = (OSError, UnicodeDecodeError, csv.Error)
+PROCESS_MIN_FILES = 8  # Fewer stale files than this are read in the calling thread
+_RECENT_FILES = 4      # Parsed files kept for the other indexes
+
+_recent = OrderedDict()  # (abs path, mtime_ns, size) -> (header, rows)
+_recent_lock = threading.Lock()
+
+def read_task_rows(path, st=None):
+    # (header, rows) of a task CSV as lists of strings, blank lines skipped (pandas skips them too).
+    # The lists are shared between indexes: read them, never change them
+    st = st or os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _recent_lock:
+        parsed = _recent.get(key)
+        if parsed is not None:
+            _recent.move_to_end(key)
+            return parsed
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        parsed = (header, [row for row in reader if row])
+    with _recent_lock:
+        _recent[key] = parsed
+        while len(_recent) > _RECENT_FILES:
+            _recent.popitem(last=False)
+    return parsed
+
+def _scan_file(path, name, scanners):
+    # One file for sync_all, top-level so it can run on a process pool: (error, [entry per scanner])
+    try:
+        header, rows = read_task_rows(path)
+    except READ_ERRORS as e:
+        return str(e), None
+    return None, [scan(name, header, rows) for scan in scanners]
+
+def sync_all(indexes, max_workers=None):
+    """
+    Bring indexes over the same roots in line with the files on disk in one
+    pass: every stale file is read once and handed to each index it is stale
+    for, on a process pool when there are many and one of the indexes asks for
+    it (use_processes). Returns the changed filenames of each index, in order.
+    """
+    roots = indexes[0].roots
+    on_disk = roots.scan()
+    known = [index._stamps() for index in indexes]
+    work = []  # (name, st, positions of the indexes the file is stale for)
+    for name, st in on_disk.items():
+        stale = [i for i, stamps in enumerate(known) if stamps.get(name) != (st.st_mtime_ns, st.st_size)]
+        if stale:
+            work.append((name, st, stale))
+    args = [(roots.path_for(name), name, [indexes[i].scan_rows for i in stale]) for name, _, stale in work]
+    if len(args) >= PROCESS_MIN_FILES and any(index.use_processes for index in indexes):
+        # spawn, not fork: the app has watcher and Tk threads a forked child must not inherit
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = list(pool.map(_scan_file, *zip(*args), chunksize=max(1, len(args) // 64)))
+    else:
+        results = [_scan_file(*a) for a in args]
+    changed = [[] for _ in indexes]
+    for (name, st, stale), (error, entries) in zip(work, results):
+        for n, i in enumerate(stale):
+            if error is not None:
+                updated = indexes[i]._unreadable(name, st, error)
+            else:
+                updated = indexes[i]._store(name, st, entries[n])
+            if updated:
+                changed[i].append(name)
+    for index, stamps, names in zip(indexes, known, changed):
+        names += [name for name in stamps if name not in on_disk and index._drop(name)]
+        index._synced()
+    return changed
+
+class TaskIndex:
+    """
+    Base class of the task indexes. scan_rows is a top-level function
+    (name, header, rows) -> entry, so sync_all can run it on a process pool.
+    Entries live in _files (name -> (mtime_ns, size, entry)) unless a subclass
+    overrides _stamp/_stamps/_store/_drop; _store and _drop return True when
+    the entry changed. _synced() is called after every sync, _saved() after
+    refresh()/remove() updated an entry. sync(), refresh() and on_file_event()
+    report the filenames whose entries changed.
+    """
+    scan_rows = None
+    use_processes = False
+    max_workers = None
+
+    def __init__(self, tasks_dir):
+        # One directory or a TaskRoots
+        self.roots = tasks_dir if isinstance(tasks_dir, TaskRoots) else TaskRoots([tasks_dir])
+        self._lock = threading.Lock()
+        self._files = {}
+
+    def _stamp(self, filename):
+        with self._lock:
+            known = self._files.get(filename)
+        return known[:2] if known is not None else None
+
+    def _stamps(self):
+        with self._lock:
+            return {name: known[:2] for name, known in self._files.items()}
+
+    def _store(self, filename, st, entry):
+        with self._lock:
+            old = self._files.get(filename)
+            self._files[filename] = (st.st_mtime_ns, st.st_size, entry)
+        return old is None or old[2] != entry
+
+    def _drop(self, filename):
+        with self._lock:
+            return self._files.pop(filename, None) is not None
+
+    def _unreadable(self, filename, st, error):
+        # A file that cannot be read has no entry
+        return self._drop(filename)
+
+    def _synced(self):
+        pass
+
+    def _saved(self):
+        pass
+
+    def sync(self):
+        return sync_all([self], self.max_workers)[0]
+
+    def refresh(self, filename, st=None):
+        # Re-read one file if its stamp changed; True if its entry changed
+        path = self.roots.path_for(filename)
+        try:
+            st = st or os.stat(path)
+        except OSError:
+            return self.remove(filename)
+        if self._stamp(filename) == (st.st_mtime_ns, st.st_size):
+            return False
+        try:
+            header, rows = read_task_rows(path, st)
+        except READ_ERRORS as e:
+            changed = self._unreadable(filename, st, str(e))
+        else:
+            changed = self._store(filename, st, self.scan_rows(filename, header, rows))
+        self._saved()
+        return changed
+
+    def remove(self, filename):
+        removed = self._drop(filename)
+        if removed:
+            self._saved()
+        return removed
+
+    def on_file_event(self, event_type, *paths):
+        # Same signature as the FileWatcher callback
+        if event_type == 'directory':
+            return self.sync()  # A whole folder came, went or moved
+        names = [n for n in (self.roots.name_for(p) for p in paths if p.lower().endswith('.csv')) if n]
+        if event_type == 'deleted':
+            return [n for n in names if self.remove(n)]
+        if event_type == 'moved' and len(paths) == 2:
+            src, dest = (self.roots.name_for(p) for p in paths)
+            changed = [src] if src in names and self.remove(src) else []
+            if dest in names and self.refresh(dest):
+                changed.append(dest)
+            return changed
+        return [n for n in names if self.refresh(n)]
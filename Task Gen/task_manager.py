@@ -1,25 +1,492 @@
 import os
-import pandas as pd
+import threading
+from collections import OrderedDict
+# pandas/numpy are imported where they are used, so listing and copying tasks
+# (and painting the UI's task list) never pays for the pandas import
+from instrumentation import count, timer
+from merge_engine import merge_task_files
+from split_engine import PREFIX_COLUMN, shard_names, shard_positions
+from task_roots import TaskRoots
+from task_storage import default_storage
+from extra_filter_builder import edit_extra_filter
+from task_writer import (BackgroundWriter, atomic_copy_file, csv_column, is_temp_path, publish_staged,
+                         read_csv_records, stage_records, write_records)
+
+# Default locations, relative to this file (same layout the UI has always used)
+DEFAULT_TASKS_DIR = os.path.join(os.path.dirname(__file__), '../shhh/tasks/TASKS')
+DEFAULT_TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), '../shhh/tasks/Templates')
+
+# Upper bound for the in-memory DataFrame cache (bytes as reported by pandas)
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# The per-event columns users edit; everything else comes from the template
+DYNAMIC_FIELDS = ['product', 'presale', 'price_range', 'extra_filter']
+# The ones that can be changed on many tasks at once (each task keeps its own product)
+BULK_FIELDS = ['presale', 'price_range', 'extra_filter']
+
+# Explicit dtypes for typed loading. Low-cardinality columns repeat the same few
+# values across hundreds of rows, so categoricals keep them small; every one of
+# these still writes back to CSV exactly as it was read.
+TASK_DTYPES = {
+    'site': 'category',
+    'method': 'category',
+    'mode': 'category',
+    'error_delay': 'category',
+    'proxy_group': 'category',
+    'store_country': 'category',
+    'hidden': 'boolean',
+    # Dynamic fields stay plain objects so edited strings can be assigned into them
+    'product': 'object',
+    'presale': 'object',
+    'price_range': 'object',
+    'extra_filter': 'object',
+}
+
+class BulkEditError(RuntimeError):
+    # One task of a bulk edit could not be edited, so none of them were written
+    def __init__(self, filename, error):
+        super().__init__(f'{filename}: {error}')
+        self.filename = filename
+        self.error = error
 
 class TaskManager:
-    def __init__(self, tasks_dir):
-        self.tasks_dir = tasks_dir
+    def __init__(self, tasks_dir, cache_max_bytes=DEFAULT_CACHE_MAX_BYTES, on_save_error=None, typed=True,
+                 storage=None):
+        # tasks_dir is one directory or a TaskRoots (several roots, searched recursively).
+        # Task names are '/'-separated paths relative to their root; tasks_dir is the first root
+        self.roots = tasks_dir if isinstance(tasks_dir, TaskRoots) else TaskRoots([tasks_dir])
+        self.tasks_dir = self.roots.primary
+        self.typed = typed  # Parse with TASK_DTYPES (falls back to plain parsing if a file does not fit)
+        # Where frames are read from and written to (see task_storage); the CSVs are always written
+        self.storage = storage or default_storage(typed)
+        # LRU cache: filename -> (mtime_ns, size, nbytes, DataFrame, columns)
+        # columns is None for a full frame, else the projection the entry was loaded for.
+        # Entries are only trusted while the file's (mtime, size) still match.
+        self.cache_max_bytes = cache_max_bytes
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._cache_lock = threading.Lock()  # File watcher calls in from its own thread
+        # Saves are written behind on their own thread; on_save_error(filename, exc) reports failures
+        self.on_save_error = on_save_error
+        self.writer = BackgroundWriter(on_written=self._on_written, on_error=self._on_write_error,
+                                       write=self.storage.write)
 
     def list_tasks(self):
-        # List all CSV files in the tasks directory
-        return [f for f in os.listdir(self.tasks_dir) if f.lower().endswith('.csv')]
+        # Names of all task CSVs under the roots, subfolders included
+        return list(self.roots.scan())
+
+    def path_for(self, filename):
+        return self.roots.path_for(filename)
+
+    def load_task(self, filename, columns=None):
+        # Load a CSV file as a pandas DataFrame (served from cache when the file is unchanged).
+        # With columns, only those columns are parsed (missing ones are simply absent).
+        path = self.path_for(filename)
+        pending = self.writer.pending(path)
+        if pending is not None:
+            count('load.pending')
+            return _project(pending, columns)  # A queued save is newer than what is on disk
+        st = os.stat(path)
+        with self._cache_lock:
+            entry = self._cache.get(filename)
+            if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                if entry[4] is None or (columns is not None and set(columns) <= entry[4]):
+                    self._cache.move_to_end(filename)
+                    count('load.cache_hit')
+                    # Hand out a copy so callers can edit freely without touching the cached frame
+                    return _project(entry[3], columns)
+        count('load.cache_miss')
+        with timer('load.read', task=filename, columns=None if columns is None else len(columns), bytes=st.st_size,
+                   storage=self.storage.name):
+            df = self.storage.read(path, columns)
+        self._cache_put(filename, st, df.copy(), None if columns is None else frozenset(columns))
+        return df
+
+    def update_task(self, filename, fields_df, wait=False):
+        # Save edits made on a column projection: the full frame is loaded (usually from
+        # cache), the columns of fields_df are written over it row for row, and it is saved
+        df = self.load_task(filename)
+        if len(df) != len(fields_df):
+            raise ValueError(f'"{filename}" changed on disk ({len(df)} rows, edits cover {len(fields_df)}); reload it first')
+        for col in fields_df.columns:
+            df[col] = fields_df[col].to_numpy()
+        return self.save_task(filename, df, wait=wait, columns=list(fields_df.columns))
+
+    def save_task(self, filename, df, wait=False, columns=None):
+        # Queue a pandas DataFrame to be written atomically to a CSV file.
+        # Returns False (and writes nothing) when df matches what is already on disk.
+        # columns: the only columns that differ from the file, so the rest of its bytes can be kept.
+        # With wait, a failed write raises task_writer.SaveError
+        path = self.path_for(filename)
+        if self.writer.pending(path) is None and self._matches_cached(filename, path, df):
+            count('save.unchanged')
+            return False
+        count('save.queued')
+        self.writer.submit(path, df.copy(), columns)
+        if wait:
+            with timer('save.wait', task=filename):
+                self.writer.flush(paths=[path])
+        return True
+
+    def flush(self, timeout=None):
+        # Wait for all queued saves to reach disk; raises SaveError for the ones that failed
+        return self.writer.flush(timeout)
+
+    def close(self, timeout=None):
+        self.writer.stop(timeout)
+
+    def task_exists(self, filename):
+        path = self.path_for(filename)
+        return os.path.exists(path) or self.writer.pending(path) is not None
+
+    def _check_new_name(self, new_name):
+        # New tasks may go into a subfolder that does not exist yet
+        if self.task_exists(new_name):
+            raise FileExistsError(f'A task named "{new_name}" already exists.')
+        os.makedirs(os.path.dirname(self.path_for(new_name)), exist_ok=True)
+
+    def create_task(self, new_name, template, fields=None):
+        # New task from a template with the given dynamic fields set on every row; returns its
+        # row count. template is a file, or its (header, records) as kept by TemplateRegistry.get.
+        # Nothing is parsed into a frame: the template's bytes are copied and only the dynamic
+        # columns are rewritten, so values like '007' keep their exact text
+        fields = fields or {}
+        check_fields(fields)
+        self._check_new_name(new_name)
+        path = self.path_for(new_name)
+        with timer('create', task=new_name, fields=len(fields)):
+            from_file = not isinstance(template, tuple)
+            header, records = read_csv_records(template) if from_file else template
+            if from_file and not fields:
+                atomic_copy_file(template, path)
+            else:
+                write_records(path, header, records, fields)
+        return len(records)
+
+    def duplicate_task(self, filename, new_name):
+        # A plain file copy: nothing is parsed, so the copy is byte-identical to the source
+        self._check_new_name(new_name)
+        # A queued save of the source must be part of the copy
+        self.writer.flush(paths=[self.path_for(filename)])
+        with timer('duplicate', task=new_name):
+            atomic_copy_file(self.path_for(filename), self.path_for(new_name))
+
+    def set_fields(self, filename, fields, product=None):
+        # Set dynamic fields on every row, or only on the rows of one product; returns rows changed
+        df = self.load_task(filename)
+        mask = None if product is None else (df['product'] == product).to_numpy()
+        changed = apply_fields(df, fields, mask)
+        self.save_task(filename, df, wait=True, columns=list(fields))
+        return changed
+
+    def delete_task(self, filename):
+        os.remove(self.path_for(filename))
+        self.storage.forget(self.path_for(filename))
+        self.invalidate(filename)
+
+    def merge_tasks(self, filenames, new_name):
+        # Stream the rows of several tasks into a new task file; returns per-file row counts
+        self._check_new_name(new_name)
+        paths = [self.path_for(f) for f in filenames]
+        self.writer.flush(paths=paths)  # The merge streams from disk, so queued saves must land first
+        with timer('merge', task=new_name, files=len(paths)):
+            result = merge_task_files(paths, self.path_for(new_name))
+        result['rows'] = {f: result['rows'][p] for f, p in zip(filenames, paths)}
+        return result
+
+    def bulk_edit(self, filenames, fields=None, add_filters=(), remove_sections=(), max_workers=8, progress=None):
+        """
+        apply_bulk_edit on several tasks, all or nothing. Each task is loaded,
+        edited and written once to a temp file on a thread pool (only its changed
+        columns are re-encoded); the files are renamed into place together only
+        when every task succeeded, see publish_staged. Raises BulkEditError
+        naming the first task that failed. progress(done, total) is called from
+        the worker threads. Returns {filename: [changed columns]} for the tasks
+        that changed.
+        """
+        from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+        # Queued saves of these tasks must be part of the edit
+        self.writer.flush(paths=[self.path_for(f) for f in filenames])
+        total = len(filenames)
+        done = [0]
+        done_lock = threading.Lock()
+
+        def stage(filename):
+            df = self.load_task(filename)
+            columns = apply_bulk_edit(df, fields, add_filters, remove_sections)
+            tmp_path = self.storage.stage(self.path_for(filename), df, columns) if columns else None
+            with done_lock:
+                done[0] += 1
+                n = done[0]
+            if progress:
+                progress(n, total)
+            return df, columns, tmp_path
+
+        with timer('bulk_edit', files=total), \
+                ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bulk-edit') as pool:
+            futures = {pool.submit(stage, f): f for f in filenames}
+            finished, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            failed = next((fut for fut in futures if fut in finished and fut.exception() is not None), None)
+            if failed is not None:
+                for fut in futures:
+                    fut.cancel()
+            wait(futures)  # Workers already running finish their temp file before it is removed
+        staged = {futures[fut]: fut.result() for fut in futures if not fut.cancelled() and fut.exception() is None}
+        if failed is not None:
+            for _, _, tmp_path in staged.values():
+                if tmp_path is not None:
+                    os.remove(tmp_path)
+            raise BulkEditError(futures[failed], failed.exception()) from failed.exception()
+        changed = {f: s for f, s in staged.items() if s[2] is not None}
+        publish_staged([(tmp_path, self.path_for(f)) for f, (_, _, tmp_path) in changed.items()])
+        for filename, (df, _, _) in changed.items():
+            path = self.path_for(filename)
+            self.storage.published(path, df)
+            self._cache_put(filename, os.stat(path), df)
+        count('bulk_edit.files', len(changed))
+        return {f: columns for f, (_, columns, _) in changed.items()}
+
+    def split_task(self, filename, mode='rows', shards=2, prefix_len=None, overrides=None, max_workers=4):
+        """
+        Split a task into shard files next to it ('drake.csv' -> 'drake-1.csv', ...),
+        the inverse of merge_tasks. The row positions of every shard come from one
+        pass over the task (see split_engine.shard_positions); its raw CSV rows are
+        then copied into temp files on a thread pool, byte for byte except for the
+        overridden columns, and renamed into place together only when all of them
+        are complete. overrides maps a shard label to dynamic fields set on that
+        shard only. The source task is kept.
+        Returns [{'task', 'label', 'rows'}, ...] in shard order.
+        """
+        from concurrent.futures import ThreadPoolExecutor, wait
+        overrides = overrides or {}
+        for fields in overrides.values():
+            check_fields(fields)
+        # A queued save of the source must be part of the shards
+        self.writer.flush(paths=[self.path_for(filename)])
+        header, records = read_csv_records(self.path_for(filename))
+        with timer('split.partition', task=filename, mode=mode):
+            profile_names = csv_column(header, records, PREFIX_COLUMN) if mode == 'prefix' else None
+            parts = shard_positions(len(records), mode, shards, prefix_len, profile_names)
+        labels = [label for label, _ in parts]
+        unknown = sorted(set(overrides) - set(labels))
+        if unknown:
+            raise ValueError(f'No shard named {", ".join(unknown)} (shards are {", ".join(labels)})')
+        names = shard_names(filename, labels)
+        for name in names:
+            self._check_new_name(name)
+
+        def stage(name, label, positions):
+            return stage_records(self.path_for(name), header, [records[i] for i in positions], overrides.get(label))
+
+        with timer('split', task=filename, shards=len(parts)), \
+                ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='split') as pool:
+            futures = [pool.submit(stage, name, label, positions) for name, (label, positions) in zip(names, parts)]
+            wait(futures)
+        failed = next((fut for fut in futures if fut.exception() is not None), None)
+        if failed is not None:
+            for fut in futures:
+                if fut.exception() is None:
+                    os.remove(fut.result())
+            raise failed.exception()
+        publish_staged([(fut.result(), self.path_for(name)) for name, fut in zip(names, futures)])
+        count('split.shards', len(names))
+        return [{'task': name, 'label': label, 'rows': len(positions)}
+                for name, (label, positions) in zip(names, parts)]
+
+    def invalidate(self, filename=None):
+        # Drop one cached task, or the whole cache when no filename is given
+        with self._cache_lock:
+            if filename is None:
+                self._cache.clear()
+                self._cache_bytes = 0
+                return
+            entry = self._cache.pop(filename, None)
+            if entry is not None:
+                self._cache_bytes -= entry[2]
+
+    def is_own_event(self, event_type, *paths):
+        # Watcher events that only come from this app's atomic writes: the temp file
+        # appearing/vanishing/being written, being renamed over a task we already know
+        # about, or a task reported modified while it still matches our cached copy
+        if all(is_temp_path(p) for p in paths):
+            return True
+        if event_type == 'moved' and len(paths) == 2 and is_temp_path(paths[0]):
+            return self.roots.name_for(paths[1]) in self._cache or self.writer.pending(paths[1]) is not None
+        if event_type == 'modified' and len(paths) == 1:
+            name = self.roots.name_for(paths[0])
+            try:
+                st = os.stat(paths[0])
+            except OSError:
+                return False
+            with self._cache_lock:
+                entry = self._cache.get(name)
+            return entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size
+        return False
+
+    def on_file_event(self, event_type, *paths):
+        # Keep the cache in step with FileWatcher events (same signature as its callback)
+        if event_type == 'directory':
+            return  # A folder came or went; entries under it fail their stat check on next load
+        for path in paths:
+            self.roots.forget(path)
+        if event_type == 'moved' and len(paths) == 2:
+            src, dest = (self.roots.name_for(p) for p in paths)
+            if dest is not None and dest.lower().endswith('.csv'):
+                self.storage.moved(*paths)  # The working copy follows the file
+            else:
+                self.storage.forget(paths[0])
+            with self._cache_lock:
+                entry = self._cache.pop(src, None)
+                if entry is not None:
+                    self._cache_bytes -= entry[2]
+            # A rename keeps the content; re-key the entry so the stat check can revalidate it
+            if dest is None:
+                return
+            if entry is not None and dest.lower().endswith('.csv'):
+                dest_path = self.path_for(dest)
+                try:
+                    st = os.stat(dest_path)
+                except OSError:
+                    return
+                self._cache_put(dest, st, entry[3], entry[4])
+            else:
+                self._revalidate(dest)
+            return
+        if event_type == 'deleted':
+            for path in paths:
+                self.storage.forget(path)
+                if self.roots.name_for(path) is not None:
+                    self.invalidate(self.roots.name_for(path))
+            return
+        for path in paths:  # 'created' or 'modified'
+            if self.roots.name_for(path) is not None:
+                self._revalidate(self.roots.name_for(path))
+
+    def _revalidate(self, filename):
+        # Drop a cached entry unless it still matches the file on disk (e.g. our own save)
+        try:
+            st = os.stat(self.path_for(filename))
+        except OSError:
+            self.invalidate(filename)
+            return
+        with self._cache_lock:
+            entry = self._cache.get(filename)
+            if entry is None or (entry[0] == st.st_mtime_ns and entry[1] == st.st_size):
+                return
+        self.invalidate(filename)
+
+    def _matches_cached(self, filename, path, df):
+        # Dirty check against the cached copy of the file, if that copy is still current
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        with self._cache_lock:
+            entry = self._cache.get(filename)
+        if entry is None or entry[4] is not None or entry[0] != st.st_mtime_ns or entry[1] != st.st_size:
+            return False
+        return _same_content(entry[3], df)
+
+    def _on_written(self, path, df):
+        # Writer thread: what we just wrote is what the next load would parse, so keep it warm
+        self._cache_put(self.roots.name_for(path), os.stat(path), df)
+
+    def _on_write_error(self, path, exc):
+        self.invalidate(self.roots.name_for(path))
+        if self.on_save_error:
+            self.on_save_error(self.roots.name_for(path), exc)
+
+    def _cache_put(self, filename, st, df, columns=None):
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        with self._cache_lock:
+            old = self._cache.pop(filename, None)
+            if old is not None:
+                self._cache_bytes -= old[2]
+            if nbytes > self.cache_max_bytes:
+                return  # Never let a single huge task flush everything else
+            self._cache[filename] = (st.st_mtime_ns, st.st_size, nbytes, df, columns)
+            self._cache_bytes += nbytes
+            # Evict least recently used entries until we are back under the cap
+            while self._cache_bytes > self.cache_max_bytes and self._cache:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= evicted[2]
+
+def read_task_csv(path, columns=None, typed=True):
+    # Parse a task or template CSV, optionally limited to some columns, with TASK_DTYPES
+    import pandas as pd
+    usecols = None if columns is None else (lambda c: c in columns)
+    if typed:
+        try:
+            return pd.read_csv(path, dtype=TASK_DTYPES, usecols=usecols)
+        except (ValueError, TypeError):
+            pass  # e.g. a 'hidden' value that is not a boolean; keep the file loadable
+    return pd.read_csv(path, usecols=usecols)
+
+def normalize_task_name(name):
+    # Task filenames always end in .csv
+    name = name.strip()
+    return name if name.lower().endswith('.csv') else name + '.csv'
+
+def check_fields(fields):
+    # Every edit path (set, create, bulk edit, split overrides, the undo journal) only writes DYNAMIC_FIELDS
+    for field in fields:
+        if field not in DYNAMIC_FIELDS:
+            raise ValueError(f'"{field}" is not an editable field (expected one of {", ".join(DYNAMIC_FIELDS)})')
+
+def apply_fields(df, fields, mask=None):
+    # Write dynamic field values into df in place (all rows, or rows where mask is True)
+    check_fields(fields)
+    for field, value in fields.items():
+        if field not in df.columns:
+            df[field] = None
+        if df[field].dtype != object:
+            df[field] = df[field].astype(object)
+        if mask is None:
+            df[field] = value
+        else:
+            df.loc[mask, field] = value
+    return len(df) if mask is None else int(mask.sum())
+
+def apply_bulk_edit(df, fields=None, add_filters=(), remove_sections=()):
+    """
+    One bulk edit of a whole task, in place: set dynamic fields on every row,
+    then add (section, price) entries to extra_filter and/or remove sections
+    from it (see edit_extra_filter). Returns the columns whose values changed.
+    """
+    import pandas as pd
+    fields = fields or {}
+    edit_filters = bool(add_filters or remove_sections)
+    touched = set(fields) | ({'extra_filter'} if edit_filters else set())
+    before = {col: df[[col]].copy() for col in touched if col in df.columns}
+    apply_fields(df, fields)
+    if edit_filters:
+        if 'extra_filter' not in df.columns:
+            df['extra_filter'] = None
+        # Tasks share a handful of distinct filter strings; edit each of them once
+        codes, uniques = pd.factorize(df['extra_filter'])
+        edited = [edit_extra_filter(u, add_filters, remove_sections) for u in uniques]
+        missing = edit_extra_filter(None, add_filters, remove_sections)
+        df['extra_filter'] = pd.Series([edited[c] if c >= 0 else missing for c in codes], index=df.index, dtype=object)
+    return [col for col in df.columns if col in touched and (col not in before or not _same_content(before[col], df[[col]]))]
 
-    def load_task(self, filename):
-        # Load a CSV file as a pandas DataFrame
-        path = os.path.join(self.tasks_dir, filename)
-        print(f"Attempting to load file at: {os.path.abspath(path)}")  # Debug log
-        print(f"File exists: {os.path.exists(path)}")  # Debug log
-        return pd.read_csv(path)
+def _project(df, columns):
+    # Copy of df, limited to the requested columns that it actually has
+    if columns is None:
+        return df.copy()
+    return df[[c for c in df.columns if c in columns]].copy()
 
-    def save_task(self, filename, df):
-        # Save a pandas DataFrame to a CSV file
-        path = os.path.join(self.tasks_dir, filename)
-        df.to_csv(path, index=False)
+def _same_content(a, b):
+    # Columns that kept their dtype are compared directly; the rest (e.g. a NaN column
+    # overwritten with '' from an Entry) are compared as the text to_csv would write
+    if list(a.columns) != list(b.columns) or len(a) != len(b):
+        return False
+    for col in a.columns:
+        x, y = a[col], b[col]
+        if x.dtype == y.dtype and x.reset_index(drop=True).equals(y.reset_index(drop=True)):
+            continue
+        if not (x.fillna('').astype(str).values == y.fillna('').astype(str).values).all():
+            return False
+    return True
 
 if __name__ == "__main__":
     # Minimal test: list tasks and load the first one
@@ -30,4 +497,4 @@ if __name__ == "__main__":
     if tasks:
         df = manager.load_task(tasks[0])
         print(f"Loaded {tasks[0]}:")
-        print(df.head()) 
\ No newline at end of file
+        print(df.head())
@@ -0,0 +1,120 @@
+import os
+import threading
+
+# Extra task roots, separated like PATH (';' on Windows, ':' elsewhere)
+TASK_ROOTS_ENV = 'TASKGEN_TASK_ROOTS'
+
+def configured_task_roots(default):
+    # Directories named by TASKGEN_TASK_ROOTS, else just the default tasks directory
+    value = os.environ.get(TASK_ROOTS_ENV, '').strip()
+    roots = [d for d in value.split(os.pathsep) if d.strip()] if value else []
+    return roots or [default]
+
+class TaskRoots:
+    """
+    One or more task directories, searched recursively. Task names are paths
+    relative to their root with '/' separators ('venue/2024-06/drake.csv').
+    The first root is mounted at the top; every other root under its folder
+    name with a leading dot ('.archive/...'), numbered if two roots share a
+    name. Hidden folders of the first root are never listed, so a mount
+    cannot shadow a real folder of it.
+
+    scan() keeps the listing of each directory and only re-lists a directory
+    whose mtime changed (a file was added, removed or renamed in it); the
+    files are stat'ed again on every scan, as a file rewritten in place does
+    not change its directory's mtime.
+    """
+    def __init__(self, dirs):
+        if not dirs:
+            raise ValueError('At least one tasks directory is required')
+        self.primary = dirs[0]
+        self._mounts = [('', os.path.abspath(dirs[0]))]  # (label, abs dir)
+        used = set()
+        for d in dirs[1:]:
+            base = '.' + (os.path.basename(os.path.normpath(d)).lstrip('.') or 'root')
+            label, n = base, 1
+            while label in used:
+                n += 1
+                label = f'{base}-{n}'
+            used.add(label)
+            self._mounts.append((label, os.path.abspath(d)))
+        self._labels = used
+        self._lock = threading.Lock()
+        self._dirs = {}  # abs dir -> (mtime_ns, [.csv file names], [sub dir names])
+
+    def dirs(self):
+        # Absolute root directories, e.g. for the file watcher
+        return [d for _, d in self._mounts]
+
+    def path_for(self, name):
+        # Filesystem path of a task name
+        parts = name.replace('\\', '/').split('/')
+        for label, root in self._mounts[1:]:
+            if len(parts) > 1 and parts[0] == label:
+                return os.path.join(root, *parts[1:])
+        return os.path.join(self._mounts[0][1], *parts)
+
+    def name_for(self, path):
+        # Task name of a filesystem path, or None if it is outside every root
+        path = os.path.abspath(path)
+        best = None
+        for label, root in self._mounts:
+            if path.startswith(root + os.sep) and (best is None or len(root) > len(best[1])):
+                best = (label, root)
+        if best is None:
+            return None
+        rel = os.path.relpath(path, best[1]).replace(os.sep, '/')
+        if not best[0] and rel.partition('/')[0] in self._labels:
+            return None  # A hidden folder of the first root named like a mount: not listed, not a task
+        return f'{best[0]}/{rel}' if best[0] else rel
+
+    def scan(self):
+        # name -> os.stat_result for every .csv under the roots (hidden files and folders skipped)
+        found = {}
+        with self._lock:
+            seen = set()
+            for label, root in self._mounts:
+                self._scan_dir(root, f'{label}/' if label else '', found, seen)
+            for d in [d for d in self._dirs if d not in seen]:
+                del self._dirs[d]  # Folder was removed
+        return found
+
+    def _scan_dir(self, directory, prefix, found, seen):
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return
+        seen.add(directory)
+        cached = self._dirs.get(directory)
+        if cached is not None and cached[0] == mtime:
+            subdirs = cached[2]
+            for name in cached[1]:
+                try:
+                    found[prefix + name] = os.stat(os.path.join(directory, name))
+                except OSError:
+                    pass  # Removed since the listing
+        else:
+            files, subdirs = [], []
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.name.startswith('.'):
+                        continue  # e.g. our own temp files
+                    if entry.is_dir():
+                        subdirs.append(entry.name)
+                    elif entry.name.lower().endswith('.csv') and entry.is_file():
+                        files.append(entry.name)
+                        found[prefix + entry.name] = entry.stat()
+            self._dirs[directory] = (mtime, files, subdirs)
+        for sub in subdirs:
+            self._scan_dir(os.path.join(directory, sub), f'{prefix}{sub}/', found, seen)
+
+    def forget(self, path):
+        # Watcher hint: the folder holding path changed, so list it afresh next scan
+        with self._lock:
+            self._dirs.pop(os.path.dirname(os.path.abspath(path)), None)
+
+if __name__ == "__main__":
+    # Minimal test: list every task under the configured roots
+    roots = TaskRoots(configured_task_roots(os.path.join(os.path.dirname(__file__), '../shhh/tasks/TASKS')))
+    for name, st in sorted(roots.scan().items()):
+        print(name, st.st_size)
@@ -0,0 +1,175 @@
+"""
+How TaskManager reads and writes task frames.
+
+CsvStorage parses the task CSVs on every cache miss. FeatherStorage keeps a
+Feather (Arrow) working copy of each task outside the tasks directory and
+only parses a CSV when its copy is missing or older than the CSV; saves
+still write the bot-ready CSV first, so the CSVs are unchanged either way.
+Feather needs pyarrow, which is optional.
+
+TASKGEN_STORAGE=csv|feather picks one; by default Feather is used when
+pyarrow is installed.
+"""
+import hashlib
+import importlib.util
+import json
+import os
+
+from instrumentation import count
+from task_writer import (CsvPatchError, atomic_write_csv, make_temp_file, patch_csv_columns, stage_csv,
+                         stage_patched_csv)
+
+STORAGE_ENV = 'TASKGEN_STORAGE'
+DEFAULT_WORKING_DIR = os.path.join(os.path.dirname(__file__), 'working_copy')
+_STAMP_KEY = b'taskgen.csv_stamp'  # (mtime_ns, size) of the CSV a working copy was made from
+
+class CsvStorage:
+    name = 'csv'
+
+    def __init__(self, typed=True):
+        self.typed = typed
+
+    def read(self, path, columns=None):
+        from task_manager import read_task_csv
+        return read_task_csv(path, columns, typed=self.typed)
+
+    def write(self, path, df, columns=None):
+        # With columns, only those are rewritten in place and every other byte is kept
+        if columns is not None and os.path.exists(path):
+            try:
+                patch_csv_columns(path, df, columns)
+                count('save.patched')
+                return
+            except CsvPatchError:
+                count('save.patch_fallback')  # File no longer matches the frame; write it whole
+        atomic_write_csv(path, df)
+
+    def stage(self, path, df, columns=None):
+        # Like write, but the new CSV is left in a temp file for task_writer.publish_staged;
+        # call published() once it has been renamed into place
+        if columns is not None and os.path.exists(path):
+            try:
+                tmp_path = stage_patched_csv(path, df, columns)
+                count('save.patched')
+                return tmp_path
+            except CsvPatchError:
+                count('save.patch_fallback')
+        return stage_csv(path, df)
+
+    def published(self, path, df):
+        pass  # Nothing besides the CSV itself
+
+    def forget(self, path):
+        pass  # Nothing besides the CSV itself
+
+    def moved(self, src, dest):
+        pass  # Nothing besides the CSV itself
+
+class FeatherStorage(CsvStorage):
+    name = 'feather'
+
+    def __init__(self, working_dir=DEFAULT_WORKING_DIR, typed=True):
+        super().__init__(typed)
+        self.working_dir = working_dir
+
+    def copy_path(self, path):
+        # working_dir/<hash of the task's folder>/<name>.feather, so equal names in two folders never clash
+        path = os.path.abspath(path)
+        folder = hashlib.sha1(os.path.dirname(path).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.working_dir, folder, os.path.basename(path) + '.feather')
+
+    def read(self, path, columns=None):
+        st = os.stat(path)
+        df = self._read_copy(path, (st.st_mtime_ns, st.st_size), columns)
+        if df is not None:
+            return df
+        # No usable copy: parse the whole CSV once, keep it as the working copy, then project
+        df = super().read(path)
+        self._write_copy(path, df, (st.st_mtime_ns, st.st_size))
+        if columns is not None:
+            df = df[[c for c in df.columns if c in columns]]
+        return df
+
+    def write(self, path, df, columns=None):
+        super().write(path, df, columns)
+        self.published(path, df)
+
+    def published(self, path, df):
+        st = os.stat(path)
+        self._write_copy(path, df, (st.st_mtime_ns, st.st_size))
+
+    def forget(self, path):
+        # Best effort, like _write_copy: a copy that cannot be removed is still rejected by its stamp
+        try:
+            os.remove(self.copy_path(path))
+        except OSError:
+            pass
+
+    def moved(self, src, dest):
+        # A rename keeps the CSV's (mtime, size), so the copy of src is still good for dest
+        copy = self.copy_path(dest)
+        try:
+            os.makedirs(os.path.dirname(copy), exist_ok=True)
+            os.replace(self.copy_path(src), copy)
+        except OSError:
+            self.forget(src)
+            self.forget(dest)  # Made from the file the rename replaced
+
+    def _read_copy(self, path, stamp, columns):
+        import pyarrow as pa
+        from pyarrow import feather
+        copy = self.copy_path(path)
+        try:
+            with pa.memory_map(copy) as source:
+                schema = pa.ipc.open_file(source).schema
+            metadata = schema.metadata or {}
+            if json.loads(metadata.get(_STAMP_KEY, b'null')) != list(stamp):
+                return None  # The CSV changed since the copy was made
+            names = schema.names if columns is None else [c for c in schema.names if c in columns]
+            return feather.read_table(copy, columns=names, memory_map=True).to_pandas()
+        except (OSError, ValueError, pa.ArrowException):
+            return None
+
+    def _write_copy(self, path, df, stamp):
+        # Best effort: a frame Arrow cannot store (e.g. mixed-type column) just stays CSV-only
+        import pyarrow as pa
+        from pyarrow import feather
+        copy = self.copy_path(path)
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(copy), exist_ok=True)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                                   _STAMP_KEY: json.dumps(list(stamp)).encode()})
+            fd, tmp_path = make_temp_file(copy)
+            os.close(fd)
+            feather.write_feather(table, tmp_path)
+            os.replace(tmp_path, copy)
+        except (OSError, ValueError, TypeError, pa.ArrowException):
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self.forget(path)
+
+def default_storage(typed=True):
+    # Storage named by TASKGEN_STORAGE, else Feather when pyarrow is installed
+    choice = os.environ.get(STORAGE_ENV, '').strip().lower()
+    if choice == 'csv':
+        return CsvStorage(typed)
+    if choice not in ('', 'feather'):
+        raise ValueError(f'{STORAGE_ENV} must be "csv" or "feather", not "{choice}"')
+    if importlib.util.find_spec('pyarrow') is None:
+        if choice == 'feather':
+            raise ImportError(f'{STORAGE_ENV}=feather needs pyarrow (pip install pyarrow)')
+        return CsvStorage(typed)
+    return FeatherStorage(typed=typed)
+
+if __name__ == "__main__":
+    # Minimal test: load the template through the default storage twice
+    import time
+    storage = default_storage()
+    path = os.path.join(os.path.dirname(__file__), '400Template.csv')
+    for attempt in ('first', 'second'):
+        start = time.perf_counter()
+        df = storage.read(path)
+        print(storage.name, attempt, df.shape, f'{(time.perf_counter() - start) * 1000:.1f} ms')
+    storage.forget(path)
@@ -0,0 +1,214 @@
+"""
+Whole-directory task validation. Every rule is one vectorized pass over a
+column of the task (read as plain strings):
+
+    product        missing or not an http(s) URL (README: the event URL is required)
+    quantity       not a positive integer
+    account        not 'email:password'
+    proxy_unique   not 'host:port' or 'host:port:user:password' (empty is allowed)
+    extra_filter   not 'Section:Price, ...' (see extra_filter_builder)
+    duplicate      the same account twice for the same event in one file
+
+TaskValidator keeps the issues of every task keyed by (mtime, size), so after
+the first run only files that changed are checked again; a sync that finds many
+stale files checks them on a process pool (see task_index.sync_all). The
+results are also written to a JSON report (TASKGEN_VALIDATION_REPORT, default
+validation_report.json next to this file), which doubles as the cache for the
+next run. It is written after every sync; watcher updates are batched into at
+most one write per REPORT_DELAY seconds, so a bot rewriting many files does not
+rewrite the whole report once per file (flush_report() writes a pending one).
+"""
+import json
+import os
+import threading
+import time
+
+from extra_filter_builder import validate_extra_filter_column
+from task_index import TaskIndex
+from task_writer import make_temp_file
+
+REPORT_ENV = 'TASKGEN_VALIDATION_REPORT'
+DEFAULT_REPORT_PATH = os.path.join(os.path.dirname(__file__), 'validation_report.json')
+RULES = ('unreadable', 'columns', 'product', 'quantity', 'account', 'proxy_unique', 'extra_filter', 'duplicate')
+MAX_LINES = 20  # CSV line numbers kept per issue; 'count' has the full number
+REPORT_DELAY = 2.0  # Seconds a watcher update waits, gathering more, before the report is written
+
+_COLUMNS = ('product', 'quantity', 'account', 'proxy_unique', 'extra_filter')  # Checked; the rest is not
+_PRODUCT_RE = r'https?://[^\s/?#]+\S*'
+_ACCOUNT_RE = r'[^\s@:]+@[^\s@:]+\.[^\s@:]+:\S+'
+_PROXY_RE = r'[^\s:]+:(\d{1,5})(?::[^\s:]+:\S+)?'
+
+def configured_report_path():
+    return os.environ.get(REPORT_ENV, '').strip() or DEFAULT_REPORT_PATH
+
+def _issue(rule, message, bad):
+    # bad: boolean Series over the rows; lines are CSV line numbers (header is line 1)
+    import numpy as np
+    positions = np.flatnonzero(bad.to_numpy())
+    if not len(positions):
+        return None
+    return {'rule': rule, 'message': message, 'count': int(len(positions)),
+            'lines': [int(p) + 2 for p in positions[:MAX_LINES]]}
+
+def validate_frame(df):
+    # Issues of one task frame (all columns as str, empty cells as ''), in RULES order
+    import pandas as pd
+    missing = [col for col in ('product', 'quantity', 'account') if col not in df.columns]
+    issues = [{'rule': 'columns', 'message': f'Missing column {", ".join(missing)}', 'count': len(missing),
+               'lines': [1]}] if missing else []
+    checks = []
+    if 'product' in df.columns:
+        product = df['product'].str.strip()
+        checks.append(('product', 'Missing or malformed product URL', ~product.str.fullmatch(_PRODUCT_RE)))
+    if 'quantity' in df.columns:
+        quantity = pd.to_numeric(df['quantity'].str.strip(), errors='coerce')
+        checks.append(('quantity', 'Quantity is not a positive integer', ~((quantity > 0) & (quantity % 1 == 0))))
+    if 'account' in df.columns:
+        checks.append(('account', 'Account is not email:password', ~df['account'].str.fullmatch(_ACCOUNT_RE)))
+    if 'proxy_unique' in df.columns:
+        proxy = df['proxy_unique'].str.strip()
+        port = pd.to_numeric(proxy.str.extract(f'^{_PROXY_RE}$', expand=False), errors='coerce')
+        ok = proxy.eq('') | port.between(1, 65535)
+        checks.append(('proxy_unique', 'Proxy is not host:port[:user:password]', ~ok))
+    if 'extra_filter' in df.columns:
+        checks.append(('extra_filter', 'Unparseable extra_filter (expected "Section:Price, ...")',
+                       ~validate_extra_filter_column(df['extra_filter'])))
+    if 'account' in df.columns:
+        # Multi-event tasks repeat their accounts once per event, so duplicates are per product
+        account = df['account'].str.strip().str.lower()
+        event = df['product'].str.strip() if 'product' in df.columns else ''
+        dup = pd.DataFrame({'product': event, 'account': account}).duplicated() & account.ne('')
+        checks.append(('duplicate', 'Account used twice for the same event', dup))
+    for rule, message, bad in checks:
+        found = _issue(rule, message, bad)
+        if found is not None:
+            issues.append(found)
+    return issues
+
+def check_task_rows(name, header, rows):
+    # Issues of one task (see task_index.read_task_rows); top-level so it can run on a process pool
+    import pandas as pd
+    width = len(header)
+    for line, row in enumerate(rows, start=2):
+        if len(row) > width:
+            # Where pandas would stop with a parser error
+            return [_unreadable_issue(f'line {line} has {len(row)} fields, the header {width}')]
+    positions = [(col, i) for i, col in enumerate(header) if col in _COLUMNS]
+    df = pd.DataFrame({col: [row[i] if i < len(row) else '' for row in rows] for col, i in positions},
+                      dtype=object)
+    return validate_frame(df)
+
+def _unreadable_issue(message):
+    return {'rule': 'unreadable', 'message': f'Cannot read the file: {message}', 'count': 1, 'lines': []}
+
+class TaskValidator(TaskIndex):
+    """
+    Validation results for every task, kept like the other task indexes:
+    sync() checks what changed since the last run (on a process pool when
+    many files did), on_file_event() follows the watcher. Changes are written
+    to the report file when report_path is set: right after a sync, and
+    report_delay seconds after the first of a run of watcher updates.
+    """
+    scan_rows = staticmethod(check_task_rows)
+    use_processes = True
+
+    def __init__(self, tasks_dir, report_path=None, max_workers=None, report_delay=REPORT_DELAY):
+        super().__init__(tasks_dir)  # _files: filename -> (mtime_ns, size, issues)
+        self.report_path = report_path
+        self.max_workers = max_workers
+        self.report_delay = report_delay
+        self._report_lock = threading.Lock()
+        self._report_timer = None  # Delayed save_report of watcher updates not yet written
+        self._timer_lock = threading.Lock()
+        if report_path:
+            self._load_report()
+
+    def _load_report(self):
+        # Seed the cache from the previous report; entries whose file changed since are re-checked
+        try:
+            with open(self.report_path, 'r', encoding='utf-8') as f:
+                tasks = json.load(f).get('tasks', {})
+            files = {name: (t['mtime_ns'], t['size'], t['issues']) for name, t in tasks.items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return  # Missing or from an older version: check everything
+        with self._lock:
+            self._files = files
+
+    def _unreadable(self, filename, st, error):
+        return self._store(filename, st, [_unreadable_issue(error)])
+
+    def _synced(self):
+        # Also after a sync that changed nothing, so the report file exists even when nothing is wrong
+        self._cancel_delayed_report()
+        self.save_report()
+
+    def _saved(self):
+        # A watcher update: the first one starts the timer, the ones after it ride along
+        if not self.report_path:
+            return
+        with self._timer_lock:
+            if self._report_timer is None:
+                self._report_timer = threading.Timer(self.report_delay, self.flush_report)
+                self._report_timer.daemon = True
+                self._report_timer.start()
+
+    def _cancel_delayed_report(self):
+        # True if a delayed write was pending
+        with self._timer_lock:
+            timer, self._report_timer = self._report_timer, None
+        if timer is None:
+            return False
+        timer.cancel()
+        return True
+
+    def flush_report(self):
+        # Write the report now if watcher updates are still waiting for it (call before exiting)
+        if self._cancel_delayed_report():
+            self.save_report()
+
+    def issues(self, filename):
+        with self._lock:
+            known = self._files.get(filename)
+        return list(known[2]) if known else []
+
+    def invalid_tasks(self):
+        # filename -> number of failing rows (summed over its issues), only for tasks with issues
+        with self._lock:
+            return {name: sum(i['count'] for i in issues) for name, (_, _, issues) in self._files.items() if issues}
+
+    def report(self):
+        with self._lock:
+            files = dict(self._files)
+        return {
+            'generated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'checked': len(files),
+            'invalid': sum(1 for _, _, issues in files.values() if issues),
+            'tasks': {name: {'mtime_ns': mtime, 'size': size, 'issues': issues}
+                      for name, (mtime, size, issues) in sorted(files.items())},
+        }
+
+    def save_report(self, path=None):
+        # Atomic, like the task files: readers see the old report or the complete new one
+        path = path or self.report_path
+        if not path:
+            return
+        with self._report_lock:
+            fd, tmp_path = make_temp_file(path)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self.report(), f, indent=1)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+if __name__ == "__main__":
+    # Minimal test: validate the TASKS directory twice (the second run only re-checks changes)
+    validator = TaskValidator(os.path.join(os.path.dirname(__file__), '../shhh/tasks/TASKS'), configured_report_path())
+    for attempt in (1, 2):
+        start = time.perf_counter()
+        changed = validator.sync()
+        print(f"Run {attempt}: {len(changed)} changed in {time.perf_counter() - start:.2f} s")
+    for name, rows in sorted(validator.invalid_tasks().items()):
+        print(name, rows, [i['rule'] for i in validator.issues(name)])
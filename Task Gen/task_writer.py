@@ -0,0 +1,386 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+from instrumentation import timer
+
+TEMP_SUFFIX = '.tmp'
+# Line ending for CSVs written whole when there is no file to take it from: the bot's
+# task CSVs and the bundled templates use CRLF on every platform
+DEFAULT_LINE_TERMINATOR = '\r\n'
+
+# One raw CSV field (quoted or not) per match, each starting at the line start or a comma
+_RAW_FIELD_RE = re.compile(rb'(?:^|,)("(?:[^"]|"")*"|[^,]*)')
+
+class CsvPatchError(ValueError):
+    # The file does not line up with the frame (columns/rows); write it in full instead
+    pass
+
+class SaveError(RuntimeError):
+    # Background writes that failed; errors maps each path to its exception
+    def __init__(self, errors):
+        super().__init__('; '.join(f'{os.path.basename(path)}: {exc}' for path, exc in errors.items()))
+        self.errors = errors
+
+def make_temp_file(path):
+    # Hidden temp file next to path: '.<name>.<random>.tmp' (see is_temp_path)
+    directory = os.path.dirname(os.path.abspath(path))
+    return tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix=TEMP_SUFFIX)
+
+def is_temp_path(path):
+    # True for the temp files this app writes before renaming them into place
+    name = os.path.basename(path)
+    return name.startswith('.') and name.endswith(TEMP_SUFFIX)
+
+def atomic_write_csv(path, df):
+    # Write df next to path, fsync it, then rename over path so readers (the bot)
+    # only ever see the old file or the complete new one
+    _publish(stage_csv(path, df), path)
+
+def stage_csv(path, df):
+    # The first half of atomic_write_csv: df in a fsynced temp file next to path; returns its path.
+    # Lines end like the file being replaced, so a full rewrite keeps its CRLFs
+    terminator = line_terminator(path)
+    fd, tmp_path = make_temp_file(path)
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+            df.to_csv(f, index=False, lineterminator=terminator)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+    return tmp_path
+
+def _publish(tmp_path, path):
+    try:
+        os.replace(tmp_path, path)
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def publish_staged(staged):
+    """
+    Rename every (tmp_path, path) of staged over its path, all or nothing.
+    Each existing target is hard-linked (or copied) to a hidden backup first;
+    if any rename fails, the targets already replaced are put back from their
+    backups and the remaining temp files are removed before re-raising.
+    """
+    backups = []
+    done = []
+    try:
+        for _, path in staged:
+            backups.append(_backup(path))
+        for tmp_path, path in staged:
+            os.replace(tmp_path, path)
+            done.append(path)
+    except BaseException:
+        for path, backup in zip(done, backups):
+            if backup is None:
+                _remove_quietly(path)
+            else:
+                os.replace(backup, path)
+        for tmp_path, path in staged:
+            if path not in done:
+                _remove_quietly(tmp_path)
+        raise
+    finally:
+        for backup in backups:
+            if backup is not None:
+                _remove_quietly(backup)
+
+def _backup(path):
+    # Second name for the current contents of path (None if it does not exist yet)
+    if not os.path.exists(path):
+        return None
+    fd, backup = make_temp_file(path)
+    os.close(fd)
+    try:
+        os.remove(backup)
+        os.link(path, backup)  # Free on the same volume
+    except OSError:
+        shutil.copyfile(path, backup)  # No hard links here (e.g. FAT, some network shares)
+    return backup
+
+def atomic_copy_file(src, dest):
+    # Byte-for-byte copy of src to dest, published with the same temp file + rename as saves.
+    # shutil.copyfile lets the OS copy the data (sendfile/CopyFile) without passing it through Python
+    fd, tmp_path = make_temp_file(dest)
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp_path)
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, dest)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _encode_field(value, memo):
+    # One cell as to_csv would write it (QUOTE_MINIMAL, NaN/None as empty), as UTF-8 bytes
+    if value is None or (isinstance(value, float) and value != value):
+        return b''
+    encoded = memo.get(value)
+    if encoded is None:
+        text = str(value)
+        if any(c in text for c in ',"\r\n'):
+            text = '"' + text.replace('"', '""') + '"'
+        encoded = memo[value] = text.encode('utf-8')
+    return encoded
+
+def _raw_records(f):
+    # (record, terminator) per CSV record of a binary file; quoted fields may span lines
+    pending = b''
+    for line in f:
+        pending += line
+        if pending.count(b'"') % 2:
+            continue  # Inside a quoted field; the record goes on on the next line
+        if pending.endswith(b'\r\n'):
+            yield pending[:-2], b'\r\n'
+        elif pending.endswith(b'\n'):
+            yield pending[:-1], b'\n'
+        else:
+            yield pending, b''
+        pending = b''
+    if pending:
+        raise CsvPatchError('unterminated quoted field at end of file')
+
+def line_terminator(path, default=DEFAULT_LINE_TERMINATOR):
+    # Line ending of the header of the CSV at path; default if it is missing or has a single line
+    try:
+        with open(path, 'rb') as f:
+            header = next(_raw_records(f), None)
+    except (OSError, CsvPatchError):
+        return default
+    return header[1].decode('ascii') if header is not None and header[1] else default
+
+def _split_raw(record):
+    if b'"' not in record:
+        return record.split(b',')
+    return _RAW_FIELD_RE.findall(record)
+
+def _header_names(header):
+    return [n.strip(b'"').decode('utf-8-sig') for n in _split_raw(header)]
+
+def _decode_field(raw):
+    # Inverse of _encode_field: the text of one raw cell
+    if raw.startswith(b'"') and raw.endswith(b'"') and len(raw) > 1:
+        raw = raw[1:-1].replace(b'""', b'"')
+    return raw.decode('utf-8')
+
+def read_csv_records(path):
+    """
+    The raw records of a CSV file as (header, [record, ...]); each is a
+    (bytes, line terminator) pair exactly as in the file. Blank lines are
+    dropped, as pandas does not count them as rows either.
+    """
+    with open(path, 'rb') as f:
+        records = _raw_records(f)
+        header = next(records, None)
+        if header is None:
+            raise CsvPatchError('empty file')
+        return header, [r for r in records if r[0]]
+
+def csv_column(header, records, name):
+    # The text of one column on every record (see read_csv_records), or None if the header lacks it
+    names = _header_names(header[0])
+    if name not in names:
+        return None
+    pos = names.index(name)
+    values = []
+    for record, _ in records:
+        cells = _split_raw(record)
+        values.append(_decode_field(cells[pos]) if pos < len(cells) else '')
+    return values
+
+def stage_records(path, header, records, fields=None):
+    """
+    header + records (see read_csv_records) in a fsynced temp file next to path,
+    with every column of fields set to its value on each row (columns the header
+    lacks are appended). All other bytes, quoting, number formatting and line
+    endings included, are copied through unchanged. Returns the temp file.
+    """
+    fields = fields or {}
+    header_record, header_terminator = header
+    names = _header_names(header_record)
+    memo = {}
+    positions = []
+    for col in fields:
+        if col not in names:
+            names.append(col)
+            header_record += b',' + _encode_field(col, memo)
+        positions.append(names.index(col))
+    values = [_encode_field(value, memo) for value in fields.values()]
+    fd, tmp_path = make_temp_file(path)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(header_record + header_terminator)
+            last = len(records) - 1
+            for i, (record, terminator) in enumerate(records):
+                if positions:
+                    cells = _split_raw(record)
+                    for pos, value in zip(positions, values):
+                        if pos >= len(cells):
+                            cells.extend([b''] * (pos + 1 - len(cells)))
+                        cells[pos] = value
+                    record = b','.join(cells)
+                # The file's last line may have no terminator; it only stays that way at the end
+                out.write(record + (terminator if terminator or i == last else header_terminator))
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+    return tmp_path
+
+def write_records(path, header, records, fields=None):
+    # stage_records published over path with the usual rename
+    _publish(stage_records(path, header, records, fields), path)
+
+def patch_csv_columns(path, df, columns):
+    """
+    Rewrite only `columns` of the CSV at path with the values of df (row i of
+    the file gets row i of df); every other byte, including quoting, number
+    formatting and line endings, is copied through unchanged. Published with
+    the usual temp file + rename. Raises CsvPatchError if the file's header or
+    row count does not match df.
+    """
+    _publish(stage_patched_csv(path, df, columns), path)
+
+def stage_patched_csv(path, df, columns):
+    # patch_csv_columns up to the rename: returns the fsynced temp file holding the patched CSV
+    fd, tmp_path = make_temp_file(path)
+    try:
+        with os.fdopen(fd, 'wb') as out, open(path, 'rb') as f:
+            records = _raw_records(f)
+            header, terminator = next(records, (None, b''))
+            if header is None:
+                raise CsvPatchError('empty file')
+            names = _header_names(header)
+            if names != list(df.columns):
+                raise CsvPatchError('columns differ from the frame')
+            positions = [names.index(col) for col in columns]
+            values = [df[col].tolist() for col in columns]
+            memos = [{} for _ in columns]
+            out.write(header + terminator)
+            row = 0
+            for record, terminator in records:
+                if not record:
+                    out.write(terminator)  # Blank line: not a row for pandas either
+                    continue
+                if row >= len(df):
+                    raise CsvPatchError('file has more rows than the frame')
+                fields = _split_raw(record)
+                for pos, column_values, memo in zip(positions, values, memos):
+                    if pos >= len(fields):
+                        fields.extend([b''] * (pos + 1 - len(fields)))
+                    fields[pos] = _encode_field(column_values[row], memo)
+                out.write(b','.join(fields) + terminator)
+                row += 1
+            if row != len(df):
+                raise CsvPatchError('file has fewer rows than the frame')
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+    return tmp_path
+
+class BackgroundWriter:
+    """
+    Write-behind queue for task files. Each path holds at most one pending
+    DataFrame; saving the same path again before it is written replaces the
+    pending frame, so only the latest state reaches disk. A failed write is
+    passed to on_error and kept for the next flush() that waits for its path,
+    until the path is saved again.
+    """
+    def __init__(self, on_written=None, on_error=None, write=None):
+        self.write = write or (lambda path, df, columns=None: atomic_write_csv(path, df))
+        # write(path, df, columns): columns names the only columns that changed, or None
+        self.on_written = on_written  # on_written(path, df) after a successful write
+        self.on_error = on_error      # on_error(path, exc) if a write fails
+        self._pending = {}            # path -> (DataFrame, changed columns or None), insertion ordered
+        self._in_flight = None        # (path, df) currently being written
+        self._errors = {}             # path -> exception of its latest write, until reported or saved again
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='task-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, path, df, columns=None):
+        # Queue df for path (the caller must not mutate df afterwards). columns limits the
+        # write to the columns that changed; a frame replacing a pending one inherits its columns
+        with self._cond:
+            self._errors.pop(path, None)
+            previous = self._pending.pop(path, None)
+            if previous is not None and columns is not None:
+                columns = None if previous[1] is None else list(dict.fromkeys([*previous[1], *columns]))
+            self._pending[path] = (df, None if columns is None else list(columns))
+            self._cond.notify_all()
+
+    def pending(self, path):
+        # Latest not-yet-written frame for path, or None
+        with self._cond:
+            if path in self._pending:
+                return self._pending[path][0]
+            if self._in_flight is not None and self._in_flight[0] == path:
+                return self._in_flight[1]
+            return None
+
+    def flush(self, timeout=None, paths=None):
+        # Block until everything queued so far has been written; returns False on timeout.
+        # Raises SaveError if the latest write of any of paths (default: every path) failed
+        with self._cond:
+            if not self._cond.wait_for(self._idle, timeout):
+                return False
+            failed = [path for path in self._errors if paths is None or path in paths]
+            errors = {path: self._errors.pop(path) for path in failed}
+        if errors:
+            raise SaveError(errors)
+        return True
+
+    def stop(self, timeout=None):
+        # Finish outstanding writes and stop the writer thread (failures went to on_error)
+        with self._cond:
+            self._cond.wait_for(self._idle, timeout)
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _idle(self):
+        return not self._pending and self._in_flight is None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._stopping)
+                if not self._pending:
+                    return  # Stopping and nothing left to write
+                path = next(iter(self._pending))
+                df, columns = self._pending.pop(path)
+                self._in_flight = (path, df)
+            try:
+                with timer('save.write', task=os.path.basename(path), rows=len(df),
+                           columns=None if columns is None else len(columns)):
+                    self.write(path, df, columns)
+                if self.on_written:
+                    self.on_written(path, df)
+            except Exception as e:
+                with self._cond:
+                    if path not in self._pending:  # A newer frame is queued: its write decides
+                        self._errors[path] = e
+                if self.on_error:
+                    self.on_error(path, e)
+            finally:
+                with self._cond:
+                    self._in_flight = None
+                    self._cond.notify_all()
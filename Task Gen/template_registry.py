@@ -0,0 +1,92 @@
+import os
+import threading
+
+from task_manager import DEFAULT_TEMPLATES_DIR
+from task_writer import read_csv_records
+
+class TemplateRegistry:
+    """
+    Every template in the Templates directory, read once as raw CSV records
+    (see task_writer.read_csv_records) and kept in memory, which is what
+    TaskManager.create_task and bulk_generate build new tasks from. A
+    FileWatcher keeps the set of templates current; get() also re-checks
+    (mtime, size) so a template edited in place is re-read on next use.
+    """
+    def __init__(self, templates_dir=DEFAULT_TEMPLATES_DIR):
+        self.templates_dir = templates_dir
+        self._lock = threading.Lock()
+        self._templates = {}  # name -> (mtime_ns, size, (header, records))
+        self._watcher = None
+
+    def sync(self):
+        # Read new/changed templates and forget removed ones; returns the names that changed
+        on_disk = {}
+        with os.scandir(self.templates_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.lower().endswith('.csv'):
+                    on_disk[entry.name] = entry.stat()
+        with self._lock:
+            removed = [name for name in self._templates if name not in on_disk]
+            for name in removed:
+                del self._templates[name]
+        return [name for name, st in on_disk.items() if self.refresh(name, st)] + removed
+
+    def refresh(self, name, st=None):
+        # Re-read one template if it changed since it was loaded; returns True if it did
+        path = os.path.join(self.templates_dir, name)
+        try:
+            st = st or os.stat(path)
+            with self._lock:
+                known = self._templates.get(name)
+            if known is not None and known[:2] == (st.st_mtime_ns, st.st_size):
+                return False
+            parsed = read_csv_records(path)
+        except (OSError, ValueError):
+            with self._lock:
+                return self._templates.pop(name, None) is not None
+        with self._lock:
+            self._templates[name] = (st.st_mtime_ns, st.st_size, parsed)
+        return True
+
+    def on_file_event(self, event_type, *paths):
+        # FileWatcher callback (watcher thread)
+        names = [os.path.basename(p) for p in paths if p.lower().endswith('.csv')]
+        if event_type == 'moved' and len(paths) == 2:
+            src, dest = (os.path.basename(p) for p in paths)
+            with self._lock:
+                self._templates.pop(src, None)
+            if dest in names:
+                self.refresh(dest)
+            return
+        for name in names:
+            self.refresh(name)  # A deleted file fails the stat and is dropped
+
+    def names(self):
+        with self._lock:
+            return sorted(self._templates, key=str.lower)
+
+    def get(self, name):
+        # (header, records) of a template, shared: pass it on (create_task, stage_records), never change it
+        self.refresh(name)
+        with self._lock:
+            known = self._templates.get(name)
+        if known is None:
+            raise FileNotFoundError(f'Template "{name}" not found in {self.templates_dir}')
+        return known[2]
+
+    def start_watching(self):
+        from file_watcher import FileWatcher  # watchdog is only needed once watching starts
+        self._watcher = FileWatcher(self.templates_dir, self.on_file_event)
+        self._watcher.start()
+
+    def stop(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+if __name__ == "__main__":
+    # Minimal test: read every template and print its size
+    registry = TemplateRegistry()
+    registry.sync()
+    for name in registry.names():
+        print(name, len(registry.get(name)[1]), 'rows')
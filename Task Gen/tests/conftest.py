@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules live flat in Task Gen/ and import each other by name, as run.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,40 @@
+import pytest
+
+from collision_index import CollisionIndex
+
+HEADER = 'site,product,account,proxy_unique\n'
+
+@pytest.fixture
+def tasks(tmp_path):
+    (tmp_path / 'a.csv').write_text(HEADER + 'TM,https://e/1,a@b.com:pw,1.1.1.1\n'
+                                             'TM,https://e/2,c@d.com:pw,\n')
+    (tmp_path / 'b.csv').write_text(HEADER + 'TM,https://e/1,a@b.com:pw,2.2.2.2\n'
+                                             'TM,https://e/1,x@y.com:pw,1.1.1.1\n')
+    # Same account, other event: not a collision
+    (tmp_path / 'c.csv').write_text(HEADER + 'TM,https://e/3,a@b.com:pw,\n')
+    return tmp_path
+
+def test_shared_accounts_and_proxies_on_the_same_event(tasks):
+    index = CollisionIndex(str(tasks))
+    index.sync()
+    assert index.collisions('a.csv') == [
+        {'field': 'account', 'product': 'https://e/1', 'value': 'a@b.com:pw', 'tasks': ['b.csv']},
+        {'field': 'proxy_unique', 'product': 'https://e/1', 'value': '1.1.1.1', 'tasks': ['b.csv']},
+    ]
+    assert index.collisions('c.csv') == []
+    assert [c['tasks'] for c in index.all_collisions()] == [['a.csv', 'b.csv'], ['a.csv', 'b.csv']]
+
+def test_file_events_update_the_collisions(tasks):
+    index = CollisionIndex(str(tasks))
+    index.sync()
+    (tasks / 'b.csv').write_text(HEADER + 'TM,https://e/1,x@y.com:pw,3.3.3.3\n')
+    assert index.on_file_event('modified', str(tasks / 'b.csv')) == ['b.csv']
+    assert index.collisions('a.csv') == []
+    (tasks / 'b.csv').rename(tasks / 'd.csv')
+    (tasks / 'c.csv').write_text(HEADER + 'TM,https://e/2,c@d.com:pw,\nTM,https://e/3,z@z.com:pw,\n')
+    index.on_file_event('moved', str(tasks / 'b.csv'), str(tasks / 'd.csv'))
+    index.on_file_event('modified', str(tasks / 'c.csv'))
+    assert [c['tasks'] for c in index.collisions('a.csv')] == [['c.csv']]
+    (tasks / 'c.csv').unlink()
+    assert index.on_file_event('deleted', str(tasks / 'c.csv')) == ['c.csv']
+    assert index.all_collisions() == []
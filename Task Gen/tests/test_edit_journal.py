@@ -0,0 +1,90 @@
+import pandas as pd
+import pytest
+
+from edit_journal import EditJournal
+
+def task():
+    return pd.DataFrame({'product': ['a', 'a', 'b'], 'presale': ['X', 'X', ''], 'price_range': ['1', '2', '3']})
+
+def values(df):
+    return {col: df[col].tolist() for col in df.columns}
+
+def test_undo_and_redo_step_through_the_edits():
+    df = task()
+    journal = EditJournal()
+    steps = [values(df)]
+    assert journal.apply(df, [([0, 1], {'presale': 'Y'})]) == ['presale']
+    steps.append(values(df))
+    assert journal.apply(df, [([1, 2], {'presale': 'Z', 'price_range': '9'}), ([0], {'price_range': '0'})]) \
+        == ['presale', 'price_range']
+    steps.append(values(df))
+    assert values(df) == {'product': ['a', 'a', 'b'], 'presale': ['Y', 'Z', 'Z'], 'price_range': ['0', '9', '9']}
+    assert journal.undo(df) == ['presale', 'price_range']
+    assert values(df) == steps[1]
+    assert journal.undo(df) == ['presale']
+    assert values(df) == steps[0]
+    assert journal.undo(df) == [] and not journal.can_undo()
+    assert journal.redo(df) == ['presale']
+    assert journal.redo(df) == ['presale', 'price_range']
+    assert values(df) == steps[2]
+    assert journal.redo(df) == [] and not journal.can_redo()
+
+def test_unchanged_rows_are_not_a_step():
+    df = task()
+    journal = EditJournal()
+    assert journal.apply(df, [([0, 1], {'presale': 'X'})]) == []
+    assert journal.apply(df, [([2], {'presale': None})]) == []  # None and '' are the same empty cell
+    assert not journal.can_undo() and journal.is_saved()
+
+def test_new_edit_drops_the_redo_steps():
+    df = task()
+    journal = EditJournal()
+    journal.apply(df, [([0], {'presale': 'Y'})])
+    journal.undo(df)
+    journal.apply(df, [([1], {'presale': 'Z'})])
+    assert not journal.can_redo()
+    assert df['presale'].tolist() == ['X', 'Z', '']
+
+def test_revert_goes_back_to_the_saved_state():
+    df = task()
+    journal = EditJournal()
+    journal.apply(df, [([0, 1], {'presale': 'Y'})])
+    journal.mark_saved()
+    saved = values(df)
+    journal.apply(df, [([2], {'presale': 'Z'})])
+    journal.apply(df, [([0, 1, 2], {'price_range': '5'})])
+    assert not journal.is_saved()
+    assert journal.revert(df) == ['presale', 'price_range']
+    assert values(df) == saved and journal.is_saved()
+    # Saved state ahead of the frame: revert redoes up to it
+    journal.undo(df)
+    assert not journal.is_saved()
+    assert journal.revert(df) == ['presale']
+    assert values(df) == saved and journal.is_saved()
+
+def test_revert_needs_a_reload_once_the_saved_state_is_gone():
+    df = task()
+    journal = EditJournal()
+    journal.apply(df, [([0], {'presale': 'Y'})])
+    journal.mark_saved()
+    journal.undo(df)
+    journal.apply(df, [([1], {'presale': 'Z'})])  # The saved step was on the discarded redo branch
+    assert journal.revert(df) is None
+    journal = EditJournal(max_depth=2)
+    for value in 'ABC':
+        journal.apply(df, [([2], {'presale': value})])
+    assert journal.revert(df) is None
+
+def test_only_dynamic_fields_can_be_edited():
+    journal = EditJournal()
+    with pytest.raises(ValueError):
+        journal.apply(task(), [([0], {'account': 'x@y.com:pw'})])
+
+def test_a_failed_save_leaves_the_edits_unsaved():
+    df = task()
+    journal = EditJournal()
+    journal.apply(df, [([0], {'presale': 'Y'})])
+    journal.mark_saved()
+    journal.mark_unsaved()
+    assert not journal.is_saved()
+    assert journal.revert(df) is None  # The caller reloads the file
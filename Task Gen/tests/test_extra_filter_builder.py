@@ -0,0 +1,52 @@
+import pandas as pd
+
+from extra_filter_builder import (build_extra_filter, edit_extra_filter, expand_sections, is_valid_extra_filter,
+                                  parse_extra_filter, parse_extra_filter_column, validate_extra_filter_column)
+
+SAMPLES = [
+    '100:100',
+    '100:100, 105-108:250, FloorA:150',
+    'FLR2,FLR3,FLR4:326, 100:100',
+    'Floor A:99.5',
+]
+
+def test_parse_then_build_round_trips():
+    for value in SAMPLES:
+        assert build_extra_filter(parse_extra_filter(value)) == value
+
+def test_build_then_parse_round_trips():
+    entries = [('100', '100'), ('FLR2,FLR3', '50'), ('105-108', '250')]
+    assert parse_extra_filter(build_extra_filter(entries)) == entries
+
+def test_grouped_sections_keep_one_price():
+    assert parse_extra_filter('100:100, FLR2,FLR3,FLR4:326') == [('100', '100'), ('FLR2,FLR3,FLR4', '326')]
+
+def test_build_skips_incomplete_rows():
+    assert build_extra_filter([('100', '100'), ('', '50'), ('FLR2', '')]) == '100:100'
+
+def test_empty_values():
+    assert parse_extra_filter('') == []
+    assert parse_extra_filter(None) == []
+    assert build_extra_filter([]) == ''
+
+def test_validity():
+    for value in SAMPLES + ['', None, float('nan')]:
+        assert is_valid_extra_filter(value)
+    for value in ['FLR1', 'FLR1:abc', ':100', '100:100,']:
+        assert not is_valid_extra_filter(value)
+
+def test_column_helpers_match_the_scalar_ones():
+    values = pd.Series(SAMPLES + ['bad', '', None], dtype=object)
+    assert validate_extra_filter_column(values).tolist() == [is_valid_extra_filter(v) for v in values]
+    assert parse_extra_filter_column(values).tolist() == [parse_extra_filter(v) for v in values]
+
+def test_expand_sections():
+    assert expand_sections('FLR2,FLR3') == ('FLR2', 'FLR3')
+    assert expand_sections('105-108') == ('105', '106', '107', '108')
+    assert expand_sections('FLR1-FLR3') == ('FLR1', 'FLR2', 'FLR3')
+
+def test_edit_adds_replaces_and_removes():
+    assert edit_extra_filter('FLR2,FLR3:50, 100:100', add=[('100', '120')], remove=['flr3']) == 'FLR2:50, 100:120'
+    assert edit_extra_filter('100:100', add=[('FLR9', '99')]) == '100:100, FLR9:99'
+    value = '100:100, FLR2:50'
+    assert edit_extra_filter(value, remove=['FLR7']) is value
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from merge_engine import merge_task_files
+
+HEADER = b'site,product,account\r\n'
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+def test_merged_lines_end_like_the_inputs(tmp_path):
+    a = write(tmp_path, 'a.csv', HEADER + b'TM,https://example.com/e/1,a@b.com:pw\r\n')
+    b = write(tmp_path, 'b.csv', HEADER + b'TM,https://example.com/e/2,"c@d.com:p,w"\r\n')
+    result = merge_task_files([a, b], str(tmp_path / 'all.csv'))
+    assert result['total_rows'] == 2
+    assert (tmp_path / 'all.csv').read_bytes() == (HEADER + b'TM,https://example.com/e/1,a@b.com:pw\r\n'
+                                                   b'TM,https://example.com/e/2,"c@d.com:p,w"\r\n')
+
+def test_mismatched_headers_are_unioned(tmp_path):
+    a = write(tmp_path, 'a.csv', HEADER + b'TM,https://example.com/e/1,a@b.com:pw\r\n')
+    b = write(tmp_path, 'b.csv', b'account,presale\r\nc@d.com:pw,CODE\r\n')
+    result = merge_task_files([a, b], str(tmp_path / 'all.csv'))
+    assert result['columns'] == ['site', 'product', 'account', 'presale']
+    assert result['rows'] == {a: 1, b: 1}
+    assert (tmp_path / 'all.csv').read_bytes() == (b'site,product,account,presale\r\n'
+                                                   b'TM,https://example.com/e/1,a@b.com:pw,\r\n'
+                                                   b',,c@d.com:pw,CODE\r\n')
+
+def test_a_bom_is_not_part_of_the_first_column(tmp_path):
+    a = write(tmp_path, 'a.csv', HEADER + b'TM,https://example.com/e/1,a@b.com:pw\r\n')
+    b = write(tmp_path, 'b.csv', b'\xef\xbb\xbf' + HEADER + b'TM,https://example.com/e/2,c@d.com:pw\r\n')
+    result = merge_task_files([b, a], str(tmp_path / 'all.csv'))
+    assert result['columns'] == ['site', 'product', 'account']
+    assert (tmp_path / 'all.csv').read_bytes().startswith(HEADER + b'TM,https://example.com/e/2,')
+
+def test_output_is_synced_before_it_is_renamed_into_place(tmp_path, monkeypatch):
+    a = write(tmp_path, 'a.csv', HEADER + b'TM,https://example.com/e/1,a@b.com:pw\r\n')
+    events = []
+    fsync, replace = os.fsync, os.replace
+    monkeypatch.setattr(os, 'fsync', lambda fd: events.append('fsync') or fsync(fd))
+    monkeypatch.setattr(os, 'replace', lambda src, dst: events.append('replace') or replace(src, dst))
+    merge_task_files([a], str(tmp_path / 'all.csv'))
+    assert events == ['fsync', 'replace']
+
+def test_a_failed_input_leaves_nothing_behind(tmp_path):
+    a = write(tmp_path, 'a.csv', HEADER + b'TM,https://example.com/e/1,a@b.com:pw\r\n')
+    b = write(tmp_path, 'b.csv', HEADER + b'TM,\xff\xfe,a@b.com:pw\r\n')  # Not UTF-8
+    with pytest.raises(UnicodeDecodeError):
+        merge_task_files([a, b], str(tmp_path / 'all.csv'))
+    assert sorted(os.listdir(tmp_path)) == ['a.csv', 'b.csv']
@@ -0,0 +1,43 @@
+import pytest
+
+from search_index import SearchIndex, parse_query
+
+HEADER = 'site,product,presale,price_range,extra_filter\n'
+
+@pytest.fixture
+def tasks(tmp_path):
+    (tmp_path / 'venue').mkdir()
+    (tmp_path / 'drake.csv').write_text(
+        HEADER + 'TM,https://www.ticketmaster.com/event/0B00608A,ILOVEDRAKE,100-200,"100:100, FLR1-FLR3"\n')
+    (tmp_path / 'venue' / 'nyc.csv').write_text(HEADER + 'TM,https://www.ticketmaster.com/event/1C00AA,,,101\n')
+    return tmp_path
+
+@pytest.fixture
+def index(tasks):
+    index = SearchIndex(str(tasks))
+    index.sync()
+    return index
+
+def test_parse_query_resolves_field_aliases():
+    assert parse_query('Filter:FLR2 event: drake') == [('section', 'flr2'), ('product', ''), (None, 'drake')]
+    assert parse_query('nope:x') == [(None, 'nope:x')]
+
+def test_search_by_field_and_free_text(index):
+    assert index.search('') is None
+    assert index.search('presale:') == {'drake.csv'}
+    assert index.search('presale:ilove') == {'drake.csv'}
+    assert index.search('section:flr2') == {'drake.csv'}  # Ranges are expanded
+    assert index.search('section:10') == {'drake.csv', 'venue/nyc.csv'}
+    assert index.search('event/0b00608a') == {'drake.csv'}  # Pasted part of a URL
+    assert index.search('nyc') == {'venue/nyc.csv'}
+    assert index.search('section:101 presale:') == set()
+
+def test_file_events_update_the_index(index, tasks):
+    path = tasks / 'venue' / 'nyc.csv'
+    path.write_text(HEADER + 'TM,https://www.ticketmaster.com/event/1C00AA,FANCLUB,,101\n')
+    assert index.on_file_event('modified', str(path)) == ['venue/nyc.csv']
+    assert index.search('presale:') == {'drake.csv', 'venue/nyc.csv'}
+    path.rename(tasks / 'boston.csv')
+    index.on_file_event('moved', str(path), str(tasks / 'boston.csv'))
+    assert index.search('fanclub') == {'boston.csv'}
+    assert index.search('nyc') == set()
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from split_engine import PREFIX_COLUMN, parse_overrides, shard_names, shard_positions
+from task_writer import csv_column, read_csv_records
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '400Template.csv')
+
+def shards(n, *args, **kwargs):
+    return [(label, positions.tolist()) for label, positions in shard_positions(n, *args, **kwargs)]
+
+def test_rows_mode_keeps_contiguous_ranges():
+    assert shards(7, 'rows', 3) == [('1', [0, 1, 2]), ('2', [3, 4]), ('3', [5, 6])]
+
+def test_round_robin_mode_deals_the_rows_out():
+    assert shards(7, 'round-robin', 3) == [('1', [0, 3, 6]), ('2', [1, 4]), ('3', [2, 5])]
+
+def test_prefix_mode_groups_by_profile_name():
+    names = ['Belgiumite01', 'Test-1', 'Belgiumite02', '007', 'Test_2']
+    assert shards(5, 'prefix', profile_names=names) == [('(none)', [3]), ('Belgiumite', [0, 2]), ('Test', [1, 4])]
+    assert shards(5, 'prefix', prefix_len=2, profile_names=names) == [('00', [3]), ('Be', [0, 2]), ('Te', [1, 4])]
+
+def test_every_row_lands_in_one_shard():
+    for mode in ('rows', 'round-robin'):
+        for n, k in [(2, 2), (10, 3), (401, 4)]:
+            positions = sorted(p for _, rows in shards(n, mode, k) for p in rows)
+            assert positions == list(range(n))
+
+def test_bundled_template():
+    header, records = read_csv_records(TEMPLATE)
+    names = csv_column(header, records, PREFIX_COLUMN)
+    prefix = shard_positions(len(records), 'prefix', profile_names=names)
+    assert [(label, len(rows)) for label, rows in prefix] == [('Belgiumite', 175), ('Test', 226)]
+    assert [len(rows) for _, rows in shard_positions(len(records), 'rows', 3)] == [134, 134, 133]
+
+def test_bad_requests():
+    with pytest.raises(ValueError):
+        shard_positions(10, 'columns')
+    with pytest.raises(ValueError):
+        shard_positions(10, 'rows', 1)
+    with pytest.raises(ValueError):
+        shard_positions(2, 'round-robin', 3)
+    with pytest.raises(ValueError):
+        shard_positions(10, 'prefix')
+
+def test_shard_names_and_overrides():
+    assert shard_names('venue/drake.csv', ['1', 'Team A']) == ['venue/drake-1.csv', 'venue/drake-Team_A.csv']
+    assert parse_overrides('1 presale=A\n\nTest presale=B; extra_filter=FLR1:100, FLR2:150') == {
+        '1': {'presale': 'A'}, 'Test': {'presale': 'B', 'extra_filter': 'FLR1:100, FLR2:150'}}
+    with pytest.raises(ValueError):
+        parse_overrides('1 presale')
+
+def test_labels_that_share_a_file_name_are_refused():
+    labels = [label for label, _ in shard_positions(2, 'prefix', prefix_len=3, profile_names=['Te st01', 'Te_st02'])]
+    assert labels == ['Te ', 'Te_']
+    with pytest.raises(ValueError, match='d-Te_.csv'):
+        shard_names('d.csv', labels)
+    with pytest.raises(ValueError):
+        shard_names('d.csv', ['Test', 'test'])  # One file on Windows
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from task_catalog import TaskCatalog
+
+HEADER = 'site,product,presale,price_range,extra_filter,account\n'
+
+@pytest.fixture
+def tasks(tmp_path):
+    tasks = tmp_path / 'tasks'
+    (tasks / 'venue').mkdir(parents=True)
+    (tasks / 'drake.csv').write_text(HEADER + 'TM,https://e/1,CODE,100-200,FLR2,a@b.com:pw\n'
+                                              'TM,https://e/1,CODE,100-200,FLR2,c@d.com:pw\n'
+                                              'TM,https://e/2,,,,a@b.com:pw\n')
+    (tasks / 'venue' / 'nyc.csv').write_text(HEADER + 'TM,https://e/2,,,,e@f.com:pw\n')
+    return tasks
+
+@pytest.fixture
+def catalog(tmp_path, tasks):
+    catalog = TaskCatalog(str(tmp_path / 'catalog.db'), str(tasks))
+    yield catalog
+    catalog.close()
+
+def test_sync_records_the_metadata_of_every_task(catalog):
+    assert sorted(catalog.sync()) == ['drake.csv', 'venue/nyc.csv']
+    info = catalog.get('drake.csv')
+    assert (info['row_count'], info['product_count'], info['account_count']) == (3, 2, 2)
+    assert info['products'] == ['https://e/1', 'https://e/2']
+    assert info['presale'] == ['CODE'] and info['extra_filter'] == ['FLR2']
+    assert catalog.find_by_product('https://e/2') == ['drake.csv', 'venue/nyc.csv']
+    assert catalog.with_presale() == ['drake.csv']
+    assert catalog.sync() == []  # Nothing changed on disk
+
+def test_file_events_update_single_rows(catalog, tasks):
+    catalog.sync()
+    path = tasks / 'venue' / 'nyc.csv'
+    with open(path, 'a') as f:
+        f.write('TM,https://e/3,,,,g@h.com:pw\n')
+    assert catalog.on_file_event('modified', str(path)) == ['venue/nyc.csv']
+    assert catalog.get('venue/nyc.csv')['row_count'] == 2
+    assert catalog.find_by_product('https://e/3') == ['venue/nyc.csv']
+    os.remove(tasks / 'drake.csv')
+    assert catalog.on_file_event('deleted', str(tasks / 'drake.csv')) == ['drake.csv']
+    assert list(catalog.all()) == ['venue/nyc.csv']
+    assert catalog.find_by_product('https://e/1') == []
+
+def test_catalog_persists_between_runs(tmp_path, tasks, catalog):
+    catalog.sync()
+    catalog.close()
+    reopened = TaskCatalog(str(tmp_path / 'catalog.db'), str(tasks))
+    try:
+        assert sorted(reopened.all()) == ['drake.csv', 'venue/nyc.csv']
+        assert reopened.sync() == []  # Stamps match, so no file is read again
+    finally:
+        reopened.close()
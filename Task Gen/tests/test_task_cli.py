@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+import task_storage
+from task_cli import EXIT_FAILED, EXIT_OK, EXIT_USAGE, main
+
+TASK = b'product,presale,account\r\nhttps://example.com/e/1,,a@b.com:pw\r\nhttps://example.com/e/1,,c@d.com:pw\r\n'
+
+@pytest.fixture
+def tasks(tmp_path, monkeypatch):
+    monkeypatch.setenv(task_storage.STORAGE_ENV, 'csv')  # No working copies next to the sources
+    (tmp_path / 'a.csv').write_bytes(TASK)
+    return tmp_path
+
+def run(capsys, tasks, *argv):
+    code = main(['--tasks-dir', str(tasks), *argv])
+    return code, json.loads(capsys.readouterr().out)
+
+def test_set_reports_the_rows_it_changed(capsys, tasks):
+    code, output = run(capsys, tasks, 'set', 'a.csv', '--presale', 'Z')
+    assert code == EXIT_OK and output['ok'] and output['rows_changed'] == 2
+    assert (tasks / 'a.csv').read_bytes() == TASK.replace(b'1,,', b'1,Z,')
+
+def test_a_failed_write_fails_the_command(capsys, tasks, monkeypatch):
+    def fail(*args):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(task_storage, 'patch_csv_columns', fail)
+    monkeypatch.setattr(task_storage, 'atomic_write_csv', fail)
+    code, output = run(capsys, tasks, 'set', 'a.csv', '--presale', 'Z')
+    assert code == EXIT_FAILED
+    assert not output['ok'] and 'disk full' in output['error']
+    assert (tasks / 'a.csv').read_bytes() == TASK
+
+def test_bad_arguments_exit_with_the_usage_code(capsys, tasks):
+    assert run(capsys, tasks, 'set', 'a.csv')[0] == EXIT_USAGE
+    assert run(capsys, tasks, 'split', 'a.csv', '--shards', '1')[0] == EXIT_USAGE
+    code, output = run(capsys, tasks, 'no-such-command')
+    assert code == EXIT_USAGE and output['command'] is None
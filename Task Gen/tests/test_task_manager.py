@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+from task_manager import TaskManager
+from task_storage import CsvStorage
+from task_writer import read_csv_records
+
+# CRLF, zero-padded numbers, quoted cells and no newline after the last row: all of it must survive
+TEMPLATE = (b'site,product,quantity,presale,account,extra_filter,hidden\r\n'
+            b'TicketMaster,,007,,a@b.com:pw,"100:100, FLR2,FLR3:50",False\r\n'
+            b'TicketMaster,,1.50,,"c@d.com:p,w",,True\r\n'
+            b'TicketMaster,,2,,e@f.com:pw,,')
+
+@pytest.fixture
+def manager(tmp_path):
+    tasks = tmp_path / 'tasks'
+    tasks.mkdir()
+    manager = TaskManager(str(tasks), storage=CsvStorage())
+    yield manager
+    manager.close()
+
+@pytest.fixture
+def template(tmp_path):
+    path = tmp_path / 'Template.csv'
+    path.write_bytes(TEMPLATE)
+    return str(path)
+
+def test_create_without_fields_copies_the_template(manager, template):
+    assert manager.create_task('drake.csv', template) == 3
+    assert open(manager.path_for('drake.csv'), 'rb').read() == TEMPLATE
+
+def test_create_only_rewrites_the_dynamic_columns(manager, template):
+    fields = {'product': 'https://example.com/event/1', 'presale': 'CODE, 2'}
+    assert manager.create_task('drake.csv', template, fields) == 3
+    assert open(manager.path_for('drake.csv'), 'rb').read() == (
+        b'site,product,quantity,presale,account,extra_filter,hidden\r\n'
+        b'TicketMaster,https://example.com/event/1,007,"CODE, 2",a@b.com:pw,"100:100, FLR2,FLR3:50",False\r\n'
+        b'TicketMaster,https://example.com/event/1,1.50,"CODE, 2","c@d.com:p,w",,True\r\n'
+        b'TicketMaster,https://example.com/event/1,2,"CODE, 2",e@f.com:pw,,')
+
+def test_create_from_records_kept_in_memory(manager, template):
+    manager.create_task('drake.csv', read_csv_records(template))
+    assert open(manager.path_for('drake.csv'), 'rb').read() == TEMPLATE
+    manager.create_task('nyc.csv', read_csv_records(template), {'presale': 'CODE'})
+    assert open(manager.path_for('nyc.csv'), 'rb').read() == TEMPLATE.replace(b',,a@', b',CODE,a@').replace(
+        b'1.50,,', b'1.50,CODE,').replace(b'2,,e@', b'2,CODE,e@')
+
+def test_create_refuses_other_columns_and_existing_tasks(manager, template):
+    with pytest.raises(ValueError):
+        manager.create_task('drake.csv', template, {'account': 'x@y.com:pw'})
+    manager.create_task('drake.csv', template)
+    with pytest.raises(FileExistsError):
+        manager.create_task('drake.csv', template)
+
+def test_split_copies_the_rows_byte_for_byte(manager, template):
+    manager.create_task('venue/drake.csv', template)
+    shards = manager.split_task('venue/drake.csv', 'round-robin', 2, overrides={'2': {'presale': 'B'}})
+    assert shards == [{'task': 'venue/drake-1.csv', 'label': '1', 'rows': 2},
+                      {'task': 'venue/drake-2.csv', 'label': '2', 'rows': 1}]
+    header, first, second, third = TEMPLATE.split(b'\r\n')
+    # Every row keeps its own line ending, so only the shard holding the last row ends without one
+    assert open(manager.path_for('venue/drake-1.csv'), 'rb').read() == b'\r\n'.join([header, first, third])
+    assert open(manager.path_for('venue/drake-2.csv'), 'rb').read() == \
+        b'\r\n'.join([header, second.replace(b'1.50,,', b'1.50,B,')]) + b'\r\n'
+    assert open(manager.path_for('venue/drake.csv'), 'rb').read() == TEMPLATE
+
+def test_split_refuses_shards_that_would_overwrite_each_other(manager, tmp_path):
+    template = tmp_path / 'Profiles.csv'
+    template.write_bytes(b'profile_name,presale\r\nTe st01,\r\nTe_st02,\r\nTe_st03,\r\n')
+    manager.create_task('d.csv', str(template))
+    with pytest.raises(ValueError):
+        manager.split_task('d.csv', 'prefix', prefix_len=3)
+    assert manager.list_tasks() == ['d.csv']
+
+@pytest.fixture
+def reads(manager, monkeypatch):
+    # Count the reads that actually reach the storage
+    calls = []
+    read = manager.storage.read
+    monkeypatch.setattr(manager.storage, 'read', lambda path, columns=None: calls.append(path) or read(path, columns))
+    return calls
+
+def test_load_is_served_from_cache_until_the_file_changes(manager, template, reads):
+    manager.create_task('drake.csv', template)
+    first = manager.load_task('drake.csv')
+    first.loc[0, 'presale'] = 'EDITED'  # Callers get a copy, never the cached frame
+    second = manager.load_task('drake.csv')
+    assert len(reads) == 1
+    assert second.loc[0, 'presale'] != 'EDITED'
+    path = manager.path_for('drake.csv')
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    manager.load_task('drake.csv')
+    assert len(reads) == 2
+
+def test_watcher_event_drops_an_entry_for_an_outside_edit(manager, template, reads):
+    manager.create_task('drake.csv', template)
+    manager.load_task('drake.csv')
+    path = manager.path_for('drake.csv')
+    with open(path, 'ab') as f:
+        f.write(b'\r\nTicketMaster,,3,,g@h.com:pw,,')
+    manager.on_file_event('modified', path)
+    assert len(manager.load_task('drake.csv')) == 4
+    assert len(reads) == 2
+    manager.on_file_event('modified', path)  # Nothing changed since: the entry stays
+    manager.load_task('drake.csv')
+    assert len(reads) == 2
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from task_roots import TaskRoots
+
+@pytest.fixture
+def trees(tmp_path):
+    # TASKS with a subfolder named like the extra root, and two extra roots both called 'archive'
+    for rel in ('TASKS/top.csv', 'TASKS/archive/mine.csv', 'TASKS/.archive/hidden.csv',
+                'old/archive/theirs.csv', 'older/archive/oldest.csv'):
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('site\r\nA\r\n')
+    return tmp_path
+
+def test_every_root_is_reachable_by_name(trees):
+    roots = TaskRoots([str(trees / 'TASKS'), str(trees / 'old/archive'), str(trees / 'older/archive')])
+    names = sorted(roots.scan())
+    assert names == ['.archive-2/oldest.csv', '.archive/theirs.csv', 'archive/mine.csv', 'top.csv']
+    for name in names:
+        assert roots.name_for(roots.path_for(name)) == name
+        assert os.path.exists(roots.path_for(name))
+    assert roots.path_for('archive/mine.csv') == str(trees / 'TASKS/archive/mine.csv')
+    assert roots.path_for('.archive/theirs.csv') == str(trees / 'old/archive/theirs.csv')
+
+def test_paths_that_are_not_tasks(trees):
+    roots = TaskRoots([str(trees / 'TASKS'), str(trees / 'old/archive')])
+    assert roots.name_for(str(trees / 'TASKS/.archive/hidden.csv')) is None
+    assert roots.name_for(str(trees / 'elsewhere.csv')) is None
+
+def test_scan_sees_files_rewritten_in_place(trees):
+    roots = TaskRoots([str(trees / 'TASKS')])
+    path = trees / 'TASKS' / 'top.csv'
+    before = roots.scan()['top.csv']
+    folder = os.stat(path.parent)
+    path.write_text('site\r\nA\r\nB\r\n')
+    os.utime(path.parent, ns=(folder.st_atime_ns, folder.st_mtime_ns))  # Listing stays cached
+    after = roots.scan()['top.csv']
+    assert (after.st_size, after.st_mtime_ns) != (before.st_size, before.st_mtime_ns)
+    assert after.st_size == os.stat(path).st_size
+
+def test_scan_relists_folders_that_changed(trees):
+    roots = TaskRoots([str(trees / 'TASKS')])
+    roots.scan()
+    (trees / 'TASKS/new.csv').write_text('site\r\n')
+    os.remove(trees / 'TASKS/archive/mine.csv')
+    assert sorted(roots.scan()) == ['new.csv', 'top.csv']
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+import task_storage
+from task_storage import CsvStorage, FeatherStorage, default_storage
+
+TASK = (b'site,product,quantity,presale,hidden\r\n'
+        b'TicketMaster,https://example.com/e/1,2,,False\r\n'
+        b'TicketMaster,https://example.com/e/1,4,CODE,True\r\n')
+
+@pytest.fixture
+def task(tmp_path):
+    path = tmp_path / 'TASKS' / 'drake.csv'
+    path.parent.mkdir()
+    path.write_bytes(TASK)
+    return str(path)
+
+def test_full_write_keeps_the_files_line_endings(task):
+    storage = CsvStorage()
+    storage.write(task, storage.read(task))
+    assert open(task, 'rb').read() == TASK
+    with open(task, 'wb') as f:
+        f.write(TASK.replace(b'\r\n', b'\n'))
+    storage.write(task, storage.read(task))
+    assert open(task, 'rb').read() == TASK.replace(b'\r\n', b'\n')
+
+def test_column_write_only_touches_those_columns(task):
+    storage = CsvStorage()
+    df = storage.read(task)
+    df['presale'] = 'NEW'
+    storage.write(task, df, ['presale'])
+    assert open(task, 'rb').read() == TASK.replace(b'2,,', b'2,NEW,').replace(b'CODE', b'NEW')
+
+def test_storage_choice(monkeypatch):
+    monkeypatch.setenv(task_storage.STORAGE_ENV, 'csv')
+    assert default_storage().name == 'csv'
+    monkeypatch.setenv(task_storage.STORAGE_ENV, 'parquet')
+    with pytest.raises(ValueError):
+        default_storage()
+
+class TestFeather:
+    @pytest.fixture(autouse=True)
+    def needs_pyarrow(self):
+        pytest.importorskip('pyarrow')
+
+    @pytest.fixture
+    def storage(self, tmp_path):
+        return FeatherStorage(working_dir=str(tmp_path / 'working_copy'))
+
+    def test_reads_come_from_the_working_copy(self, storage, task, monkeypatch):
+        df = storage.read(task)
+        assert os.path.exists(storage.copy_path(task))
+
+        def no_csv(*args, **kwargs):
+            raise AssertionError('parsed the CSV')
+
+        monkeypatch.setattr(CsvStorage, 'read', no_csv)
+        copy = storage.read(task, ['presale'])
+        assert list(copy.columns) == ['presale']
+        assert copy['presale'].fillna('').tolist() == df['presale'].fillna('').tolist() == ['', 'CODE']
+
+    def test_a_copy_older_than_its_csv_is_not_used(self, storage, task):
+        storage.read(task)
+        with open(task, 'wb') as f:
+            f.write(TASK.replace(b'CODE', b'EDITED'))
+        os.utime(task, ns=(1, 1))
+        assert storage.read(task)['presale'].tolist()[1] == 'EDITED'
+
+    def test_writes_keep_csv_and_copy_in_step(self, storage, task):
+        df = storage.read(task)
+        df['presale'] = 'NEW'
+        storage.write(task, df, ['presale'])
+        assert open(task, 'rb').read() == TASK.replace(b'2,,', b'2,NEW,').replace(b'CODE', b'NEW')
+        assert storage._read_copy(task, (os.stat(task).st_mtime_ns, os.stat(task).st_size), None) is not None
+
+    def test_copies_follow_deletes_and_renames(self, storage, task):
+        storage.read(task)
+        dest = task.replace('drake', 'nyc')
+        os.replace(task, dest)
+        storage.moved(task, dest)
+        assert not os.path.exists(storage.copy_path(task)) and os.path.exists(storage.copy_path(dest))
+        storage.forget(dest)
+        assert not os.path.exists(storage.copy_path(dest))
+        storage.forget(dest)  # Nothing left to remove is fine
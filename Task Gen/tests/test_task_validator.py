@@ -0,0 +1,74 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import task_index
+from task_validator import TaskValidator, validate_frame
+
+HEADER = 'product,quantity,account,proxy_unique,extra_filter\r\n'
+GOOD = 'https://example.com/e/1,2,a@b.com:pw,1.2.3.4:8080,"100:100, FLR2:50"\r\n'
+
+@pytest.fixture
+def tasks(tmp_path):
+    path = tmp_path / 'TASKS'
+    path.mkdir()
+    (path / 'good.csv').write_text(HEADER + GOOD, newline='')
+    (path / 'bad.csv').write_text(HEADER + GOOD + 'nope,0,a@b.com:pw,host,FLR1\r\n', newline='')
+    return path
+
+def test_every_rule():
+    df = pd.DataFrame({'product': ['https://x.com/e', 'x.com', 'https://x.com/e'],
+                       'quantity': ['1', '1.5', '2'],
+                       'account': ['a@b.com:pw', 'a@b.com', 'A@b.com:pw'],
+                       'proxy_unique': ['', 'host:99999', 'h:1:u:p'],
+                       'extra_filter': ['', '100:100', 'FLR1']}, dtype=object)
+    issues = {issue['rule']: issue['lines'] for issue in validate_frame(df)}
+    assert issues == {'product': [3], 'quantity': [3], 'account': [3], 'proxy_unique': [3],
+                      'extra_filter': [4], 'duplicate': [4]}
+    missing = validate_frame(pd.DataFrame({'product': []}, dtype=object))
+    assert missing[0]['rule'] == 'columns' and 'quantity, account' in missing[0]['message']
+
+def test_sync_only_checks_what_changed(tasks, tmp_path, monkeypatch):
+    report = tmp_path / 'report.json'
+    validator = TaskValidator(str(tasks), str(report))
+    assert sorted(validator.sync()) == ['bad.csv', 'good.csv']
+    assert validator.invalid_tasks() == {'bad.csv': 4}
+    assert json.loads(report.read_text())['invalid'] == 1
+    read = []
+    monkeypatch.setattr(task_index, 'read_task_rows', lambda path, st=None: read.append(path) or ([], []))
+    assert TaskValidator(str(tasks), str(report)).sync() == []  # Seeded from the report
+    assert read == []
+
+def test_watcher_updates_share_one_delayed_report_write(tasks, tmp_path, monkeypatch):
+    report = tmp_path / 'report.json'
+    validator = TaskValidator(str(tasks), str(report), report_delay=60)
+    validator.sync()
+    writes = []
+    save_report = validator.save_report
+    monkeypatch.setattr(validator, 'save_report', lambda: writes.append(1) or save_report())
+    (tasks / 'bad.csv').write_text(HEADER + GOOD, newline='')
+    os.remove(tasks / 'good.csv')
+    assert validator.on_file_event('modified', str(tasks / 'bad.csv')) == ['bad.csv']
+    assert validator.on_file_event('deleted', str(tasks / 'good.csv')) == ['good.csv']
+    assert writes == [] and json.loads(report.read_text())['invalid'] == 1
+    validator.flush_report()
+    assert writes == [1] and json.loads(report.read_text())['checked'] == 1
+    validator.flush_report()  # Nothing pending
+    assert writes == [1]
+
+def test_the_delayed_write_happens_on_its_own(tasks, tmp_path):
+    report = tmp_path / 'report.json'
+    validator = TaskValidator(str(tasks), str(report), report_delay=0.05)
+    validator.sync()
+    os.remove(tasks / 'bad.csv')
+    validator.on_file_event('deleted', str(tasks / 'bad.csv'))
+    validator._report_timer.join(5)
+    assert json.loads(report.read_text())['invalid'] == 0
+
+def test_unreadable_files_are_reported(tasks):
+    (tasks / 'wide.csv').write_text(HEADER + GOOD.replace('\r\n', ',extra\r\n'), newline='')
+    validator = TaskValidator(str(tasks))
+    validator.sync()
+    assert [issue['rule'] for issue in validator.issues('wide.csv')] == ['unreadable']
@@ -0,0 +1,135 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+from task_writer import BackgroundWriter, CsvPatchError, SaveError, make_temp_file, patch_csv_columns, publish_staged
+
+TASK = (b'site,product,quantity,presale,account,extra_filter\r\n'
+        b'TicketMaster,https://example.com/e/1,007,,a@b.com:pw,"100:100, FLR2:50"\r\n'
+        b'\r\n'
+        b'TicketMaster,https://example.com/e/1,1.50,OLD,"c@d.com:p,w",\r\n'
+        b'TicketMaster,https://example.com/e/1,2,,e@f.com:pw,')
+
+def read(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+@pytest.fixture
+def task(tmp_path):
+    path = tmp_path / 'drake.csv'
+    path.write_bytes(TASK)
+    return str(path)
+
+def test_patch_then_revert_gives_back_the_original_bytes(task):
+    df = read(task)
+    original = df['presale'].copy()
+    df['presale'] = ['NEW, 1', 'NEW', None]
+    patch_csv_columns(task, df, ['presale'])
+    patched = open(task, 'rb').read()
+    assert patched == TASK.replace(b'007,,', b'007,"NEW, 1",').replace(b'1.50,OLD,', b'1.50,NEW,')
+    assert read(task)['presale'].tolist() == ['NEW, 1', 'NEW', '']
+    df['presale'] = original
+    patch_csv_columns(task, df, ['presale'])
+    assert open(task, 'rb').read() == TASK
+
+def test_patch_refuses_a_frame_that_does_not_line_up(task):
+    df = read(task)
+    with pytest.raises(CsvPatchError):
+        patch_csv_columns(task, df.iloc[:2], ['presale'])
+    with pytest.raises(CsvPatchError):
+        patch_csv_columns(task, df.drop(columns='site'), ['presale'])
+    assert open(task, 'rb').read() == TASK
+    assert os.listdir(os.path.dirname(task)) == ['drake.csv']
+
+def stage(path, data):
+    fd, tmp_path = make_temp_file(path)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    return tmp_path
+
+@pytest.fixture
+def shards(tmp_path):
+    # Two shards that replace existing files and, between them, one that is new
+    paths = [str(tmp_path / f'drake-{n}.csv') for n in (1, 2, 3)]
+    for path in paths[::2]:
+        open(path, 'wb').write(b'old ' + path.encode())
+    return [(stage(path, b'new ' + path.encode()), path) for path in paths]
+
+def test_publish_renames_every_shard(shards, tmp_path):
+    publish_staged(shards)
+    for _, path in shards:
+        assert open(path, 'rb').read() == b'new ' + path.encode()
+    assert sorted(os.listdir(tmp_path)) == ['drake-1.csv', 'drake-2.csv', 'drake-3.csv']
+
+@pytest.mark.parametrize('failing_call', [1, 2, 3])
+def test_publish_rolls_back_when_a_rename_fails(shards, tmp_path, monkeypatch, failing_call):
+    calls = []
+    replace = os.replace
+
+    def flaky_replace(src, dst):
+        calls.append(dst)
+        if len(calls) == failing_call:
+            raise OSError('disk full')
+        replace(src, dst)
+
+    monkeypatch.setattr(os, 'replace', flaky_replace)
+    with pytest.raises(OSError, match='disk full'):
+        publish_staged(shards)
+    for _, path in shards[::2]:
+        assert open(path, 'rb').read() == b'old ' + path.encode()
+    # The new shard is gone again and no temp or backup file is left behind
+    assert sorted(os.listdir(tmp_path)) == ['drake-1.csv', 'drake-3.csv']
+
+class FakeWrites:
+    # write callback for BackgroundWriter: records (path, df, columns), holds the first write
+    # until release() and fails for the paths in failing
+    def __init__(self, failing=()):
+        self.calls = []
+        self.failing = set(failing)
+        self.started = threading.Event()
+        self.gate = threading.Event()
+
+    def __call__(self, path, df, columns=None):
+        self.started.set()
+        self.gate.wait(5)
+        if path in self.failing:
+            raise OSError(f'cannot write {path}')
+        self.calls.append((path, df['v'].tolist(), columns))
+
+    def release(self):
+        self.gate.set()
+
+def test_writer_only_writes_the_latest_frame_of_a_path():
+    writes = FakeWrites()
+    writer = BackgroundWriter(write=writes)
+    writer.submit('a.csv', pd.DataFrame({'v': [1]}))
+    assert writes.started.wait(5)  # a.csv is being written; the rest queues up behind it
+    writer.submit('b.csv', pd.DataFrame({'v': [1]}), ['presale'])
+    writer.submit('b.csv', pd.DataFrame({'v': [2]}), ['extra_filter', 'presale'])
+    assert writer.pending('b.csv')['v'].tolist() == [2]
+    writes.release()
+    assert writer.flush(5)
+    assert writes.calls == [('a.csv', [1], None), ('b.csv', [2], ['presale', 'extra_filter'])]
+    assert writer.pending('b.csv') is None
+    writer.stop(5)
+
+def test_writer_reports_a_failed_write_to_the_flush_waiting_for_it():
+    errors = []
+    writes = FakeWrites(failing=['bad.csv'])
+    writes.release()
+    writer = BackgroundWriter(write=writes, on_error=lambda path, exc: errors.append(path))
+    writer.submit('bad.csv', pd.DataFrame({'v': [1]}))
+    writer.submit('good.csv', pd.DataFrame({'v': [1]}))
+    assert writer.flush(5, paths=['good.csv'])
+    with pytest.raises(SaveError) as failed:
+        writer.flush(5, paths=['bad.csv'])
+    assert list(failed.value.errors) == ['bad.csv'] and errors == ['bad.csv']
+    assert writer.flush(5)  # Reported once
+    writer.submit('bad.csv', pd.DataFrame({'v': [2]}))
+    with pytest.raises(SaveError):
+        writer.flush(5)
+    writes.failing.clear()
+    writer.submit('bad.csv', pd.DataFrame({'v': [3]}))
+    assert writer.flush(5)
+    writer.stop(5)
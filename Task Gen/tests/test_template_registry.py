@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+import template_registry
+from bulk_generate import generate_from_manifest
+from task_writer import read_csv_records
+from template_registry import TemplateRegistry
+
+TEMPLATE = b'site,product,quantity,presale\r\nTicketMaster,,007,\r\nTicketMaster,,1.50,\r\n'
+
+@pytest.fixture
+def templates(tmp_path):
+    path = tmp_path / 'Templates'
+    path.mkdir()
+    (path / 'Four.csv').write_bytes(TEMPLATE)
+    return path
+
+@pytest.fixture
+def reads(monkeypatch):
+    # Paths read_csv_records parsed through the registry
+    paths = []
+
+    def counting(path):
+        paths.append(os.path.basename(path))
+        return read_csv_records(path)
+
+    monkeypatch.setattr(template_registry, 'read_csv_records', counting)
+    return paths
+
+def test_templates_are_read_once_until_they_change(templates, reads):
+    registry = TemplateRegistry(str(templates))
+    assert registry.sync() == ['Four.csv']
+    header, records = registry.get('Four.csv')
+    assert registry.get('Four.csv') == (header, records) and len(records) == 2
+    assert reads == ['Four.csv']
+    path = templates / 'Four.csv'
+    path.write_bytes(TEMPLATE + b'TicketMaster,,2,\r\n')
+    os.utime(path, ns=(1, 1))
+    assert len(registry.get('Four.csv')[1]) == 3
+    assert reads == ['Four.csv', 'Four.csv']
+
+def test_removed_templates_are_forgotten(templates):
+    registry = TemplateRegistry(str(templates))
+    registry.sync()
+    os.remove(templates / 'Four.csv')
+    registry.on_file_event('deleted', str(templates / 'Four.csv'))
+    assert registry.names() == []
+    with pytest.raises(FileNotFoundError):
+        registry.get('Four.csv')
+
+def test_bulk_generate_builds_every_task_from_the_cached_records(templates, tmp_path, reads):
+    tasks = tmp_path / 'TASKS'
+    tasks.mkdir()
+    registry = TemplateRegistry(str(templates))
+    registry.sync()
+    entries = [{'name': f'{n}.csv', 'template': 'Four.csv', 'fields': {'product': f'https://example.com/e/{n}'}}
+               for n in range(3)]
+    report = generate_from_manifest(entries, str(tasks), str(templates), max_workers=2, registry=registry)
+    assert report['ok'] and reads == ['Four.csv']
+    assert (tasks / '2.csv').read_bytes() == TEMPLATE.replace(b',,', b',https://example.com/e/2,')
@@ -1,16 +1,38 @@
 import tkinter as tk
 import os
 from tkinter import messagebox, simpledialog, ttk
-from task_manager import TaskManager
-import pandas as pd
+from task_manager import TaskManager, BULK_FIELDS, DYNAMIC_FIELDS, DEFAULT_TASKS_DIR, DEFAULT_TEMPLATES_DIR
+from task_roots import TaskRoots, configured_task_roots
+import importlib
 import threading
-from file_watcher import FileWatcher
+import queue
+import bisect
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import count, dump_counters, event, timer
+from task_catalog import TaskCatalog
+from task_index import sync_all
+from collision_index import CollisionIndex
+from edit_journal import EditJournal
+from search_index import SearchIndex
+from split_engine import SPLIT_MODES, parse_overrides
+from task_validator import TaskValidator, configured_report_path
+from template_registry import TemplateRegistry
+from extra_filter_builder import build_extra_filter, is_valid_extra_filter, parse_extra_filter
 import math
 
-DYNAMIC_FIELDS = ['product', 'presale', 'price_range', 'extra_filter']
+TASK_EVENT_POLL_MS = 100  # Debounce window for batching file watcher events
+SORT_MODES = ['Name', 'Rows', 'Modified']
+
+def folder_of(iid):
+    # Folder holding a task or folder row ('venue/drake.csv' -> 'venue', 'dir:venue/2024' -> 'venue'); top level -> ''
+    return (iid[4:] if iid.startswith('dir:') else iid).rpartition('/')[0]
+
+def folder_iid(folder):
+    return 'dir:' + folder
 
 class SilentlyTaskGeneratorApp:
     def __init__(self, root):
+        self.root = root
         root.title('Silently Task Generator')
         root.geometry('800x600')  # Initial size, can be adjusted later
 
@@ -27,27 +49,68 @@ class SilentlyTaskGeneratorApp:
         self.merge_button = tk.Button(self.task_list_panel, text='Merge', font=('Arial', 12), command=self.merge_tasks)
         self.merge_button.pack(pady=(10, 0), padx=10, fill=tk.X)
 
+        # Bulk edit: the same presale/price/filter change on every selected task at once
+        self.bulk_edit_button = tk.Button(self.task_list_panel, text='Bulk Edit', font=('Arial', 12), command=self.bulk_edit_tasks)
+        self.bulk_edit_button.pack(pady=(5, 0), padx=10, fill=tk.X)
+        self.bulk_progress = None  # (window, label, bar) while a bulk edit runs
+
+        # Split: shard one task into several files (the inverse of Merge)
+        self.split_button = tk.Button(self.task_list_panel, text='Split', font=('Arial', 12), command=self.split_task)
+        self.split_button.pack(pady=(5, 0), padx=10, fill=tk.X)
+
         # Task List label
         label = tk.Label(self.task_list_panel, text='Task List', font=('Arial', 14), bg='#f0f0f0')
         label.pack(pady=10)
 
-        # Listbox for tasks (enable multi-select)
-        self.task_listbox = tk.Listbox(self.task_list_panel, font=('Arial', 12), selectmode=tk.EXTENDED)
-        self.task_listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
-        self.task_listbox.bind('<<ListboxSelect>>', self.on_task_select)
-        self.ignore_listbox_event = False  # Flag to ignore listbox events
-
-        # Populate Listbox with tasks from TASKS directory
-        tasks_dir = os.path.join(os.path.dirname(__file__), '../shhh/tasks/TASKS')
-        print(f"Tasks directory absolute path: {os.path.abspath(tasks_dir)}")  # Debug log
-        self.task_manager = TaskManager(tasks_dir)
-        self.tasks_dir = tasks_dir
+        # Sort order for the task list (Rows/Modified come from the task catalog)
+        self.sort_mode = tk.StringVar(value=SORT_MODES[0])
+        sort_menu = tk.OptionMenu(self.task_list_panel, self.sort_mode, *SORT_MODES, command=lambda _: self.resort_task_list())
+        sort_menu.pack(padx=10, fill=tk.X)
+
+        # Search box: narrows the tree to tasks matching every word, e.g. 'presale:ilove section:flr2'
+        self.search_var = tk.StringVar()
+        self.search_entry = tk.Entry(self.task_list_panel, textvariable=self.search_var, font=('Arial', 12))
+        self.search_entry.pack(padx=10, pady=(5, 0), fill=tk.X)
+        self.search_var.trace_add('write', lambda *args: self.apply_search())
+
+        # Folder tree of tasks (multi-select). Task names are paths under the task roots
+        # ('venue/drake.csv'); a folder's rows are only created when it is first opened
+        self.task_tree = ttk.Treeview(self.task_list_panel, show='tree', selectmode='extended')
+        self.task_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.task_tree.bind('<<TreeviewSelect>>', self.on_task_select)
+        self.task_tree.bind('<<TreeviewOpen>>', self.on_folder_open)
+        self.ignore_list_event = False  # Flag to ignore tree selection events
+
+        # Populate the tree with tasks from the task roots (TASKS, plus TASKGEN_TASK_ROOTS)
+        roots = TaskRoots(configured_task_roots(DEFAULT_TASKS_DIR))
+        self.task_manager = TaskManager(roots, on_save_error=self.on_save_error)
+        # Per-file metadata (row counts, events) from the sidecar catalog; what it already
+        # knows is shown right away and a background sync picks up files that changed since
+        self.catalog = TaskCatalog(os.path.join(os.path.dirname(__file__), 'task_catalog.db'), roots)
+        self.catalog_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='task-catalog')
+        self.task_info = self.catalog.all()
+        # Accounts/proxies shared with other tasks for the same event, kept current
+        # from watcher events on the same background thread as the catalog
+        self.collisions = CollisionIndex(roots)
+        self.collision_label = None
+        # Inverted index for the search box, built and kept current the same way
+        self.search = SearchIndex(roots)
+        self.search_matches = None   # Task names matching the search box; None shows every task
+        # Validation issues per task, shown as a badge in the tree; seeded from the last
+        # report, so only tasks changed since then are checked again in the background
+        self.validator = TaskValidator(roots, configured_report_path())
+        self.invalid_tasks = self.validator.invalid_tasks()  # name -> failing rows
+        self.validation_label = None
+        self.task_names = set()      # Every listed task name
+        self.folder_children = {}    # folder ('' = top) -> sorted child iids (folders first, then tasks)
+        self.loaded_folders = set()  # Folders whose children exist in the Treeview
         self.refresh_task_list()
 
-        # File watcher setup
-        self.file_watcher = FileWatcher(self.tasks_dir, self.on_tasks_dir_change)
-        self.watcher_thread = threading.Thread(target=self.file_watcher.start, daemon=True)
-        self.watcher_thread.start()
+        # File watcher events are queued and applied in batches on the Tk thread.
+        # The watcher itself starts after the first paint (see start_background_services)
+        self.task_events = queue.Queue()
+        self.root.after(TASK_EVENT_POLL_MS, self.drain_task_events)
+        self.file_watcher = None
         root.protocol('WM_DELETE_WINDOW', self.on_close)
 
         # Task Detail Panel (right)
@@ -65,218 +128,625 @@ class SilentlyTaskGeneratorApp:
         self.current_task = None
         self.current_df = None
 
+        # Detail widgets recycled between task selections (see clear_detail_panel)
+        self.notebook = None        # Created for the first multi-product task, then kept
+        self.tab_pool = []          # Idle notebook tabs, each keeping its own field Entries
+        self.single_panel = None    # Field Entries for single-product tasks
+        self.button_bar = None      # Save/Cancel/Delete
+        self.multi_product = False
+        self.product_rows = {}      # product -> row positions in current_df
+        self.tab_field_widgets = {}
+        # Undo/redo of the shown task as column diffs against current_df (see edit_journal)
+        self.journal = EditJournal()
+        root.bind('<Control-z>', lambda e: self.undo_edits())
+        root.bind('<Control-y>', lambda e: self.redo_edits())
+        root.bind('<Control-Z>', lambda e: self.redo_edits())  # Ctrl+Shift+Z
+
+        # Background task loading (see load_task_async)
+        self.load_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='task-loader')
+        self.pending_load = None
+        self.load_generation = 0
+        self.loading_label = None
+
+        # Templates are parsed once in the background and kept current by their own watcher
+        self.templates = TemplateRegistry(DEFAULT_TEMPLATES_DIR)
+
         # Add a 'Create Task' button to the UI
         self.create_task_button = tk.Button(self.task_list_panel, text="Create Task", command=self.create_task)
         self.create_task_button.pack(pady=5)
 
+        # The window and task list above only needed os.scandir and the catalog;
+        # pandas, the watchers and the caches start once the window is drawn
+        self.root.after_idle(self.start_background_services)
+
     def refresh_task_list(self):
-        self.task_listbox.delete(0, tk.END)
-        for task in self.task_manager.list_tasks():
-            self.task_listbox.insert(tk.END, task)
+        # Full rebuild from disk; routine changes go through add/remove_task_name instead
+        self.task_names = set(self.task_manager.list_tasks())
+        self.rebuild_task_tree()
+
+    def rebuild_task_tree(self):
+        # Recreate the tree from task_names; while searching, only matches are shown, with their folders open
+        self.task_tree.delete(*self.task_tree.get_children(''))
+        self.folder_children = {'': []}
+        self.loaded_folders = set()
+        for name in self.task_names:
+            if self.is_visible(name):
+                self.link_child(name)
+        for children in self.folder_children.values():
+            children.sort(key=self.tree_sort_key)
+        if self.search_matches is None:
+            self.load_folder('')
+            return
+        for folder in sorted(self.folder_children):  # Parents sort before their sub-folders
+            self.load_folder(folder)
+            if folder:
+                self.task_tree.item(folder_iid(folder), open=True)
+
+    def is_visible(self, name):
+        return self.search_matches is None or name in self.search_matches
+
+    def apply_search(self):
+        # Tk thread: re-run the search box query (on typing, and when the index changes)
+        with timer('search.query'):
+            matches = self.search.search(self.search_var.get())
+        if matches == self.search_matches:
+            return
+        selected = self.selected_task_names()
+        self.search_matches = matches
+        self.ignore_list_event = True
+        self.rebuild_task_tree()
+        kept = [name for name in selected if self.task_tree.exists(name)]
+        if kept:
+            self.task_tree.selection_set(kept)
+        self.right_panel.after_idle(lambda: setattr(self, 'ignore_list_event', False))
+
+    def link_child(self, iid):
+        # Model only: add iid (and any missing parent folders) to folder_children, unsorted
+        folder = folder_of(iid)
+        if folder not in self.folder_children:
+            self.folder_children[folder] = []
+            self.link_child(folder_iid(folder))
+        self.folder_children[folder].append(iid)
+
+    def load_folder(self, folder):
+        # Create the Treeview rows of one folder; sub-folders get a placeholder so they can be opened
+        parent = folder_iid(folder) if folder else ''
+        if folder in self.loaded_folders:
+            return
+        self.loaded_folders.add(folder)
+        if parent and self.task_tree.exists(parent + '/'):
+            self.task_tree.delete(parent + '/')
+        for iid in self.folder_children.get(folder, ()):
+            self.insert_tree_row(parent, 'end', iid)
+
+    def insert_tree_row(self, parent, index, iid):
+        self.task_tree.insert(parent, index, iid=iid, text=self.task_label(iid))
+        if iid.startswith('dir:'):
+            self.task_tree.insert(iid, 'end', iid=iid + '/', text='...')  # Placeholder until opened
+
+    def on_folder_open(self, event):
+        iid = self.task_tree.focus()
+        if iid.startswith('dir:'):
+            self.load_folder(iid[4:])
+
+    def task_label(self, iid):
+        # Tree text: folder name, or task filename plus catalog row/event counts when known
+        name = (iid[4:] if iid.startswith('dir:') else iid).rpartition('/')[2]
+        info = self.task_info.get(iid)
+        if info is not None:
+            if info['product_count'] > 1:
+                name = f"{name} ({info['row_count']}, {info['product_count']} events)"
+            else:
+                name = f"{name} ({info['row_count']})"
+        if iid in self.invalid_tasks:
+            name += f" \u26a0{self.invalid_tasks[iid]}"  # Rows failing validation
+        return name
+
+    def task_sort_key(self, name):
+        info = self.task_info.get(name) or {}
+        mode = self.sort_mode.get()
+        if mode == 'Rows':
+            return (-info.get('row_count', 0), name.lower(), name)
+        if mode == 'Modified':
+            return (-info.get('mtime_ns', 0), name.lower(), name)
+        return (name.lower(), name)
+
+    def tree_sort_key(self, iid):
+        # Folders first by name, then tasks in the chosen sort order
+        if iid.startswith('dir:'):
+            return (0, iid.lower(), iid)
+        return (1, *self.task_sort_key(iid))
+
+    def resort_task_list(self):
+        # Rows are moved rather than re-created, so the selection and open folders stay as they are
+        for folder, children in self.folder_children.items():
+            children.sort(key=self.tree_sort_key)
+            if folder in self.loaded_folders:
+                parent = folder_iid(folder) if folder else ''
+                for idx, iid in enumerate(children):
+                    self.task_tree.move(iid, parent, idx)
+
+    def insert_child(self, folder, iid):
+        # Place iid at its sorted position in folder, creating the folder (and its parents) if needed
+        if folder not in self.folder_children:
+            self.folder_children[folder] = []
+            self.insert_child(folder_of(folder), folder_iid(folder))
+        children = self.folder_children[folder]
+        idx = bisect.bisect_left(children, self.tree_sort_key(iid), key=self.tree_sort_key)
+        children.insert(idx, iid)
+        if folder in self.loaded_folders:
+            self.insert_tree_row(folder_iid(folder) if folder else '', idx, iid)
+
+    def remove_child(self, folder, iid):
+        # Drop iid from folder; folders left empty are dropped too
+        children = self.folder_children.get(folder)
+        if children is None or iid not in children:
+            return
+        children.remove(iid)
+        if self.task_tree.exists(iid):
+            self.task_tree.delete(iid)
+        if folder and not children:
+            del self.folder_children[folder]
+            self.loaded_folders.discard(folder)
+            self.remove_child(folder_of(folder), folder_iid(folder))
+
+    def add_task_name(self, name):
+        # Insert name at its sorted position in its folder (no-op if already listed)
+        if name in self.task_names:
+            return
+        self.task_names.add(name)
+        if self.is_visible(name):
+            self.insert_child(folder_of(name), name)
+
+    def remove_task_name(self, name):
+        if name not in self.task_names:
+            return
+        self.task_names.discard(name)
+        self.remove_child(folder_of(name), name)
+
+    def select_task(self, name):
+        # Select one task, opening the folders above it
+        if not self.is_visible(name):
+            self.search_var.set('')  # e.g. a new task the search does not match
+        folder = ''
+        for part in name.split('/')[:-1]:
+            self.load_folder(folder)
+            folder = f'{folder}/{part}' if folder else part
+            self.task_tree.item(folder_iid(folder), open=True)
+        self.load_folder(folder)
+        self.task_tree.selection_set(name)
+        self.task_tree.see(name)
+        self.task_tree.focus(name)
+
+    def selected_task_names(self):
+        # Selected tasks in tree order; selected folders and placeholders are not tasks
+        return [iid for iid in self.task_tree.selection() if iid in self.task_names]
+
+    def submit_catalog_update(self, fn, *args, event='catalog'):
+        # Run a catalog/collision index update in the background; the filenames it reports
+        # as changed are queued for drain_task_events so the list and warnings get refreshed
+        def on_done(fut):
+            if not fut.cancelled() and fut.exception() is None and fut.result():
+                self.task_events.put((event, *fut.result()))
+        self.catalog_executor.submit(fn, *args).add_done_callback(on_done)
+
+    def sync_indexes(self):
+        # Catalog thread: bring every index up to date in one pass over the task files
+        # (see task_index.sync_all); what changed is queued like their watcher updates
+        indexes = {'catalog': self.catalog, 'collisions': self.collisions, 'search': self.search,
+                   'validation': self.validator}
+        for event_type, names in zip(indexes, sync_all(list(indexes.values()))):
+            if names:
+                self.task_events.put((event_type, *names))
 
     def on_tasks_dir_change(self, *args):
-        # Called from file watcher thread; must update UI in main thread
-        self.task_listbox.after(0, self.refresh_task_list)
+        # Called from file watcher thread: never touch Tk here, just queue the event.
+        # The DataFrame cache is lock-protected, so it can be invalidated right here
+        count('watcher.events')
+        with timer('watcher.dispatch', event=args[0]):
+            if args[0] == 'directory':
+                # A folder was added, removed or renamed: list everything again (only changed folders are re-read)
+                self.catalog_executor.submit(self.sync_indexes)
+                self.task_events.put(('rescan', *self.task_manager.list_tasks()))
+                return
+            # One after another on the catalog thread, so the file is parsed once for all of them
+            self.submit_catalog_update(self.catalog.on_file_event, *args)  # Own saves change metadata too
+            self.submit_catalog_update(self.collisions.on_file_event, *args, event='collisions')
+            self.submit_catalog_update(self.search.on_file_event, *args, event='search')
+            self.submit_catalog_update(self.validator.on_file_event, *args, event='validation')
+            if self.task_manager.is_own_event(*args):
+                count('watcher.own_events')
+                return  # Our own atomic save; the list and cache are already up to date
+            self.task_manager.on_file_event(*args)
+            self.task_events.put(args)
+
+    def drain_task_events(self):
+        # Tk thread: apply every event queued since the last tick as one batch. The next tick is
+        # scheduled whatever happens, or one failed update would stop the list following the files
+        try:
+            self.apply_task_events()
+        finally:
+            self.root.after(TASK_EVENT_POLL_MS, self.drain_task_events)
+
+    def apply_task_events(self):
+        # One tick's batch: list changes, catalog metadata, search, collisions and validation
+        changes = {}  # name -> True (present) / False (gone); last event wins
+        cataloged = set()  # names whose catalog metadata changed
+        collisions_changed = False
+        search_changed = False
+        validated = set()  # names whose validation issues changed
+        try:
+            while True:
+                event_type, *paths = self.task_events.get_nowait()
+                if event_type == 'catalog':
+                    cataloged.update(paths)
+                elif event_type == 'rescan':
+                    listed = set(paths)
+                    changes.update((name, False) for name in self.task_names if name not in listed)
+                    changes.update((name, True) for name in listed if name not in self.task_names)
+                elif event_type == 'collisions':
+                    collisions_changed = True
+                elif event_type == 'search':
+                    search_changed = True
+                elif event_type == 'validation':
+                    validated.update(paths)
+                elif event_type == 'moved' and len(paths) == 2:
+                    changes[self.task_manager.roots.name_for(paths[0])] = False
+                    changes[self.task_manager.roots.name_for(paths[1])] = True
+                elif event_type == 'deleted':
+                    changes[self.task_manager.roots.name_for(paths[0])] = False
+                else:
+                    changes[self.task_manager.roots.name_for(paths[0])] = True
+        except queue.Empty:
+            pass
+        changes.pop(None, None)  # Paths outside every task root
+        if changes or cataloged:
+            with timer('task_list.apply', changes=len(changes), cataloged=len(cataloged)):
+                self.apply_task_list_changes(changes, cataloged)
+        if search_changed and self.search_var.get().strip():
+            self.apply_search()  # Files that now match (or stopped matching) the query
+        if collisions_changed:
+            # Another task may now share (or stop sharing) accounts with the one shown
+            self.update_collision_warning()
+        if validated:
+            self.apply_validation_changes(validated)
+
+    def apply_task_list_changes(self, changes, cataloged=()):
+        # Incremental tree update; rows that stay are moved, never re-created, so the
+        # selection, open folders and scroll position are kept
+        self.ignore_list_event = True
+        try:
+            for name, present in changes.items():
+                if not name.lower().endswith('.csv'):
+                    continue
+                if present and os.path.exists(self.task_manager.path_for(name)):
+                    self.add_task_name(name)
+                elif not present:
+                    self.remove_task_name(name)
+            for name in cataloged:
+                # New metadata changes the label and possibly the sort position
+                info = self.catalog.get(name)
+                if info is None:
+                    self.task_info.pop(name, None)
+                else:
+                    self.task_info[name] = info
+                if name in self.task_names:
+                    self.reposition_task(name)
+        finally:
+            self.right_panel.after_idle(lambda: setattr(self, 'ignore_list_event', False))
+
+    def reposition_task(self, name):
+        folder = folder_of(name)
+        children = self.folder_children.get(folder)
+        if children is None or name not in children:
+            return  # Hidden by the search
+        children.remove(name)
+        idx = bisect.bisect_left(children, self.tree_sort_key(name), key=self.tree_sort_key)
+        children.insert(idx, name)
+        if self.task_tree.exists(name):
+            self.task_tree.move(name, folder_iid(folder) if folder else '', idx)
+            self.task_tree.item(name, text=self.task_label(name))
 
     def clear_detail_panel(self):
+        # Pooled widgets are only hidden; filter tables, messages etc. are destroyed
+        self.multi_product = False
+        if self.notebook is not None:
+            for tab_id in self.notebook.tabs():
+                tab = self.notebook.nametowidget(tab_id)
+                self.notebook.forget(tab)
+                self.release_tab(tab)
+        pooled = {self.detail_label, self.collision_label, self.validation_label, self.notebook, self.single_panel, self.button_bar}
         for widget in self.right_panel.winfo_children():
-            if widget != self.detail_label:
+            if widget not in pooled:
                 widget.destroy()
+            elif widget is not self.detail_label:
+                widget.pack_forget()
         self.field_widgets = {}
-        self.edit_button = None
-        self.save_button = None
-        self.delete_button = None
-        self.duplicate_button = None
+        self.tab_field_widgets = {}
+        self.product_rows = {}
+        self.loading_label = None
         self.current_task = None
         self.current_df = None
 
+    def apply_validation_changes(self, names):
+        # New validation results: update the badges, and the warning if the shown task is among them
+        for name in names:
+            failing = sum(issue['count'] for issue in self.validator.issues(name))
+            if failing:
+                self.invalid_tasks[name] = failing
+            else:
+                self.invalid_tasks.pop(name, None)
+            if self.task_tree.exists(name):
+                self.task_tree.item(name, text=self.task_label(name))
+        if self.current_task in names:
+            self.update_validation_warning()
+
+    def update_validation_warning(self):
+        # List the validation issues of the shown task (rule and first CSV lines) under its title
+        issues = self.validator.issues(self.current_task) if self.current_df is not None else []
+        if not issues:
+            if self.validation_label is not None:
+                self.validation_label.pack_forget()
+            return
+        parts = []
+        for issue in issues:
+            lines = ', '.join(str(n) for n in issue['lines'][:5])
+            more = f' and {issue["count"] - 5} more' if issue['count'] > 5 else ''
+            parts.append(f"{issue['message']} (line {lines}{more})" if lines else issue['message'])
+        if self.validation_label is None:
+            self.validation_label = tk.Label(self.right_panel, fg='#b00020', font=('Arial', 11, 'bold'),
+                                             wraplength=500, justify=tk.LEFT)
+        self.validation_label.config(text='Invalid: ' + '; '.join(parts))
+        self.validation_label.pack(after=self.detail_label, padx=10, pady=(0, 5), anchor='w')
+
+    def update_collision_warning(self):
+        # Show which other tasks reuse this task's accounts or proxies for the same event
+        found = self.collisions.collisions(self.current_task) if self.current_df is not None else []
+        if not found:
+            if self.collision_label is not None:
+                self.collision_label.pack_forget()
+            return
+        counts = {}
+        others = set()
+        for c in found:
+            counts[c['field']] = counts.get(c['field'], 0) + 1
+            others.update(c['tasks'])
+        shared = ' and '.join(f"{n} {'accounts' if field == 'account' else 'proxies'}" for field, n in sorted(counts.items()))
+        others = sorted(others)
+        listed = ', '.join(others[:5]) + (f' and {len(others) - 5} more' if len(others) > 5 else '')
+        if self.collision_label is None:
+            self.collision_label = tk.Label(self.right_panel, fg='#b36b00', font=('Arial', 11, 'bold'),
+                                            wraplength=500, justify=tk.LEFT)
+        self.collision_label.config(text=f'Warning: {shared} also used for the same event in {listed}')
+        self.collision_label.pack(after=self.detail_label, padx=10, pady=(0, 5), anchor='w')
+
     def on_task_select(self, event):
-        if getattr(self, 'ignore_listbox_event', False):
+        if getattr(self, 'ignore_list_event', False):
             return  # Ignore event triggered by tab change
-        selection = self.task_listbox.curselection()
-        # If selection is empty, restore last selected index and do nothing
+        selection = self.selected_task_names()
+        # Only folders (or nothing) selected: keep showing the current task
         if len(selection) == 0:
-            if hasattr(self, 'last_selected_index') and self.last_selected_index is not None:
-                self.task_listbox.selection_set(self.last_selected_index)
-                self.task_listbox.activate(self.last_selected_index)
             return
         # Only update if a new task is explicitly selected
         if len(selection) == 1:
-            if hasattr(self, 'last_selected_index') and self.last_selected_index == selection[0]:
+            if selection[0] == self.current_task:
                 return  # Same task, do nothing
-            self.last_selected_index = selection[0]  # Remember last selected index
             self.clear_detail_panel()
-            filename = self.task_listbox.get(selection[0])
+            filename = selection[0]
             self.current_task = filename
             self.detail_label.config(text=f'Task: {filename}')
+            self.load_task_async(filename)
+        else:
+            self.cancel_pending_load()
+            self.clear_detail_panel()
+            self.detail_label.config(text='Select a task to view details')
+
+    def load_task_async(self, filename):
+        # Parse the CSV on the worker pool so the window stays responsive;
+        # only the most recent request is allowed to build widgets.
+        self.cancel_pending_load()
+        self.load_generation += 1
+        generation = self.load_generation
+        self.loading_label = tk.Label(self.right_panel, text='Loading...', font=('Arial', 12, 'italic'), fg='gray')
+        self.loading_label.pack(pady=10)
+        # The detail panel only shows the dynamic fields; the full frame is loaded on save
+        future = self.load_executor.submit(self.task_manager.load_task, filename, DYNAMIC_FIELDS)
+        self.pending_load = future
+
+        def on_done(fut):
+            # Runs on the worker thread; hop back onto the Tk thread before touching widgets
+            if fut.cancelled():
+                return
             try:
-                print(f"Loading task file: {filename}")  # Debug log
-                df = self.task_manager.load_task(filename)
-                print(f"Loaded DataFrame shape: {df.shape}")  # Debug log
-                print(f"DataFrame columns: {df.columns.tolist()}")  # Debug log
-                self.current_df = df
+                self.root.after(0, self.on_task_loaded, generation, filename, fut)
+            except (RuntimeError, tk.TclError):
+                pass  # Window is already gone
 
-                unique_products = df['product'].dropna().unique()
-
-                # --- NEW: Create tabs for each unique product or single panel ---
-                if len(unique_products) > 1:
-                    self.notebook = ttk.Notebook(self.right_panel)
-                    self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-                    self.tab_field_widgets = {}
-
-                    def on_tab_changed(event):
-                        self.ignore_listbox_event = True
-                        # Use after_idle to allow Tkinter to process events before setting flag back
-                        self.right_panel.after_idle(lambda: setattr(self, 'ignore_listbox_event', False))
-                        # When tab changes, ensure the correct filters UI is shown/rebuilt if needed
-                        selected_tab = self.notebook.select()
-                        # The filter UI is now built within each tab frame, so no explicit show/hide is needed here
-                        # The rebuild logic is handled in the on_add/delete/cancel callbacks if they are triggered.
-
-                    self.notebook.bind('<<NotebookTabChanged>>', on_tab_changed)
-
-                    for prod in unique_products:
-                        tab = tk.Frame(self.notebook)
-                        self.notebook.add(tab, text=prod)
-                        prod_rows = df[df['product'] == prod]
-                        first_row = prod_rows.iloc[0]
-                        field_widgets = {}
-                        for i, field in enumerate(DYNAMIC_FIELDS):
-                            label = tk.Label(tab, text=field, font=('Arial', 12))
-                            label.pack(anchor='w', padx=20, pady=(10 if i==0 else 2, 2))
-                            value = first_row.get(field, '')
-                            if value is None or (isinstance(value, float) and math.isnan(value)):
-                                value = ''
-                            entry = tk.Entry(tab, font=('Arial', 12))
-                            entry.insert(0, str(value))
-                            entry.pack(fill=tk.X, padx=20, pady=2)
-                            field_widgets[field] = entry
-
-                        self.tab_field_widgets[prod] = field_widgets
-                        # --- Filters Table UI for this tab ---
-                        extra_filter_entry = field_widgets.get('extra_filter')
-                        if extra_filter_entry:
-                             # Pass the tab frame as the parent for the filter UI
-                            self.build_filters_ui(tab, extra_filter_entry, first_row.get('extra_filter', ''), row_data=first_row)
-
-                    # Place main Save/Cancel/Delete buttons below the notebook
-                    self.save_button = tk.Button(self.right_panel, text='Save Task', font=('Arial', 12), command=self.save_edits)
-                    self.save_button.pack(pady=10)
-                    self.cancel_button = tk.Button(self.right_panel, text='Cancel Task', font=('Arial', 12), command=self.cancel_edits)
-                    self.cancel_button.pack(pady=10)
-                    self.delete_button = tk.Button(self.right_panel, text='Delete Task', font=('Arial', 12), fg='red', command=self.confirm_delete)
-                    self.delete_button.pack(pady=10)
+        future.add_done_callback(on_done)
 
-                else:
-                    # Single product, show as before in the main panel
-                    row = df.iloc[0]
-                    for i, field in enumerate(DYNAMIC_FIELDS):
-                        label = tk.Label(self.right_panel, text=field, font=('Arial', 12))
-                        label.pack(anchor='w', padx=20, pady=(10 if i==0 else 2, 2))
-                        value = row.get(field, '')
-                        if value is None or (isinstance(value, float) and math.isnan(value)):
-                            value = ''
-                        entry = tk.Entry(self.right_panel, font=('Arial', 12))
-                        entry.insert(0, str(value))
-                        entry.pack(fill=tk.X, padx=20, pady=2)
-                        self.field_widgets[field] = entry
-
-                    # --- Filters Table UI for single product ---
-                    extra_filter_entry = self.field_widgets.get('extra_filter')
-                    if extra_filter_entry:
-                         # Pass the right_panel as the parent for the filter UI
-                        self.build_filters_ui(self.right_panel, extra_filter_entry, row.get('extra_filter', ''), row_data=row)
+    def cancel_pending_load(self):
+        # Bumping the generation makes any in-flight result stale; queued ones never start
+        if self.pending_load is not None:
+            self.pending_load.cancel()
+            self.pending_load = None
+        self.load_generation += 1
+
+    def on_task_loaded(self, generation, filename, future):
+        if generation != self.load_generation or filename != self.current_task:
+            return  # Another task was selected while this one was loading
+        self.pending_load = None
+        if self.loading_label is not None:
+            self.loading_label.destroy()
+            self.loading_label = None
+        try:
+            df = future.result()
+            with timer('detail.build', task=filename, rows=len(df)):
+                self.show_task_details(df)
+                self.update_collision_warning()
+                self.update_validation_warning()
+        except Exception as e:
+            msg = tk.Label(self.right_panel, text=f'Error loading file: {e}', fg='red', font=('Arial', 12, 'italic'))
+            msg.pack(pady=10)
 
-                    # Place main Save/Cancel/Delete buttons below the fields
-                    self.save_button = tk.Button(self.right_panel, text='Save Task', font=('Arial', 12), command=self.save_edits)
-                    self.save_button.pack(pady=10)
-                    self.cancel_button = tk.Button(self.right_panel, text='Cancel Task', font=('Arial', 12), command=self.cancel_edits)
-                    self.cancel_button.pack(pady=10)
-                    self.delete_button = tk.Button(self.right_panel, text='Delete Task', font=('Arial', 12), fg='red', command=self.confirm_delete)
-                    self.delete_button.pack(pady=10)
+    def show_task_details(self, df):
+        # Build the detail widgets for an already loaded task
+        self.current_df = df
+        self.journal.clear()
+        # Row positions per product, computed once and shared by the tabs and save
+        self.product_rows = df.groupby('product', sort=False).indices if 'product' in df.columns else {}
 
-            except Exception as e:
-                msg = tk.Label(self.right_panel, text=f'Error loading file: {e}', fg='red', font=('Arial', 12, 'italic'))
-                msg.pack(pady=10)
+        if len(self.product_rows) > 1:
+            # One tab per product; a tab's fields and filter table are only filled in
+            # when it is first shown (see populate_tab)
+            self.multi_product = True
+            if self.notebook is None:
+                self.notebook = ttk.Notebook(self.right_panel)
+                self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+            self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+            for prod in self.product_rows:
+                tab = self.acquire_tab()
+                tab.product = prod
+                tab.loaded = False
+                self.notebook.add(tab, text=prod)
+            self.notebook.select(0)
+            self.populate_tab(self.notebook.nametowidget(self.notebook.select()))
         else:
-            self.clear_detail_panel()
-            self.detail_label.config(text='Select a task to view details')
+            # Single product, show as before in the main panel
+            row = df.iloc[0]
+            if self.single_panel is None:
+                self.single_panel = tk.Frame(self.right_panel)
+                self.single_panel.field_widgets = self.build_field_entries(self.single_panel)
+            self.single_panel.pack(fill=tk.X)
+            self.field_widgets = self.single_panel.field_widgets
+            for field, entry in self.field_widgets.items():
+                self.set_entry(entry, row.get(field, ''))
+
+            # --- Filters Table UI for single product ---
+            extra_filter_entry = self.field_widgets.get('extra_filter')
+            if extra_filter_entry:
+                 # Pass the right_panel as the parent for the filter UI
+                self.build_filters_ui(self.right_panel, extra_filter_entry, row.get('extra_filter', ''), row_data=row)
+
+        # Place main Save/Cancel/Delete buttons below the fields
+        if self.button_bar is None:
+            self.button_bar = tk.Frame(self.right_panel)
+            self.save_button = tk.Button(self.button_bar, text='Save Task', font=('Arial', 12), command=self.save_edits)
+            self.save_button.pack(pady=10)
+            undo_bar = tk.Frame(self.button_bar)
+            undo_bar.pack()
+            tk.Button(undo_bar, text='Undo', font=('Arial', 11), command=self.undo_edits).pack(side=tk.LEFT, padx=5)
+            tk.Button(undo_bar, text='Redo', font=('Arial', 11), command=self.redo_edits).pack(side=tk.LEFT, padx=5)
+            self.cancel_button = tk.Button(self.button_bar, text='Cancel Task', font=('Arial', 12), command=self.cancel_edits)
+            self.cancel_button.pack(pady=10)
+            self.delete_button = tk.Button(self.button_bar, text='Delete Task', font=('Arial', 12), fg='red', command=self.confirm_delete)
+            self.delete_button.pack(pady=10)
+        self.button_bar.pack()
+
+    def build_field_entries(self, parent):
+        # Label + Entry per dynamic field; returns {field: Entry}
+        field_widgets = {}
+        for i, field in enumerate(DYNAMIC_FIELDS):
+            label = tk.Label(parent, text=field, font=('Arial', 12))
+            label.pack(anchor='w', padx=20, pady=(10 if i==0 else 2, 2))
+            entry = tk.Entry(parent, font=('Arial', 12))
+            entry.pack(fill=tk.X, padx=20, pady=2)
+            field_widgets[field] = entry
+        return field_widgets
+
+    def set_entry(self, entry, value):
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            value = ''
+        entry.delete(0, tk.END)
+        entry.insert(0, str(value))
+
+    def acquire_tab(self):
+        # Reuse an idle tab (with its Entry widgets) or build a new one
+        if self.tab_pool:
+            return self.tab_pool.pop()
+        tab = tk.Frame(self.notebook)
+        tab.field_widgets = self.build_field_entries(tab)
+        return tab
+
+    def release_tab(self, tab):
+        # Keep the tab's field widgets for the next task; its filter table is rebuilt anyway
+        for child in tab.winfo_children():
+            if hasattr(child, 'filters_list'):
+                child.destroy()
+        tab.product = None
+        tab.loaded = False
+        self.tab_pool.append(tab)
+
+    def populate_tab(self, tab):
+        # Fill a product tab from current_df the first time it is shown
+        if tab.loaded or tab.product is None:
+            return
+        count('detail.tabs_populated')
+        first_row = self.current_df.iloc[self.product_rows[tab.product][0]]
+        for field, entry in tab.field_widgets.items():
+            self.set_entry(entry, first_row.get(field, ''))
+        self.tab_field_widgets[tab.product] = tab.field_widgets
+        # --- Filters Table UI for this tab ---
+        extra_filter_entry = tab.field_widgets.get('extra_filter')
+        if extra_filter_entry:
+            self.build_filters_ui(tab, extra_filter_entry, first_row.get('extra_filter', ''), row_data=first_row)
+        tab.loaded = True
+
+    def on_tab_changed(self, event):
+        self.ignore_list_event = True
+        # Use after_idle to allow Tkinter to process events before setting flag back
+        self.right_panel.after_idle(lambda: setattr(self, 'ignore_list_event', False))
+        if self.multi_product and self.notebook.select():
+            with timer('detail.populate_tab', task=self.current_task):
+                self.populate_tab(self.notebook.nametowidget(self.notebook.select()))
 
     def enable_editing(self):
         pass  # No longer needed, fields are always editable
 
-    def save_edits(self):
-        if self.current_task and self.current_df is not None and not self.current_df.empty:
-            # If using tabs (multiple products)
-            if hasattr(self, 'notebook') and hasattr(self, 'tab_field_widgets') and self.notebook.winfo_exists():
-                # Get currently selected tab/product
-                current_tab_index = self.notebook.index(self.notebook.select())
-                product = self.notebook.tab(current_tab_index, 'text')
-                field_widgets = self.tab_field_widgets[product]
-                # Update all rows for this product in the DataFrame
-                for field, entry in field_widgets.items():
-                    value = entry.get()
-                    # Ensure 'product' field itself is not updated here from the entry, 
-                    # as it's the key for the tab and shouldn't change via the filter editor.
-                    # Other dynamic fields are updated for rows matching this product.
-                    if field != 'product' and field in self.current_df.columns:
-                         self.current_df.loc[self.current_df['product'] == product, field] = value
-
-                # Also update the extra_filter field in the DataFrame based on the filters table state for this product
-                # Get the current filters from the UI table for this product tab
-                current_filters_in_ui = []
-                # Need to get the actual filters from the currently displayed filter rows for this product tab
-                # Accessing filter_rows requires knowing which filters_frame is active
-                # A better approach is to store filters state per product tab
-                # For now, let's assume filters is the list currently used by build_filters_table
-                # This needs refinement, but for Step 1, focus is on notebook error
-                # The on_save_row/on_cancel logic already updates the extra_filter entry widget
-                # We need to ensure this update is also reflected in the self.current_df for the correct rows.
-                # This part needs to be revisited in later steps (Step 3 primarily).
-                pass # Placeholder for future filter update logic in DataFrame
+    def collect_edits(self):
+        # [(row_positions, {field: value})] from the detail entries, for EditJournal.apply
+        if self.multi_product:
+            # Only tabs that have been opened (unopened tabs still show the file's values).
+            # 'product' is the tab's key and is not edited from here; extra_filter comes
+            # from its entry, which the filter table keeps in sync
+            edits = []
+            for product, field_widgets in self.tab_field_widgets.items():
+                rows = self.product_rows.get(product)
+                if rows is None or not len(rows):
+                    continue
+                edits.append((rows, {field: entry.get() for field, entry in field_widgets.items()
+                                     if field != 'product' and field in self.current_df.columns}))
+            return edits
+        # Single product: the main field widgets apply to every row
+        return [(range(len(self.current_df)), {field: entry.get() for field, entry in self.field_widgets.items()
+                                               if field in self.current_df.columns})]
 
+    def record_pending_edits(self):
+        # Typed but unsaved values become a journal step, so undo/cancel can be redone
+        if self.current_df is None or self.current_df.empty:
+            return
+        with timer('save.apply_edits', task=self.current_task):
+            self.journal.apply(self.current_df, self.collect_edits())
 
-            else:
-                # Single product, update all rows using the main field widgets
-                for field, entry in self.field_widgets.items():
-                    value = entry.get()
-                    if field in self.current_df.columns:
-                        self.current_df[field] = value
+    def save_edits(self):
+        if self.current_task and self.current_df is not None and not self.current_df.empty:
+            try:
+                self.record_pending_edits()
+            except ValueError as e:
+                messagebox.showerror('Error', f'Failed to save: {e}')
+                return
 
             # Save the updated DataFrame back to the CSV (applies to both cases)
             try:
-                self.task_manager.save_task(self.current_task, self.current_df)
+                # Queued for the background writer; unchanged frames are skipped
+                saved = self.task_manager.update_task(self.current_task, self.current_df)
+                self.journal.mark_saved()
+                self.update_detail_label()
                 # Do not hide the save button; keep it visible
-                # Preserve selection in the listbox
-                if hasattr(self, 'last_selected_index') and self.last_selected_index is not None:
-                    self.task_listbox.selection_set(self.last_selected_index)
-                    self.task_listbox.activate(self.last_selected_index)
-
-                # --- Update row_data reference for the filter Cancel button ---
-                if hasattr(self, 'notebook') and self.notebook.winfo_exists():
-                    # Multi-product case: Get the filters_frame for the current tab
-                    current_tab_index = self.notebook.index(self.notebook.select())
-                    # Access the frame that is the parent of the filter_table_content_frame within this tab
-                    # This frame was created in build_filters_ui and should hold the row_data
-                    current_tab_frame = self.notebook.winfo_children()[current_tab_index]
-                    for child in current_tab_frame.winfo_children():
-                        if hasattr(child, 'filters_list') and hasattr(child, 'row_data'):
-                            # Found the filters_frame for this tab
-                            product = self.notebook.tab(current_tab_index, 'text')
-                            prod_rows = self.current_df[self.current_df['product'] == product]
-                            if not prod_rows.empty:
-                                child.row_data = prod_rows.iloc[0] # Update row_data with the latest from df
-                            break # Found the frame, exit loop
-                else:\
-                    # Single product case: The filters_frame is directly in self.right_panel
-                    for child in self.right_panel.winfo_children():
-                         # Find the filters_frame - it has the filters_list and row_data attributes
-                         if hasattr(child, 'filters_list') and hasattr(child, 'row_data'):
-                             child.row_data = self.current_df.iloc[0] # Update row_data with the latest from df
-                             break # Found the frame, exit loop
-                # --- End update row_data reference ---
-
-                messagebox.showinfo('Saved', f'Task "{self.current_task}" saved successfully.')
+
+                if saved:
+                    messagebox.showinfo('Saved', f'Task "{self.current_task}" saved successfully.')
+                else:
+                    messagebox.showinfo('Saved', f'No changes to save in "{self.current_task}".')
             except Exception as e:
                 messagebox.showerror('Error', f'Failed to save: {e}')
 
@@ -291,9 +761,9 @@ class SilentlyTaskGeneratorApp:
             return
         # Delete the file
         try:
-            os.remove(os.path.join(self.tasks_dir, self.current_task))
+            self.task_manager.delete_task(self.current_task)
             messagebox.showinfo('Deleted', f'Task "{self.current_task}" deleted.')
-            self.refresh_task_list()
+            self.remove_task_name(self.current_task)
             self.clear_detail_panel()
             self.detail_label.config(text='Select a task to view details')
         except Exception as e:
@@ -312,24 +782,21 @@ class SilentlyTaskGeneratorApp:
             messagebox.showerror('Error', f'A task named "{new_name}" already exists.')
             return
         try:
-            self.task_manager.save_task(new_name, self.current_df.copy())
+            # Written synchronously: the new file must exist before we select it below
+            self.task_manager.duplicate_task(self.current_task, new_name)
             messagebox.showinfo('Duplicated', f'Task duplicated as "{new_name}".')
-            self.refresh_task_list()
-            # Select the new task in the listbox
-            idx = self.task_manager.list_tasks().index(new_name)
-            self.task_listbox.selection_clear(0, tk.END)
-            self.task_listbox.selection_set(idx)
-            self.task_listbox.activate(idx)
+            # Select the new task in the tree
+            self.add_task_name(new_name)
+            self.select_task(new_name)
             self.on_task_select(None)
         except Exception as e:
             messagebox.showerror('Error', f'Failed to duplicate: {e}')
 
     def merge_tasks(self):
-        selection = self.task_listbox.curselection()
-        if len(selection) < 2:
+        selected_files = self.selected_task_names()
+        if len(selected_files) < 2:
             messagebox.showerror('Error', 'Select at least two tasks to merge.')
             return
-        selected_files = [self.task_listbox.get(i) for i in selection]
         # Prompt for new unique task name
         new_name = simpledialog.askstring('Merge Tasks', 'Enter a name for the merged task (must end with .csv):')
         if not new_name:
@@ -340,57 +807,352 @@ class SilentlyTaskGeneratorApp:
             messagebox.showerror('Error', f'A task named "{new_name}" already exists.')
             return
         try:
-            # Merge all rows from selected files
-            merged_df = pd.DataFrame()
-            for file in selected_files:
-                df = self.task_manager.load_task(file)
-                merged_df = pd.concat([merged_df, df], ignore_index=True)
-            self.task_manager.save_task(new_name, merged_df)
-            messagebox.showinfo('Merged', f'Tasks merged as "{new_name}".')
-            self.refresh_task_list()
-            # Select the new merged task in the listbox
-            idx = self.task_manager.list_tasks().index(new_name)
-            self.task_listbox.selection_clear(0, tk.END)
-            self.task_listbox.selection_set(idx)
-            self.task_listbox.activate(idx)
+            # Merge all rows from selected files in one streaming pass
+            result = self.task_manager.merge_tasks(selected_files, new_name)
+            counts = '\n'.join(f'{f}: {n} rows' for f, n in result['rows'].items())
+            messagebox.showinfo('Merged', f'Tasks merged as "{new_name}" ({result["total_rows"]} rows).\n\n{counts}')
+            # Select the new merged task in the tree
+            self.add_task_name(new_name)
+            self.select_task(new_name)
             self.on_task_select(None)
         except Exception as e:
             messagebox.showerror('Error', f'Failed to merge: {e}')
 
+    def bulk_edit_tasks(self):
+        selected = self.selected_task_names()
+        if len(selected) < 2:
+            messagebox.showerror('Error', 'Select at least two tasks to edit together.')
+            return
+        options = self.ask_bulk_edit_options(len(selected))
+        if options is None:
+            return
+        if self.current_task in selected and not self.settle_unsaved_edits():
+            return
+        fields, filters_text, remove_text = options
+        if fields.get('extra_filter') and not is_valid_extra_filter(fields['extra_filter']):
+            messagebox.showerror('Error', f'Malformed extra_filter "{fields["extra_filter"]}" (expected "Section:Price, ...").')
+            return
+        if filters_text and not is_valid_extra_filter(filters_text):
+            messagebox.showerror('Error', f'Malformed filters to add "{filters_text}" (expected "Section:Price, ...").')
+            return
+        add_filters = parse_extra_filter(filters_text)
+        remove_sections = [s.strip() for s in remove_text.split(',') if s.strip()]
+        if not (fields or add_filters or remove_sections):
+            return
+
+        window = tk.Toplevel(self.root)
+        window.title('Bulk Edit')
+        window.transient(self.root)
+        label = tk.Label(window, text=f'Editing 0 of {len(selected)} tasks...', font=('Arial', 12))
+        label.pack(padx=20, pady=(10, 5))
+        bar = ttk.Progressbar(window, maximum=len(selected), length=300, mode='determinate')
+        bar.pack(padx=20, pady=(0, 10))
+        self.bulk_progress = (window, label, bar)
+        self.bulk_edit_button.config(state=tk.DISABLED)
+        if self.save_button is not None:
+            self.save_button.config(state=tk.DISABLED)  # A save now would race the bulk edit's write
+
+        def run():
+            # Worker thread; results hop back onto the Tk thread
+            try:
+                result = self.task_manager.bulk_edit(
+                    selected, fields, add_filters, remove_sections,
+                    progress=lambda done, total: self.root.after(0, self.on_bulk_edit_progress, done, total))
+            except Exception as e:
+                result = e
+            try:
+                self.root.after(0, self.on_bulk_edit_done, selected, result)
+            except (RuntimeError, tk.TclError):
+                pass  # Window is already gone
+
+        threading.Thread(target=run, name='bulk-edit', daemon=True).start()
+
+    def on_bulk_edit_progress(self, done, total):
+        if self.bulk_progress is None:
+            return
+        _, label, bar = self.bulk_progress
+        bar['value'] = done
+        label.config(text=f'Editing {done} of {total} tasks...' if done < total else 'Saving...')
+
+    def on_bulk_edit_done(self, selected, result):
+        if self.bulk_progress is not None:
+            self.bulk_progress[0].destroy()
+            self.bulk_progress = None
+        self.bulk_edit_button.config(state=tk.NORMAL)
+        if self.save_button is not None:
+            self.save_button.config(state=tk.NORMAL)
+        if isinstance(result, Exception):
+            messagebox.showerror('Error', f'Bulk edit failed, no tasks were changed.\n\n{result}')
+            return
+        if self.current_task in result:
+            # Show what is on disk now; anything typed while the edit ran cannot be kept
+            name = self.current_task
+            try:
+                self.record_pending_edits()
+            except ValueError:
+                pass  # Not valid anyway; it is replaced below all the same
+            if self.current_df is not None and not self.journal.is_saved():
+                messagebox.showwarning('Bulk Edit', f'Changes made to "{name}" during the bulk edit were discarded.')
+            self.clear_detail_panel()
+            self.current_task = name
+            self.load_task_async(name)
+        unchanged = len(selected) - len(result)
+        note = f' ({unchanged} already had these values)' if unchanged else ''
+        messagebox.showinfo('Bulk Edit', f'Updated {len(result)} of {len(selected)} tasks{note}.')
+
+    def settle_unsaved_edits(self):
+        # Before a bulk edit rewrites the open task: save its unsaved edits, drop them, or
+        # (returns False) cancel. Dropped edits go when the task is reloaded afterwards
+        try:
+            self.record_pending_edits()
+        except ValueError as e:
+            messagebox.showerror('Error', f'Failed to save: {e}')
+            return False
+        if self.current_df is None or self.journal.is_saved():
+            return True
+        answer = messagebox.askyesnocancel('Unsaved Changes', f'Save the changes to "{self.current_task}" before the bulk edit?')
+        if answer is None:
+            return False
+        if answer:
+            try:
+                # Written before the bulk edit reads the task, so it builds on the saved edits
+                self.task_manager.update_task(self.current_task, self.current_df, wait=True)
+            except Exception as e:
+                messagebox.showerror('Error', f'Failed to save: {e}')
+                return False
+            self.journal.mark_saved()
+            self.update_detail_label()
+        return True
+
+    def ask_bulk_edit_options(self, task_count):
+        # Modal dialog: values to set on every selected task, filters to add and sections to remove.
+        # Returns ({field: value}, filters to add, sections to remove) or None if cancelled
+        dialog = tk.Toplevel(self.root)
+        dialog.title('Bulk Edit')
+        dialog.transient(self.root)
+        tk.Label(dialog, text=f'Change {task_count} tasks (empty fields are left as they are)',
+                 font=('Arial', 12, 'bold')).pack(anchor='w', padx=20, pady=(10, 2))
+        field_widgets = {}
+        for field in BULK_FIELDS:
+            tk.Label(dialog, text=f'Set {field}', font=('Arial', 12)).pack(anchor='w', padx=20, pady=(8, 2))
+            field_widgets[field] = tk.Entry(dialog, font=('Arial', 12))
+            field_widgets[field].pack(fill=tk.X, padx=20, pady=2)
+        tk.Label(dialog, text='Add filters (Section:Price, ...)', font=('Arial', 12)).pack(anchor='w', padx=20, pady=(8, 2))
+        add_entry = tk.Entry(dialog, font=('Arial', 12))
+        add_entry.pack(fill=tk.X, padx=20, pady=2)
+        tk.Label(dialog, text='Remove sections (comma separated)', font=('Arial', 12)).pack(anchor='w', padx=20, pady=(8, 2))
+        remove_entry = tk.Entry(dialog, font=('Arial', 12))
+        remove_entry.pack(fill=tk.X, padx=20, pady=2)
+        result = []
+
+        def on_apply():
+            fields = {field: entry.get().strip() for field, entry in field_widgets.items() if entry.get().strip()}
+            result.append((fields, add_entry.get().strip(), remove_entry.get().strip()))
+            dialog.destroy()
+
+        buttons = tk.Frame(dialog)
+        buttons.pack(pady=10)
+        tk.Button(buttons, text='Apply', font=('Arial', 12), command=on_apply).pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text='Cancel', font=('Arial', 12), command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+        dialog.grab_set()
+        self.root.wait_window(dialog)
+        return result[0] if result else None
+
+    def split_task(self):
+        selected = self.selected_task_names()
+        if len(selected) != 1:
+            messagebox.showerror('Error', 'Select one task to split.')
+            return
+        filename = selected[0]
+        options = self.ask_split_options(filename)
+        if options is None:
+            return
+        mode, shards_text, prefix_text, overrides_text = options
+        try:
+            shards = int(shards_text or 2)
+            prefix_len = int(prefix_text) if prefix_text else None
+            overrides = parse_overrides(overrides_text)
+        except ValueError as e:
+            messagebox.showerror('Error', f'Invalid split options: {e}')
+            return
+        for fields in overrides.values():
+            if fields.get('extra_filter') and not is_valid_extra_filter(fields['extra_filter']):
+                messagebox.showerror('Error', f'Malformed extra_filter "{fields["extra_filter"]}" (expected "Section:Price, ...").')
+                return
+        self.split_button.config(state=tk.DISABLED)
+
+        def run():
+            # Worker thread; the result hops back onto the Tk thread
+            try:
+                result = self.task_manager.split_task(filename, mode, shards, prefix_len, overrides)
+            except Exception as e:
+                result = e
+            try:
+                self.root.after(0, self.on_split_done, filename, result)
+            except (RuntimeError, tk.TclError):
+                pass  # Window is already gone
+
+        threading.Thread(target=run, name='split', daemon=True).start()
+
+    def on_split_done(self, filename, result):
+        self.split_button.config(state=tk.NORMAL)
+        if isinstance(result, Exception):
+            messagebox.showerror('Error', f'Failed to split, no shards were written.\n\n{result}')
+            return
+        for shard in result:
+            self.add_task_name(shard['task'])
+        counts = '\n'.join(f'{s["task"]}: {s["rows"]} rows' for s in result)
+        messagebox.showinfo('Split', f'"{filename}" split into {len(result)} tasks.\n\n{counts}')
+        self.select_task(result[0]['task'])
+        self.on_task_select(None)
+
+    def ask_split_options(self, filename):
+        # Modal dialog: split mode, shard count, prefix length and per-shard overrides.
+        # Returns (mode, shards, prefix length, overrides text) as entered, or None if cancelled
+        dialog = tk.Toplevel(self.root)
+        dialog.title('Split Task')
+        dialog.transient(self.root)
+        tk.Label(dialog, text=f'Split {filename}', font=('Arial', 12, 'bold')).pack(anchor='w', padx=20, pady=(10, 2))
+        mode_var = tk.StringVar(value=SPLIT_MODES[0])
+        tk.Label(dialog, text='Mode', font=('Arial', 12)).pack(anchor='w', padx=20, pady=(8, 2))
+        tk.OptionMenu(dialog, mode_var, *SPLIT_MODES).pack(fill=tk.X, padx=20, pady=2)
+        tk.Label(dialog, text='Shards (rows / round-robin)', font=('Arial', 12)).pack(anchor='w', padx=20, pady=(8, 2))
+        shards_entry = tk.Entry(dialog, font=('Arial', 12))
+        shards_entry.insert(0, '2')
+        shards_entry.pack(fill=tk.X, padx=20, pady=2)
+        tk.Label(dialog, text='Prefix length (prefix, empty = up to the first digit)', font=('Arial', 12)).pack(anchor='w', padx=20, pady=(8, 2))
+        prefix_entry = tk.Entry(dialog, font=('Arial', 12))
+        prefix_entry.pack(fill=tk.X, padx=20, pady=2)
+        tk.Label(dialog, text='Overrides, one shard per line (1 presale=CODE; price_range=50-150)',
+                 font=('Arial', 12)).pack(anchor='w', padx=20, pady=(8, 2))
+        overrides_text = tk.Text(dialog, font=('Arial', 12), height=4, width=40)
+        overrides_text.pack(fill=tk.X, padx=20, pady=2)
+        result = []
+
+        def on_split():
+            result.append((mode_var.get(), shards_entry.get().strip(), prefix_entry.get().strip(),
+                           overrides_text.get('1.0', tk.END).strip()))
+            dialog.destroy()
+
+        buttons = tk.Frame(dialog)
+        buttons.pack(pady=10)
+        tk.Button(buttons, text='Split', font=('Arial', 12), command=on_split).pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text='Cancel', font=('Arial', 12), command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+        dialog.grab_set()
+        self.root.wait_window(dialog)
+        return result[0] if result else None
+
+    def start_background_services(self):
+        # Tk thread, first idle after the window is built
+        self.load_executor.submit(importlib.import_module, 'pandas')  # So the first click does not pay for it
+        self.load_executor.submit(self.start_template_registry)
+        threading.Thread(target=self.start_file_watcher, name='task-watcher-start', daemon=True).start()
+
+    def start_file_watcher(self):
+        # Background thread: importing watchdog and starting the observer stays off the Tk thread
+        from file_watcher import FileWatcher
+        with timer('startup.watcher'):
+            watcher = FileWatcher(self.task_manager.roots.dirs(), self.on_tasks_dir_change, recursive=True)
+            watcher.start()
+        self.file_watcher = watcher
+        # Files that changed between the first listing and the watcher starting
+        self.task_events.put(('rescan', *self.task_manager.list_tasks()))
+        self.catalog_executor.submit(self.sync_indexes)
+
+    def start_template_registry(self):
+        # Worker thread: parse every template, then follow changes to the directory
+        try:
+            self.templates.sync()
+            self.templates.start_watching()
+        except OSError as e:
+            event('templates.unavailable', error=str(e))  # create_task reports it to the user
+
     def create_task(self):
         # Prompt the user for a task title
         title = simpledialog.askstring("Create Task", "Enter task title (must end with .csv):")
-        if title:
-            if not title.endswith('.csv'):
-                title += '.csv'
-            # Check if the title is unique
-            if title in self.task_listbox.get(0, tk.END):
-                messagebox.showerror("Error", "A task with this title already exists.")
-                return
-            # Prompt the user to select a template
-            templates_dir = os.path.join(os.path.dirname(__file__), '../shhh/tasks/Templates')
-            templates = [f for f in os.listdir(templates_dir) if f.endswith('.csv')]
-            if not templates:
-                messagebox.showerror("Error", "No templates found in the Templates directory.")
-                return
-            template = simpledialog.askstring("Select Template", f"Available templates: {', '.join(templates)}. Enter the template name:")
-            if not template:
-                return
-            if template not in templates:
-                messagebox.showerror("Error", "Invalid template selected.")
-                return
-            # Create a new task file in the TASKS directory using the selected template
-            new_task_path = os.path.join('TASKS', title)
-            template_path = os.path.join(templates_dir, template)
-            with open(template_path, 'r') as f:
-                template_content = f.read()
-            with open(new_task_path, 'w') as f:
-                f.write(template_content)
-            self.refresh_task_list()
-            messagebox.showinfo("Success", f"Task '{title}' created successfully using template '{template}'.")
+        if not title:
+            return
+        if not title.lower().endswith('.csv'):
+            title += '.csv'
+        # Check if the title is unique
+        if self.task_manager.task_exists(title):
+            messagebox.showerror("Error", "A task with this title already exists.")
+            return
+        templates = self.templates.names()
+        if not templates:
+            # Background parse not finished (or failed); do it now
+            try:
+                self.templates.sync()
+            except OSError:
+                pass
+            templates = self.templates.names()
+        if not templates:
+            messagebox.showerror("Error", "No templates found in the Templates directory.")
+            return
+        options = self.ask_new_task_options(templates)
+        if options is None:
+            return
+        template, fields = options
+        if not is_valid_extra_filter(fields.get('extra_filter')):
+            messagebox.showerror("Error", f'Malformed extra_filter "{fields["extra_filter"]}" (expected "Section:Price, ...").')
+            return
+        try:
+            # The template's cached records are copied with only the dynamic columns rewritten
+            self.task_manager.create_task(title, self.templates.get(template), fields)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to create task: {e}")
+            return
+        self.add_task_name(title)
+        self.select_task(title)
+        self.on_task_select(None)
+        messagebox.showinfo("Success", f"Task '{title}' created successfully using template '{template}'.")
+
+    def ask_new_task_options(self, templates):
+        # Modal dialog: pick a template and optionally fill in the dynamic fields.
+        # Returns (template, {field: value}) or None if cancelled
+        dialog = tk.Toplevel(self.root)
+        dialog.title('Select Template')
+        dialog.transient(self.root)
+        template_var = tk.StringVar(value=templates[0])
+        tk.Label(dialog, text='Template', font=('Arial', 12)).pack(anchor='w', padx=20, pady=(10, 2))
+        tk.OptionMenu(dialog, template_var, *templates).pack(fill=tk.X, padx=20, pady=2)
+        field_widgets = self.build_field_entries(dialog)
+        result = []
+
+        def on_create():
+            fields = {field: entry.get().strip() for field, entry in field_widgets.items() if entry.get().strip()}
+            result.append((template_var.get(), fields))
+            dialog.destroy()
+
+        buttons = tk.Frame(dialog)
+        buttons.pack(pady=10)
+        tk.Button(buttons, text='Create', font=('Arial', 12), command=on_create).pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text='Cancel', font=('Arial', 12), command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+        dialog.grab_set()
+        self.root.wait_window(dialog)
+        return result[0] if result else None
+
+    def on_save_error(self, filename, exc):
+        # Called from the writer thread when a background save fails; if it was the open
+        # task, its edits count as unsaved again (the save marked them saved when it was queued)
+        def report():
+            if filename == self.current_task:
+                self.journal.mark_unsaved()
+                self.update_detail_label()
+            messagebox.showerror('Error', f'Failed to save "{filename}": {exc}')
+
+        self.root.after(0, report)
 
     def on_close(self):
-        self.file_watcher.stop()
+        if self.file_watcher is not None:
+            self.file_watcher.stop()
+        self.templates.stop()
+        self.validator.flush_report()
+        dump_counters()
+        # Make sure queued saves reach disk before the process exits
+        self.task_manager.close()
+        self.load_executor.shutdown(wait=False, cancel_futures=True)
+        self.catalog_executor.shutdown(wait=False, cancel_futures=True)
         self.root_destroy()
 
     def root_destroy(self):
@@ -398,69 +1160,78 @@ class SilentlyTaskGeneratorApp:
         self.main_frame.master.destroy()
 
     def cancel_edits(self):
-        if self.current_task:
-            try:
-                df = self.task_manager.load_task(self.current_task)
+        # Back to the last saved state from the journal; the file is only re-read
+        # when that state has been dropped from it
+        if not self.current_task or self.current_df is None:
+            return
+        try:
+            self.record_pending_edits()
+            if self.journal.revert(self.current_df) is None:
+                df = self.task_manager.load_task(self.current_task, DYNAMIC_FIELDS)
                 self.current_df = df
-                if not df.empty:
-                    # If using tabs (multiple products)
-                    if hasattr(self, 'notebook') and hasattr(self, 'tab_field_widgets') and self.notebook.winfo_exists():
-                        # Get currently selected tab/product
-                        current_tab_index = self.notebook.index(self.notebook.select())
-                        product = self.notebook.tab(current_tab_index, 'text')
-                        field_widgets = self.tab_field_widgets[product]
-                        prod_rows = df[df['product'] == product]
-                        if not prod_rows.empty:
-                            row = prod_rows.iloc[0]
-                            # Update all fields for this product
-                            for field, entry in field_widgets.items():
-                                value = row.get(field, '')
-                                if value is None or (isinstance(value, float) and math.isnan(value)):
-                                    value = ''
-                                entry.delete(0, tk.END)
-                                entry.insert(0, str(value))
-                            
-                            # Rebuild the filters UI for this product
-                            current_tab_frame = self.notebook.winfo_children()[current_tab_index]
-                            for child in current_tab_frame.winfo_children():
-                                if hasattr(child, 'filters_list') and hasattr(child, 'row_data'):
-                                    # Found the filters_frame for this tab
-                                    child.destroy()  # Remove old filters UI
-                                    # Rebuild filters UI with original values
-                                    extra_filter_entry = field_widgets.get('extra_filter')
-                                    if extra_filter_entry:
-                                        self.build_filters_ui(current_tab_frame, extra_filter_entry, row.get('extra_filter', ''), row_data=row)
-                                    break
-                    else:
-                        # Single product case
-                        row = df.iloc[0]
-                        # Update main fields
-                        for field, entry in self.field_widgets.items():
-                            value = row.get(field, '')
-                            if value is None or (isinstance(value, float) and math.isnan(value)):
-                                value = ''
-                            entry.delete(0, tk.END)
-                            entry.insert(0, str(value))
-                        
-                        # Rebuild the filters UI
-                        for child in self.right_panel.winfo_children():
-                            if hasattr(child, 'filters_list') and hasattr(child, 'row_data'):
-                                # Found the filters_frame
-                                child.destroy()  # Remove old filters UI
-                                # Rebuild filters UI with original values
-                                extra_filter_entry = self.field_widgets.get('extra_filter')
-                                if extra_filter_entry:
-                                    self.build_filters_ui(self.right_panel, extra_filter_entry, row.get('extra_filter', ''), row_data=row)
-                                break
-            except Exception as e:
-                messagebox.showerror('Error', f'Failed to reload: {e}')
+                self.product_rows = df.groupby('product', sort=False).indices if 'product' in df.columns else {}
+                self.journal.clear()
+            self.refresh_detail_fields()
+        except Exception as e:
+            messagebox.showerror('Error', f'Failed to reload: {e}')
+
+    def undo_edits(self):
+        if self.current_df is None or self.current_df.empty:
+            return
+        try:
+            self.record_pending_edits()
+        except ValueError as e:
+            messagebox.showerror('Error', f'Failed to undo: {e}')
+            return
+        if self.journal.undo(self.current_df):
+            self.refresh_detail_fields()
+
+    def redo_edits(self):
+        if self.current_df is None or self.current_df.empty:
+            return
+        if self.journal.redo(self.current_df):
+            self.refresh_detail_fields()
+
+    def update_detail_label(self):
+        if self.current_task:
+            mark = '' if self.journal.is_saved() else ' (unsaved changes)'
+            self.detail_label.config(text=f'Task: {self.current_task}{mark}')
+
+    def refresh_detail_fields(self):
+        # Show current_df in the field entries and filter tables that have been built
+        df = self.current_df
+        if df.empty:
+            return
+        if self.multi_product:
+            panels = []
+            for tab_name in self.notebook.tabs():
+                tab = self.notebook.nametowidget(tab_name)
+                rows = self.product_rows.get(tab.product)
+                if tab.loaded and rows is not None and len(rows):
+                    panels.append((tab, tab.field_widgets, df.iloc[rows[0]]))
+        else:
+            panels = [(self.right_panel, self.field_widgets, df.iloc[0])]
+        for parent, field_widgets, row in panels:
+            for field, entry in field_widgets.items():
+                self.set_entry(entry, row.get(field, ''))
+            for child in parent.winfo_children():
+                if hasattr(child, 'filters_list') and hasattr(child, 'row_data'):
+                    child.destroy()  # Rebuilt below with the restored values
+                    extra_filter_entry = field_widgets.get('extra_filter')
+                    if extra_filter_entry:
+                        self.build_filters_ui(parent, extra_filter_entry, row.get('extra_filter', ''), row_data=row)
+                    break
+        if not self.multi_product and self.button_bar is not None:
+            self.button_bar.pack_forget()
+            self.button_bar.pack()  # Keep the buttons below the rebuilt filter table
+        self.update_detail_label()
 
     # Helper function to build the filters UI for a given parent frame
     def build_filters_ui(self, parent, extra_filter_entry, initial_filter_value, row_data=None, filters_list=None):
         # Ensure 'filters' is always bound
         filters = [] # Initialize filters
         if filters_list is None:
-             filters.extend(self.parse_extra_filter(initial_filter_value))
+             filters.extend(parse_extra_filter(initial_filter_value))
         else:
              filters.extend(filters_list) # Use the provided list
 
@@ -493,7 +1264,7 @@ class SilentlyTaskGeneratorApp:
                  widget.destroy() # Clear existing content
             self.build_filter_table_content(content_frame, current_entry, current_filters, on_delete_row, on_add_row, on_cancel, row_data)
             # Update extra_filter field after deleting
-            ef_val = ', '.join(f'{s}:{p}' for s, p in current_filters if s and p)
+            ef_val = build_extra_filter(current_filters)
             current_entry.delete(0, tk.END)
             current_entry.insert(0, ef_val)
 
@@ -524,7 +1295,7 @@ class SilentlyTaskGeneratorApp:
             text = extra_filter_entry.get().strip()
             if text:
                 # Parse the text to find potential filters
-                new_filters = self.parse_extra_filter(text)
+                new_filters = parse_extra_filter(text)
                 if new_filters:
                     # Update the filters list
                     filters.clear()
@@ -557,15 +1328,11 @@ class SilentlyTaskGeneratorApp:
             # Add trace callbacks to both section and price variables
             def update_extra_filter(*args, idx=i):
                 # Get current values from all rows
-                current_filters = []
-                for section_var, price_var, _ in parent_content_frame.filter_rows:
-                    section_val = section_var.get().strip()
-                    price_val = price_var.get().strip()
-                    if section_val and price_val:  # Only add if both fields have values
-                        current_filters.append((section_val, price_val))
-                
-                # Update extra_filter entry
-                ef_val = ', '.join(f'{s}:{p}' for s, p in current_filters)
+                current_filters = [(section_var.get().strip(), price_var.get().strip())
+                                   for section_var, price_var, _ in parent_content_frame.filter_rows]
+
+                # Update extra_filter entry (rows missing a section or price are skipped)
+                ef_val = build_extra_filter(current_filters)
                 extra_filter_entry.delete(0, tk.END)
                 extra_filter_entry.insert(0, ef_val)
 
@@ -582,46 +1349,6 @@ class SilentlyTaskGeneratorApp:
         add_btn = tk.Button(parent_content_frame, text='Add another filter', font=('Arial', 11), command=lambda: on_add_row(filters_list, extra_filter_entry, parent_content_frame.master, original_row_data))
         add_btn.pack(pady=5)
 
-    def parse_extra_filter(self, value):
-        # Parse 'Section:Price, Section2:Price2' into [(Section, Price), ...]
-        # Handle cases like 'FLR1:350, FLR2,FLR3,FLR4:326, FLR6:250'
-        if not value or not isinstance(value, str):
-            return []
-        filters = []
-        
-        # Split on commas that are followed by a space and then a section:price pattern
-        # This preserves commas within the section part
-        parts = []
-        current_part = []
-        for item in value.split(','):
-            item = item.strip()
-            if ':' in item:
-                # If we have accumulated items, add them to the current part
-                if current_part:
-                    current_part.append(item)
-                    parts.append(','.join(current_part))
-                    current_part = []
-                else:
-                    parts.append(item)
-            else:
-                current_part.append(item)
-        
-        # Add any remaining items
-        if current_part:
-            parts.append(','.join(current_part))
-        
-        # Process each part
-        for part in parts:
-            if ':' in part:
-                # Split on the last colon to handle sections that might contain colons
-                sections, price = part.rsplit(':', 1)
-                # Keep the sections together as one filter
-                filters.append((sections.strip(), price.strip()))
-            elif part:
-                filters.append((part.strip(), ''))
-        
-        return filters
-
 if __name__ == "__main__":
     root = tk.Tk()
     app = SilentlyTaskGeneratorApp(root)